@@ -23,4 +23,6 @@ setup(
         "Programming Language :: Python :: 3",
     ],
     install_requires=["pandas>=1.2.0", "numpy", "sqlalchemy", "psycopg2"],
+    extras_require={"parquet": ["pyarrow"]},
+    entry_points={"console_scripts": ["siphon=siphon.cli:main"]},
 )
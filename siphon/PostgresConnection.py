@@ -1,5 +1,16 @@
-from sqlalchemy import create_engine
 import os
+from functools import lru_cache
+
+from siphon.lazy_utils import lazy_import
+from siphon.type_conversion_utils import read_numeric_text
+
+sqlalchemy = lazy_import("sqlalchemy")
+psycopg2_extensions = lazy_import("psycopg2.extensions")
+
+
+@lru_cache(maxsize=None)
+def get_numeric_as_text_type():
+    return psycopg2_extensions.new_type((1700,), "NUMERIC_AS_TEXT", read_numeric_text)
 
 
 class PostgresConnection(object):
@@ -7,7 +18,12 @@ class PostgresConnection(object):
     Postgres database context manager
     """
 
-    def __init__(self, database_var="LINKEDIN_DATABASE_URL", database_url=None):
+    def __init__(
+        self,
+        database_var="LINKEDIN_DATABASE_URL",
+        database_url=None,
+        numeric_as_float=False,
+    ):
         if database_url:
             self.database_url = database_url
         elif database_var:
@@ -16,15 +32,38 @@ class PostgresConnection(object):
             raise Exception(
                 "Please provide a database url or environmental database variable"
             )
+        self.numeric_as_float = numeric_as_float
         self.engine = None
         self.connection = None
 
     def __enter__(self):
-        self.engine = create_engine(self.database_url)
+        self.engine = sqlalchemy.create_engine(self.database_url)
         self.connection = self.engine.connect()
         self.connection.execute("set time zone 'UTC'")
+        # Keep NUMERIC as text instead of one Decimal object per value, so
+        # conversion can parse each column to float64 at once
+        if self.numeric_as_float:
+            psycopg2_extensions.register_type(
+                get_numeric_as_text_type(), self.connection.connection.connection
+            )
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
         self.connection.close()
         self.engine.dispose()
+
+    def cursor(self, name=None):
+        """
+        Returns a raw DBAPI cursor on the open connection
+        :param name: server-side cursor name, used to stream large results
+        :return:
+        """
+        return self.connection.connection.cursor(name=name)
+
+    def cancel(self):
+        """
+        Cancels the statement running on the connection. Safe to call from
+        another thread.
+        :return:
+        """
+        self.connection.connection.connection.cancel()
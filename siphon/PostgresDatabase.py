@@ -1,69 +1,520 @@
-# Data wrangling
-import pandas as pd
-import numpy as np
-
-# SQL
-import sqlalchemy
-from sqlalchemy import create_engine
-from sqlalchemy.dialects.postgresql import (
-    TIMESTAMP,
-    BIGINT,
-    VARCHAR,
-    TEXT,
-    NUMERIC,
-    DATE,
-    BOOLEAN,
-    ARRAY,
-    JSONB,
-)
-import re
+from __future__ import annotations
+
+import io
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock
 
 from siphon.PostgresConnection import PostgresConnection
+from siphon.arrow_utils import (
+    encode_arrow_table,
+    get_arrow_dtypes,
+    get_arrow_file_format,
+    open_arrow_file,
+)
+from siphon.batch_utils import AdaptiveBatchSizer, get_export_batch_size
+from siphon.checkpoint_utils import (
+    check_checkpoint_rows,
+    check_transient_error,
+    get_retry_delay,
+    get_staging_table,
+    load_checkpoint,
+    save_checkpoint,
+)
 from siphon.database_utils import (
+    analyze_table,
     check_table_exists,
+    cluster_table,
+    create_brin_index,
+    create_index,
     declare_primary_key,
+    get_database_columns,
+    get_distinct_ratios,
+    get_enum_ddl,
+    get_enum_dtype,
+    get_enum_name,
+    get_insert_method,
+    get_postgres_type_name,
     get_reference_table,
+    get_row_estimate,
+    get_schema_evolution_queries,
+    get_swap_queries,
+    get_table_ddl,
+    get_watermark,
+    merge_incremental,
+    set_maintenance_work_mem,
+    sort_dataframe,
+)
+from siphon.diff_utils import (
+    DIFF_BUCKET_SIZE,
+    get_bucket_filter,
+    get_bucket_hash_query,
+    get_bucket_hashes,
+    get_buckets,
+    get_key_changes,
+    get_mismatched_buckets,
+    get_row_hashes,
+)
+from siphon.foreign_key_utils import (
+    FOREIGN_KEY_SOURCES,
+    get_add_foreign_key_queries,
+    get_catalog_foreign_keys,
+    get_drop_foreign_key_queries,
+    get_load_levels,
+    get_naming_foreign_keys,
+)
+from siphon.lazy_utils import lazy_import
+from siphon.memory_utils import (
+    READ_COPIES,
+    UNLOAD_COPIES,
+    check_memory_budget,
+    estimate_row_bytes,
+    get_budget_batch_bytes,
+    get_budget_rows,
+    get_budget_workers,
+    get_column_widths,
+    parse_memory_size,
+)
+from siphon.partition_utils import (
+    PARTITION_CHECK,
+    check_partition_column,
+    get_hash_remainders,
+    get_partition_bound,
+    get_partition_check,
+    get_partition_keys,
+    get_partition_name,
+    get_partitioned_table_ddl,
+    get_partition_strategy,
+    get_partitions,
+)
+from siphon.progress_utils import (
+    PROGRESS_CHUNKSIZE,
+    ConsoleProgress,
+    TransferProgress,
+    estimate_bytes,
+    estimate_column_bytes,
+)
+from siphon.schema_profile_utils import (
+    check_schema_profile,
+    load_schema_profile_file,
+    load_schema_profile_table,
+    save_schema_profile_file,
+    save_schema_profile_table,
+)
+from siphon.transfer_utils import get_primary_key_columns
+from siphon.type_checking_utils import (
+    check_dtype_category,
+    get_dataframe_dtypes,
+    get_database_dtypes,
 )
-from siphon.type_checking_utils import get_dataframe_dtypes, get_database_dtypes
 from siphon.type_conversion_utils import (
     convert_dtypes,
     pre_convert_data,
     convert_dataframe_columns,
+    convert_database_columns,
+    convert_query_rows,
+)
+from siphon.unload_utils import (
+    get_arrow_schema,
+    get_page_count,
+    get_partition_filters,
+    get_partition_paths,
+    get_server_version,
+    get_unload_partitions,
+    open_writer,
+    prepare_arrow_frame,
+    write_row_group,
 )
 
+# Data wrangling
+pd = lazy_import("pandas")
+uuid = lazy_import("uuid")
+
 
 class PostgresDatabase:
-    def __init__(self, schema="raw", database_var="CAM_DATABASE_URL"):
+    def __init__(
+        self,
+        schema="raw",
+        database_var="CAM_DATABASE_URL",
+        float_dtype="numeric",
+        numeric_as_float=False,
+        conversion_workers=1,
+        parallel="thread",
+        database_url=None,
+        memory_budget=None,
+    ):
+        """
+        :param schema:
+        :param database_var:
+        :param float_dtype: postgres dtype float columns are exported as, one of
+            'numeric', 'double precision' or 'real'
+        :param numeric_as_float: read NUMERIC columns as float64, parsing each
+            fetched column in bulk rather than creating a Decimal per value, when
+            exact decimals aren't needed
+        :param conversion_workers: columns inferred and converted concurrently on
+            export, useful for wide frames
+        :param parallel: 'thread' or 'process' pool for conversion_workers
+        :param database_url: connection string, used instead of database_var
+        :param memory_budget: bytes, or a string like '2GB', siphon may use. Reads
+            that wouldn't fit fail before fetching anything; fetch sizes, row
+            groups, batches and conversion workers are sized to fit, and frames
+            too large to copy are converted in place.
+        """
         self.schema = schema
         self.database_var = database_var
+        self.database_url = database_url
+        self.float_dtype = float_dtype
+        self.numeric_as_float = numeric_as_float
+        self.conversion_workers = conversion_workers
+        self.parallel = parallel
+        self.memory_budget = (
+            None if memory_budget is None else parse_memory_size(memory_budget)
+        )
+        # Date formats detected per (schema, table), reused on later exports
+        self.date_formats = {}
 
-    def get_table(self, table, schema=None) -> pd.DataFrame:
+    def get_table(
+        self, table, schema=None, dictionary_encode=False, progress=None
+    ) -> pd.DataFrame:
         """
         Retrieves table from appropriate database
         :param schema:
         :param table_name:
         :param flavor:
+        :param dictionary_encode: read low-cardinality text columns as categoricals
+            and share repeated array values. Columns are picked from pg_stats
+            when the table has been analyzed.
+        :param progress: callback receiving rows, bytes, throughput and ETA as the
+            table streams in, e.g. ConsoleProgress(). The total is pg_class's
+            row estimate.
         :return:
         """
 
         schema = schema or self.schema
 
-        with PostgresConnection(database_var=self.database_var) as connection:
-            df = pd.read_sql_table(
+        with PostgresConnection(
+            database_var=self.database_var,
+            database_url=self.database_url,
+            numeric_as_float=self.numeric_as_float,
+        ) as connection:
+            db_dtype_dict = get_database_dtypes(table, schema, connection.connection)
+            if progress is None and self.memory_budget is None:
+                df = pd.read_sql_table(
+                    table_name=table, con=connection.connection, schema=schema
+                )
+            else:
+                chunksize = PROGRESS_CHUNKSIZE
+                if self.memory_budget is not None:
+                    chunksize = self.get_read_chunksize(
+                        table, schema, db_dtype_dict, connection
+                    )
+                df = self.read_table_chunks(
+                    table, schema, connection, progress, chunksize=chunksize
+                )
+            distinct_ratios = None
+            if dictionary_encode:
+                distinct_ratios = get_distinct_ratios(table, schema, connection)
+            df = convert_database_columns(
+                df,
+                db_dtype_dict,
+                dictionary_encode=dictionary_encode,
+                distinct_ratios=distinct_ratios,
+            )
+
+        return df
+
+    def get_read_chunksize(self, table, schema, db_dtype_dict, connection):
+        """
+        Checks that a whole table fits in the memory budget, estimating its size
+        from the row count estimate and pg_stats widths, and sizes its fetches
+        :param table:
+        :param schema:
+        :param db_dtype_dict:
+        :param connection:
+        :return: rows per fetch
+        """
+        row_bytes = estimate_row_bytes(
+            db_dtype_dict, get_column_widths(table, schema, connection)
+        )
+        total_rows = get_row_estimate(table, schema, connection)
+        if total_rows is None:
+            total_rows = connection.connection.execute(
+                f"select count(*) from {schema}.{table}"
+            ).scalar()
+        check_memory_budget(
+            total_rows * row_bytes * READ_COPIES,
+            self.memory_budget,
+            f"Reading {schema}.{table}",
+            hint="Stream it with get_query_chunks or unload_table instead",
+        )
+        return get_budget_rows(row_bytes, self.memory_budget)
+
+    def read_table_chunks(
+        self, table, schema, connection, progress, chunksize=PROGRESS_CHUNKSIZE
+    ):
+        """
+        Streams a table in chunks through a server-side cursor, reporting progress
+        after each one
+        :param table:
+        :param schema:
+        :param connection:
+        :param progress: progress callback
+        :param chunksize: rows per fetch
+        :return:
+        """
+        tracker = TransferProgress(
+            table,
+            total_rows=get_row_estimate(table, schema, connection),
+            callback=progress,
+        )
+        chunks = []
+        for chunk in pd.read_sql_table(
+            table_name=table,
+            con=connection.connection.execution_options(stream_results=True),
+            schema=schema,
+            chunksize=chunksize,
+        ):
+            chunks.append(chunk)
+            tracker.update(chunk.shape[0], estimate_bytes(chunk))
+        tracker.finish()
+        if not chunks:
+            return pd.read_sql_table(
                 table_name=table, con=connection.connection, schema=schema
             )
-            db_dtype_dict = get_database_dtypes(table, schema, connection.connection)
-            df_dtype_dict = convert_dtypes(
-                dtype_dict=db_dtype_dict,
-                from_dtype="postgres_description",
-                to_dtype="dataframe_dtype",
+        return pd.concat(chunks, ignore_index=True)
+
+    def get_table_incremental(
+        self,
+        table,
+        watermark_column,
+        since=None,
+        schema=None,
+        cache_df=None,
+        cache_path=None,
+        id_col="id",
+    ):
+        """
+        Retrieves only the rows whose watermark column (updated_at, a monotonic
+        id, ...) is past `since` and returns them with the new watermark.
+        When a cached dataframe or parquet file is given, the new rows are merged
+        into it and the stored watermark is used if `since` isn't passed.
+        :param table:
+        :param watermark_column:
+        :param since: previous high-water mark, or None to read everything
+        :param schema:
+        :param cache_df: previously synced dataframe to merge the new rows into
+        :param cache_path: parquet file read as the cache and rewritten after merging
+        :param id_col: column used to replace updated rows in the cache
+        :return: (dataframe, watermark)
+        """
+        schema = schema or self.schema
+
+        if cache_df is None and cache_path and os.path.exists(cache_path):
+            cache_df = pd.read_parquet(cache_path)
+        if since is None and cache_df is not None:
+            since = get_watermark(cache_df[watermark_column])
+
+        query = f"select * from {schema}.{table}"
+        params = None
+        if since is not None:
+            query += f"\nwhere {watermark_column} > %(since)s"
+            params = {"since": since}
+        query += f"\norder by {watermark_column}"
+        df = self.get_query(query, params=params)
+        watermark = get_watermark(df[watermark_column], since=since)
+
+        if cache_df is not None:
+            df = merge_incremental(cache_df, df, id_col=id_col)
+        if cache_path:
+            df.to_parquet(cache_path, index=False)
+
+        return df, watermark
+
+    def get_query(self, sql, params=None, chunksize=None, dictionary_encode=False):
+        """
+        Runs an arbitrary query (joins, aggregates, ...) and converts the result
+        with siphon's dtype mapping. Column types come from the cursor description
+        rather than information_schema, so no table is needed.
+        :param sql:
+        :param params: query parameters, passed to the DBAPI cursor
+        :param chunksize: when set, returns a generator of converted dataframes
+            fetched through a server-side cursor
+        :param dictionary_encode: read low-cardinality text columns as categoricals
+            and share repeated array values
+        :return:
+        """
+        if chunksize:
+            return self.get_query_chunks(
+                sql,
+                params=params,
+                chunksize=chunksize,
+                dictionary_encode=dictionary_encode,
             )
-            df = pre_convert_data(df)
-            df = convert_dataframe_columns(df, df_dtype_dict)
+
+        with PostgresConnection(
+            database_var=self.database_var,
+            database_url=self.database_url,
+            numeric_as_float=self.numeric_as_float,
+        ) as connection:
+            cursor = connection.cursor()
+            cursor.execute(sql, params)
+            df = convert_query_rows(
+                cursor.fetchall() if cursor.description is not None else [],
+                cursor.description,
+                dictionary_encode=dictionary_encode,
+            )
+            cursor.close()
 
         return df
 
+    def get_query_chunks(
+        self, sql, params=None, chunksize=10000, dictionary_encode=False, progress=None
+    ):
+        """
+        Streams query results through a server-side cursor, yielding a converted
+        dataframe per chunk so only one chunk is held in memory at a time
+        :param sql:
+        :param params:
+        :param chunksize: rows per dataframe, lowered to fit the memory budget
+        :param dictionary_encode: encode low-cardinality columns chunk by chunk
+        :param progress: callback receiving rows, bytes and throughput per chunk
+        :return:
+        """
+        with PostgresConnection(
+            database_var=self.database_var,
+            database_url=self.database_url,
+            numeric_as_float=self.numeric_as_float,
+        ) as connection:
+            cursor = connection.cursor(name=f"siphon_{uuid.uuid4().hex}")
+            cursor.itersize = chunksize
+            cursor.execute(sql, params)
+            tracker = TransferProgress("query", callback=progress)
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                df = convert_query_rows(
+                    rows, cursor.description, dictionary_encode=dictionary_encode
+                )
+                df_bytes = estimate_bytes(df)
+                tracker.update(df.shape[0], df_bytes)
+                # Later fetches shrink once rows turn out wider than the budget allows
+                if self.memory_budget is not None:
+                    chunksize = min(
+                        chunksize,
+                        get_budget_rows(df_bytes / df.shape[0], self.memory_budget),
+                    )
+                yield df
+            tracker.finish()
+            cursor.close()
+
+    def unload_table(
+        self,
+        table,
+        path,
+        schema=None,
+        row_group_size=100000,
+        partitions=1,
+        progress=None,
+    ):
+        """
+        Streams a table into a Parquet or Feather file through a server-side
+        cursor. Each fetch is converted with siphon's type mapping and written as
+        one row group, so memory stays at about one row group per partition
+        whatever the table size.
+        :param table:
+        :param path: .parquet/.pq or .feather/.arrow file. With several partitions,
+            a directory of part-00000.parquet etc. files.
+        :param schema:
+        :param row_group_size: rows fetched and written at a time, lowered to fit
+            the memory budget
+        :param partitions: files written in parallel, each reading its own range
+            of the table's pages on its own connection. Partitions don't share a
+            snapshot, so concurrent writes to the table may be split unevenly.
+            Reading a page range needs Postgres 14 or later; older servers write
+            the whole table as a single part.
+        :param progress: callback receiving rows, bytes, throughput and ETA
+        :return: rows written
+        """
+        schema = schema or self.schema
+        with PostgresConnection(
+            database_var=self.database_var, database_url=self.database_url
+        ) as connection:
+            db_dtype_dict = get_database_dtypes(table, schema, connection.connection)
+            total_rows = get_row_estimate(table, schema, connection)
+            read_partitions = partitions
+            if partitions > 1:
+                read_partitions = get_unload_partitions(
+                    partitions, get_server_version(connection)
+                )
+            page_count = (
+                get_page_count(table, schema, connection) if read_partitions > 1 else 0
+            )
+            column_widths = get_column_widths(table, schema, connection)
+        if not db_dtype_dict:
+            raise Exception(f"Table {schema}.{table} does not exist")
+        # Each partition holds its fetched rows, their frame and their Arrow table
+        if self.memory_budget is not None:
+            row_group_size = min(
+                row_group_size,
+                get_budget_rows(
+                    estimate_row_bytes(db_dtype_dict, column_widths),
+                    self.memory_budget,
+                    copies=UNLOAD_COPIES,
+                    share=1 / read_partitions,
+                ),
+            )
+
+        arrow_schema, df_dtype_dict = get_arrow_schema(
+            db_dtype_dict, dictionary=get_arrow_file_format(path) == "parquet"
+        )
+        paths = get_partition_paths(path, partitions)[:read_partitions]
+        if partitions > 1:
+            os.makedirs(path, exist_ok=True)
+        columns = ", ".join(db_dtype_dict)
+        queries = [
+            f"select {columns} from {schema}.{table} {where}".strip()
+            for where in get_partition_filters(page_count, read_partitions)
+        ]
+        tracker = TransferProgress(table, total_rows=total_rows, callback=progress)
+        lock = Lock()
+
+        def unload(query, partition_path):
+            with PostgresConnection(
+                database_var=self.database_var,
+                database_url=self.database_url,
+                numeric_as_float=self.numeric_as_float,
+            ) as connection:
+                cursor = connection.cursor(name=f"siphon_{uuid.uuid4().hex}")
+                cursor.itersize = row_group_size
+                cursor.execute(query)
+                rows_written = 0
+                writer = open_writer(partition_path, arrow_schema)
+                try:
+                    while True:
+                        rows = cursor.fetchmany(row_group_size)
+                        if not rows:
+                            break
+                        df = pd.DataFrame.from_records(
+                            rows, columns=list(db_dtype_dict), coerce_float=True
+                        )
+                        df = convert_database_columns(df, db_dtype_dict)
+                        df = prepare_arrow_frame(df, df_dtype_dict)
+                        write_row_group(writer, df, arrow_schema)
+                        rows_written += df.shape[0]
+                        with lock:
+                            tracker.update(df.shape[0], estimate_bytes(df))
+                finally:
+                    writer.close()
+                    cursor.close()
+            return rows_written
+
+        with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            rows_written = sum(pool.map(unload, queries, paths))
+        tracker.finish()
+        return rows_written
+
     def get_filtered_export(
         self, df, table, schema, connection, id_col="id", if_exists="replace"
     ):
@@ -78,6 +529,94 @@ class PostgresDatabase:
         filtered_df = df[df[id_col].isin(filtered_ids)].copy()
         return filtered_df
 
+    def diff_table(
+        self, df, table, key="id", schema=None, bucket_size=DIFF_BUCKET_SIZE
+    ):
+        """
+        Finds the keys a dataframe inserts, updates and deletes relative to a table
+        without reading the table. Both sides are hashed into key buckets, the
+        table on the server, and only the rows of buckets whose row count or md5
+        differ are fetched and compared.
+        Columns the table doesn't have are ignored, and the frame is converted
+        with the table's column types rather than inferred ones.
+        :param df:
+        :param table:
+        :param key: key column or list of key columns, unique in the frame
+        :param schema:
+        :param bucket_size: rows per bucket; smaller buckets fetch fewer
+            unchanged rows but return more hashes
+        :return: {'inserted': ..., 'updated': ..., 'deleted': ...} dataframes of
+            keys
+        """
+        schema = schema or self.schema
+        key_cols = [key] if isinstance(key, str) else list(key)
+
+        with PostgresConnection(
+            database_var=self.database_var, database_url=self.database_url
+        ) as connection:
+            db_dtype_dict = get_database_dtypes(table, schema, connection.connection)
+            if not db_dtype_dict:
+                raise Exception(f"Table {schema}.{table} does not exist")
+            missing_cols = [
+                col
+                for col in key_cols
+                if col not in df.columns or col not in db_dtype_dict
+            ]
+            if missing_cols:
+                raise Exception(
+                    f"Key columns {missing_cols} must be in the dataframe and the table"
+                )
+            if df.duplicated(key_cols).any():
+                raise Exception(
+                    f"Key columns {key_cols} aren't unique in the dataframe"
+                )
+
+            cols = [col for col in df.columns if col in db_dtype_dict]
+            df_dtype_dict = convert_dtypes(
+                dtype_dict={col: db_dtype_dict[col] for col in cols},
+                from_dtype="postgres_description",
+                to_dtype="dataframe_dtype",
+            )
+            df_dtype_dict = {
+                col: dtype for col, dtype in df_dtype_dict.items() if pd.notna(dtype)
+            }
+            df = pre_convert_data(df[cols].copy())
+            df = convert_dataframe_columns(df, df_dtype_dict)
+
+            row_estimate = get_row_estimate(table, schema, connection) or 0
+            n_buckets = max(1, -(-max(df.shape[0], row_estimate) // bucket_size))
+            buckets = get_buckets(
+                df, key_cols, db_dtype_dict, df_dtype_dict, bucket_size, n_buckets
+            )
+            client_hash_df = get_bucket_hashes(
+                buckets, get_row_hashes(df, cols, df_dtype_dict)
+            )
+            server_hash_df = pd.read_sql_query(
+                get_bucket_hash_query(
+                    table, schema, cols, key_cols, db_dtype_dict, bucket_size, n_buckets
+                ),
+                con=connection.connection,
+            ).set_index("bucket")
+        mismatched_buckets = get_mismatched_buckets(client_hash_df, server_hash_df)
+
+        if not mismatched_buckets:
+            return {
+                change: df[key_cols].iloc[0:0]
+                for change in ["inserted", "updated", "deleted"]
+            }
+        bucket_filter = get_bucket_filter(
+            mismatched_buckets, key_cols, db_dtype_dict, bucket_size, n_buckets
+        )
+        db_df = self.get_query(
+            f"select {', '.join(cols)} from {schema}.{table}\n{bucket_filter}"
+        )
+        changes = get_key_changes(
+            df[buckets.isin(mismatched_buckets)], db_df, key_cols, cols, df_dtype_dict
+        )
+        return {
+            change: key_df.reset_index(drop=True) for change, key_df in changes.items()
+        }
+
     def export_table(
         self,
         df: pd.DataFrame,
@@ -86,47 +625,1077 @@ class PostgresDatabase:
         if_exists="replace",
         method="multi",
         show_confirmation=True,
+        indexes=None,
+        maintenance_work_mem=None,
+        index_workers=1,
+        analyze=True,
+        schema_profile=None,
+        batch_size=None,
+        job_id=None,
+        max_retries=3,
+        retry_backoff=1.0,
+        progress=None,
+        partition_by=None,
+        partition_method="range",
+        partition_interval="day",
+        hash_modulus=8,
+        partition_workers=4,
+        sort_by=None,
+        brin_index=False,
+        cluster=False,
     ):
-        with PostgresConnection(database_var=self.database_var) as connection:
-            schema = schema or self.schema
+        """
+        Exports a dataframe to postgres. Keys and indexes are built after the load
+        and planner statistics are refreshed with ANALYZE.
+        :param df:
+        :param table:
+        :param schema:
+        :param if_exists:
+        :param method: to_sql insert method, 'copy' to load with COPY FROM STDIN,
+            or 'values' for paged execute_values INSERTs where COPY isn't allowed.
+            Batches are sized adaptively for every method.
+        :param show_confirmation: show a console progress line while loading
+        :param indexes: columns (or lists of columns) to build secondary indexes on
+        :param maintenance_work_mem: session override for index builds, e.g. '1GB'
+        :param index_workers: connections used to build indexes concurrently
+        :param analyze: whether to ANALYZE the table after loading
+        :param schema_profile: dictionary of dtype and date format decisions for
+            this table, filled on the first export and reused on later ones. When
+            it covers every column, inference is skipped entirely. See
+            save_schema_profile/load_schema_profile to persist it.
+        :param batch_size: when set, rows are committed in batches of this size and
+            progress is checkpointed so a failed export can be resumed
+        :param job_id: identifies a batched export; calling again with the same
+            job_id resumes after the last committed batch
+        :param max_retries: times a failed batch is retried
+        :param retry_backoff: seconds before the first retry, doubled each time
+        :param progress: callback receiving rows, bytes, throughput and ETA after
+            each chunk or batch, used instead of the console line
+        :param partition_by: column to declaratively partition the table on. See
+            export_table_partitioned.
+        :param partition_method: 'range' (on a date column), 'list' or 'hash'
+        :param partition_interval: 'day', 'month' or 'year' for range partitions
+        :param hash_modulus: number of hash partitions
+        :param partition_workers: partitions loaded concurrently
+        :param sort_by: column (or list of columns) the rows are sorted on before
+            loading, so they're stored in that order, e.g. an event timestamp
+        :param brin_index: add a BRIN index on the first sort column, which
+            serves range scans at a fraction of a btree's size
+        :param cluster: CLUSTER the table on the sort columns when the load
+            replaces or creates it, so later CLUSTER runs re-sort after appends
+        :return:
+        """
+        schema = schema or self.schema
+        if (brin_index or cluster) and not sort_by:
+            raise Exception("brin_index and cluster need sort_by")
+        if cluster and partition_by:
+            raise Exception(
+                "Partitioned tables can't be clustered, sort_by already loads "
+                "each partition in order"
+            )
+        if progress is None and show_confirmation:
+            progress = ConsoleProgress()
+        if partition_by:
+            return self.export_table_partitioned(
+                df,
+                table,
+                schema,
+                partition_by,
+                partition_method=partition_method,
+                partition_interval=partition_interval,
+                hash_modulus=hash_modulus,
+                partition_workers=partition_workers,
+                if_exists=if_exists,
+                method=method,
+                progress=progress,
+                schema_profile=schema_profile,
+                indexes=indexes,
+                maintenance_work_mem=maintenance_work_mem,
+                index_workers=index_workers,
+                analyze=analyze,
+                sort_by=sort_by,
+                brin_index=brin_index,
+            )
+        if batch_size:
+            return self.export_table_batched(
+                df,
+                table,
+                schema,
+                if_exists=if_exists,
+                method=method,
+                progress=progress,
+                schema_profile=schema_profile,
+                batch_size=batch_size,
+                job_id=job_id,
+                max_retries=max_retries,
+                retry_backoff=retry_backoff,
+                indexes=indexes,
+                maintenance_work_mem=maintenance_work_mem,
+                index_workers=index_workers,
+                analyze=analyze,
+                sort_by=sort_by,
+                brin_index=brin_index,
+                cluster=cluster,
+            )
+
+        with PostgresConnection(
+            database_var=self.database_var, database_url=self.database_url
+        ) as connection:
             df = self.get_filtered_export(
                 df, table, schema, connection, if_exists=if_exists
             )
             if df.shape[0] == 0:
                 return
-            df = pre_convert_data(df)
-            df_dtype_dict = get_dataframe_dtypes(df)
-            df = convert_dataframe_columns(df, df_dtype_dict)
-            table_already_exists = check_table_exists(table, schema, connection)
-            dtype_param = convert_dtypes(
-                dtype_dict=df_dtype_dict,
-                from_dtype="dataframe_dtype",
-                to_dtype="postgres_dtype",
+            df, df_dtype_dict, dtype_param, enum_cols = self.prepare_export(
+                df, table, schema, schema_profile=schema_profile, sort_by=sort_by
             )
+            table_already_exists = check_table_exists(table, schema, connection)
+
+            # Appends add new columns and widen existing ones instead of failing
+            if if_exists == "append" and table_already_exists:
+                db_columns = get_database_columns(table, schema, connection)
+                for query in get_schema_evolution_queries(
+                    df, table, schema, df_dtype_dict, dtype_param, db_columns
+                ):
+                    connection.connection.execute(query)
 
             # Attempting to overwrite mismatched data results in error
             if if_exists == "replace":
                 connection.connection.execute(
                     f"drop table if exists {schema}.{table} cascade"
                 )
-            if show_confirmation:
-                print(f"Exporting {table} {df.shape} to {schema}", end="")
-            start = time.time()
-            df.to_sql(
+            # Enum types are recreated along with the table
+            if if_exists == "replace" or not table_already_exists:
+                for col in enum_cols:
+                    connection.connection.execute(
+                        f"drop type if exists {schema}.{get_enum_name(table, col)}"
+                    )
+            # Batches are capped by the bind parameter limit and a byte budget,
+            # then sized from each batch's latency. All share one transaction.
+            tracker = None
+            if progress is not None:
+                tracker = TransferProgress(
+                    table, total_rows=df.shape[0], callback=progress
+                )
+            sizer = AdaptiveBatchSizer(
+                get_export_batch_size(
+                    df, method, max_bytes=get_budget_batch_bytes(self.memory_budget)
+                )
+            )
+            chunk_start = 0
+            with connection.connection.begin():
+                while chunk_start < df.shape[0]:
+                    chunk_df = df.iloc[chunk_start : chunk_start + sizer.batch_size]
+                    start = time.time()
+                    chunk_df.to_sql(
+                        table,
+                        method=get_insert_method(method),
+                        if_exists=if_exists if chunk_start == 0 else "append",
+                        dtype=dtype_param,
+                        schema=schema,
+                        con=connection.connection,
+                        index=False,
+                    )
+                    sizer.update(chunk_df.shape[0], time.time() - start)
+                    chunk_start += chunk_df.shape[0]
+                    if tracker:
+                        tracker.update(chunk_df.shape[0], estimate_bytes(chunk_df))
+            if tracker:
+                tracker.finish()
+            self.finalize_load(
+                df,
+                table,
+                schema,
+                connection,
+                declare_key=not table_already_exists or if_exists == "replace",
+                indexes=indexes,
+                maintenance_work_mem=maintenance_work_mem,
+                index_workers=index_workers,
+                analyze=analyze,
+                sort_by=sort_by,
+                brin_index=brin_index,
+                cluster=cluster,
+            )
+
+    def export_table_partitioned(
+        self,
+        df,
+        table,
+        schema,
+        partition_by,
+        partition_method="range",
+        partition_interval="day",
+        hash_modulus=8,
+        partition_workers=4,
+        if_exists="replace",
+        method="multi",
+        progress=None,
+        schema_profile=None,
+        indexes=None,
+        maintenance_work_mem=None,
+        index_workers=1,
+        analyze=True,
+        sort_by=None,
+        brin_index=False,
+    ):
+        """
+        Exports a dataframe to a declaratively partitioned table. The frame is
+        split per partition with one groupby and the partitions are loaded
+        concurrently, each on its own connection into a staging table that is
+        attached once every load has finished.
+        Replacing only swaps the partitions the frame has rows for, so reloading
+        a day of a day-partitioned table leaves every other day untouched. Hash
+        partitions mix keys, so replacing swaps all of them.
+        :param df:
+        :param table:
+        :param schema:
+        :param partition_by: partition column
+        :param partition_method: 'range' (on a date column), 'list' or 'hash'
+        :param partition_interval: 'day', 'month' or 'year' for range partitions
+        :param hash_modulus: number of hash partitions
+        :param partition_workers: partitions loaded concurrently
+        :param if_exists: 'fail', 'replace' or 'append'. Appended rows go straight
+            into existing partitions.
+        :param method: to_sql insert method, see export_table
+        :param progress:
+        :param schema_profile:
+        :param indexes: created on the parent, so every partition gets them
+        :param maintenance_work_mem:
+        :param index_workers:
+        :param analyze: whether to ANALYZE the loaded partitions
+        :param sort_by: rows keep this order within each partition
+        :param brin_index: created on the parent like indexes
+        :return:
+        """
+        df, df_dtype_dict, dtype_param, enum_cols = self.prepare_export(
+            df, table, schema, schema_profile=schema_profile, sort_by=sort_by
+        )
+        check_partition_column(df, partition_by, partition_method, partition_interval)
+        is_date = df_dtype_dict.get(partition_by) == "calendar_date"
+        if partition_method == "range" and df_dtype_dict.get(partition_by) not in {
+            "date",
+            "calendar_date",
+        }:
+            raise Exception(f"Range partition column {partition_by} must be a date")
+
+        with PostgresConnection(
+            database_var=self.database_var, database_url=self.database_url
+        ) as connection:
+            table_already_exists = check_table_exists(table, schema, connection)
+            if table_already_exists and if_exists == "fail":
+                raise Exception(f"Table {schema}.{table} already exists")
+            if table_already_exists and not get_partition_strategy(
+                table, schema, connection
+            ):
+                raise Exception(f"Table {schema}.{table} exists and isn't partitioned")
+
+            with connection.connection.begin():
+                if not table_already_exists:
+                    for col in enum_cols:
+                        connection.connection.execute(
+                            f"drop type if exists {schema}.{get_enum_name(table, col)}"
+                        )
+                        connection.connection.execute(get_enum_ddl(dtype_param[col]))
+                    connection.connection.execute(
+                        get_partitioned_table_ddl(
+                            table, schema, dtype_param, partition_by, partition_method
+                        )
+                    )
+                    # Keys on a partitioned table must include the partition column
+                    if "id" in df.columns:
+                        key_columns = dict.fromkeys(["id", partition_by])
+                        connection.connection.execute(
+                            f"alter table {schema}.{table} "
+                            f"add primary key ({', '.join(key_columns)})"
+                        )
+                # Replacing keeps the other partitions, so both evolve the parent
+                else:
+                    db_columns = get_database_columns(table, schema, connection)
+                    for query in get_schema_evolution_queries(
+                        df, table, schema, df_dtype_dict, dtype_param, db_columns
+                    ):
+                        connection.connection.execute(query)
+            key_columns = get_primary_key_columns(table, schema, connection)
+            existing_partitions = get_partitions(table, schema, connection)
+
+            # Case 1: Hash partitions, split by postgres' own hash of each key
+            if partition_method == "hash":
+                keys = get_hash_remainders(
+                    df[partition_by],
+                    table,
+                    schema,
+                    hash_modulus,
+                    get_postgres_type_name(dtype_param[partition_by]),
+                    connection,
+                )
+            # Case 2: Range partitions, keyed by the start of each interval
+            elif partition_method == "range":
+                keys = get_partition_keys(df[partition_by], partition_interval)
+            # Case 3: List partitions, one per value
+            else:
+                keys = df[partition_by]
+            groups = dict(iter(df.groupby(keys, sort=True, observed=True)))
+            # Every hash partition is rebuilt, including ones with no rows
+            if partition_method == "hash" and (
+                if_exists == "replace" or not table_already_exists
+            ):
+                groups = {
+                    remainder: groups.get(remainder, df.iloc[0:0])
+                    for remainder in range(hash_modulus)
+                }
+
+            tracker = TransferProgress(table, total_rows=df.shape[0], callback=progress)
+            lock = Lock()
+            job_suffix = uuid.uuid4().hex[:8]
+
+            def load_partition(key, partition_df):
+                partition = get_partition_name(
+                    table, key, partition_method, partition_interval
+                )
+                staged = if_exists == "replace" or partition not in existing_partitions
+                target = (
+                    get_staging_table(partition, job_suffix) if staged else partition
+                )
+                check = get_partition_check(
+                    partition_by, key, partition_method, partition_interval, is_date
+                )
+                with PostgresConnection(
+                    database_var=self.database_var, database_url=self.database_url
+                ) as partition_connection, partition_connection.connection.begin():
+                    if staged:
+                        partition_connection.connection.execute(
+                            f"create table {schema}.{target} "
+                            f"(like {schema}.{table} including defaults)"
+                        )
+                    if partition_df.shape[0]:
+                        partition_df.to_sql(
+                            target,
+                            method=get_insert_method(method),
+                            if_exists="append",
+                            dtype=dtype_param,
+                            schema=schema,
+                            con=partition_connection.connection,
+                            index=False,
+                            chunksize=get_export_batch_size(
+                                partition_df,
+                                method,
+                                max_bytes=get_budget_batch_bytes(self.memory_budget),
+                            ),
+                        )
+                    # Built before attaching, so ATTACH neither scans nor indexes
+                    if staged and check:
+                        partition_connection.connection.execute(
+                            f"alter table {schema}.{target} "
+                            f"add constraint {PARTITION_CHECK} check ({check})"
+                        )
+                    if staged and key_columns:
+                        partition_connection.connection.execute(
+                            f"alter table {schema}.{target} "
+                            f"add primary key ({', '.join(key_columns)})"
+                        )
+                with lock:
+                    tracker.update(partition_df.shape[0], estimate_bytes(partition_df))
+                return key, partition, target if staged else None
+
+            with ThreadPoolExecutor(max_workers=max(1, partition_workers)) as pool:
+                futures = [
+                    pool.submit(load_partition, key, partition_df)
+                    for key, partition_df in groups.items()
+                ]
+                wait(futures)
+            # Staging tables of partitions that loaded are dropped if any failed
+            errors = [future.exception() for future in futures if future.exception()]
+            if errors:
+                for future in futures:
+                    if not future.exception() and future.result()[2]:
+                        connection.connection.execute(
+                            f"drop table if exists {schema}.{future.result()[2]}"
+                        )
+                raise errors[0]
+            loaded = [future.result() for future in futures]
+
+            # Swapping partitions only takes brief locks on the parent
+            with connection.connection.begin():
+                for key, partition, staging_table in loaded:
+                    if staging_table is None:
+                        continue
+                    if partition in existing_partitions:
+                        connection.connection.execute(
+                            f"alter table {schema}.{table} "
+                            f"detach partition {schema}.{partition}"
+                        )
+                        connection.connection.execute(
+                            f"drop table {schema}.{partition}"
+                        )
+                    connection.connection.execute(
+                        f"alter table {schema}.{staging_table} rename to {partition}"
+                    )
+                    bound = get_partition_bound(
+                        key,
+                        partition_method,
+                        partition_interval,
+                        modulus=hash_modulus,
+                        is_date=is_date,
+                    )
+                    connection.connection.execute(
+                        f"alter table {schema}.{table} "
+                        f"attach partition {schema}.{partition} {bound}"
+                    )
+                    if partition_method != "hash":
+                        connection.connection.execute(
+                            f"alter table {schema}.{partition} "
+                            f"drop constraint {PARTITION_CHECK}"
+                        )
+            tracker.finish()
+
+            self.finalize_load(
+                df,
                 table,
+                schema,
+                connection,
+                declare_key=False,
+                indexes=indexes,
+                maintenance_work_mem=maintenance_work_mem,
+                index_workers=index_workers,
+                analyze=False,
+                sort_by=sort_by,
+                brin_index=brin_index,
+            )
+            # Only the partitions that changed need fresh statistics
+            if analyze:
+                for _, partition, _ in loaded:
+                    analyze_table(partition, schema, connection)
+
+    def export_file(
+        self,
+        path,
+        table,
+        schema=None,
+        if_exists="replace",
+        indexes=None,
+        maintenance_work_mem=None,
+        index_workers=1,
+        analyze=True,
+        progress=None,
+    ):
+        """
+        Loads a Parquet or Feather file without going through pandas. The file is
+        memory-mapped, column types come from its Arrow schema instead of being
+        inferred, and each row group is encoded straight into a COPY batch.
+        Everything is loaded in one transaction.
+        :param path: .parquet/.pq or .feather/.arrow file
+        :param table:
+        :param schema:
+        :param if_exists: 'fail', 'replace' or 'append'. Appending needs the table
+            to have compatible columns.
+        :param indexes: columns (or lists of columns) to index after the load
+        :param maintenance_work_mem:
+        :param index_workers:
+        :param analyze:
+        :param progress: callback receiving rows, bytes, throughput and ETA after
+            each row group
+        :return: rows loaded
+        """
+        schema = schema or self.schema
+        arrow_schema, num_rows, batches = open_arrow_file(path)
+        df_dtype_dict = get_arrow_dtypes(arrow_schema)
+        # Dictionaries can differ between row groups, so categories are
+        # loaded as VARCHAR rather than enums
+        dtype_param = convert_dtypes(
+            dtype_dict=df_dtype_dict,
+            from_dtype="dataframe_dtype",
+            to_dtype="postgres_dtype",
+            float_dtype=self.float_dtype,
+        )
+        column_names = ", ".join(df_dtype_dict)
+        tracker = TransferProgress(table, total_rows=num_rows, callback=progress)
+
+        with PostgresConnection(
+            database_var=self.database_var, database_url=self.database_url
+        ) as connection:
+            table_already_exists = check_table_exists(table, schema, connection)
+            if table_already_exists and if_exists == "fail":
+                raise Exception(f"Table {schema}.{table} already exists")
+            create_table = not table_already_exists or if_exists == "replace"
+            with connection.connection.begin():
+                if table_already_exists and if_exists == "replace":
+                    connection.connection.execute(
+                        f"drop table {schema}.{table} cascade"
+                    )
+                if create_table:
+                    connection.connection.execute(
+                        get_table_ddl(table, schema, dtype_param)
+                    )
+                cursor = connection.cursor()
+                for batch in batches:
+                    cursor.copy_expert(
+                        f"copy {schema}.{table} ({column_names}) from stdin",
+                        io.StringIO(encode_arrow_table(batch)),
+                    )
+                    tracker.update(batch.num_rows, batch.nbytes)
+                cursor.close()
+            tracker.finish()
+            self.finalize_load(
+                pd.DataFrame(columns=list(df_dtype_dict)),
+                table,
+                schema,
+                connection,
+                declare_key=create_table,
+                indexes=indexes,
+                maintenance_work_mem=maintenance_work_mem,
+                index_workers=index_workers,
+                analyze=analyze,
+            )
+        return tracker.rows
+
+    def prepare_export(self, df, table, schema, schema_profile=None, sort_by=None):
+        """
+        Infers (or reads from the schema profile) each column's dtype, converts
+        the dataframe and maps the dtypes to postgres
+        :param df:
+        :param table:
+        :param schema:
+        :param schema_profile:
+        :param sort_by: columns to sort the converted dataframe on
+        :return: (dataframe, dataframe dtypes, postgres dtypes, enum columns)
+        """
+        if schema_profile is None:
+            date_formats = self.date_formats.setdefault((schema, table), {})
+        else:
+            date_formats = schema_profile.setdefault("date_formats", {})
+        in_place, max_workers = False, self.conversion_workers
+        if self.memory_budget is not None:
+            column_bytes = estimate_column_bytes(df)
+            df_bytes = sum(column_bytes.values())
+            largest_column = max(column_bytes.values(), default=0)
+            check_memory_budget(
+                df_bytes + 2 * largest_column,
+                self.memory_budget,
+                f"Converting the dataframe for {schema}.{table}",
+                hint="Export it in smaller frames",
+            )
+            # Without room for a converted copy, columns are converted one by one
+            in_place = 2 * (df_bytes + largest_column) > self.memory_budget
+            free_bytes = self.memory_budget - df_bytes * (1 if in_place else 2)
+            max_workers = get_budget_workers(
+                column_bytes, free_bytes, self.conversion_workers
+            )
+        # A profile covering every column goes straight to conversion
+        if schema_profile is not None and check_schema_profile(df, schema_profile):
+            df_dtype_dict = {col: schema_profile["dtypes"][col] for col in df}
+            schema_profile["dtypes"] = dict(df_dtype_dict)
+        else:
+            df = pre_convert_data(df, in_place=in_place)
+            df_dtype_dict = get_dataframe_dtypes(
+                df,
+                schema_profile=schema_profile,
+                max_workers=max_workers,
+                parallel=self.parallel,
+            )
+        df = convert_dataframe_columns(
+            df,
+            df_dtype_dict,
+            date_formats=date_formats,
+            max_workers=max_workers,
+            parallel=self.parallel,
+        )
+        # Sorted after conversion, so dates and numbers sort by value not text
+        if sort_by:
+            df = sort_dataframe(df, sort_by)
+        dtype_param = convert_dtypes(
+            dtype_dict=df_dtype_dict,
+            from_dtype="dataframe_dtype",
+            to_dtype="postgres_dtype",
+            float_dtype=self.float_dtype,
+        )
+        # Categoricals are stored as per-column enums
+        enum_cols = [
+            col
+            for col, dtype in df_dtype_dict.items()
+            if check_dtype_category(dtype=dtype)
+        ]
+        for col in enum_cols:
+            dtype_param[col] = get_enum_dtype(df, table, schema, col)
+        if schema_profile is not None:
+            schema_profile.update(
+                {
+                    "schema": schema,
+                    "table": table,
+                    "ddl": get_table_ddl(table, schema, dtype_param),
+                }
+            )
+        return df, df_dtype_dict, dtype_param, enum_cols
+
+    def export_table_batched(
+        self,
+        df,
+        table,
+        schema,
+        if_exists="replace",
+        method="multi",
+        progress=None,
+        schema_profile=None,
+        batch_size=100000,
+        job_id=None,
+        max_retries=3,
+        retry_backoff=1.0,
+        sort_by=None,
+        **finalize_kwargs,
+    ):
+        """
+        Exports a dataframe in batches, each committed together with a checkpoint
+        row recording the job's progress. A replace loads into a staging table
+        that is swapped in at the end, so the existing table stays readable until
+        the load has finished.
+        :param df:
+        :param table:
+        :param schema:
+        :param if_exists:
+        :param method:
+        :param progress: callback reporting progress after each batch
+        :param schema_profile:
+        :param batch_size: rows committed per transaction
+        :param job_id: export job to start or resume, a new one by default. A job
+            only resumes with a dataframe of the row count it started with.
+        :param max_retries:
+        :param retry_backoff:
+        :param sort_by: columns rows are sorted on before batching
+        :param finalize_kwargs: index, CLUSTER and ANALYZE options passed to
+            finalize_load
+        :return:
+        """
+        job_id = job_id or uuid.uuid4().hex
+        with PostgresConnection(
+            database_var=self.database_var, database_url=self.database_url
+        ) as connection:
+            checkpoint = load_checkpoint(job_id, schema, connection)
+            if checkpoint and checkpoint["status"] == "complete":
+                return
+            # Counted before filtering, which drops the rows a resumed append loaded
+            total_rows = df.shape[0]
+            check_checkpoint_rows(checkpoint, job_id, total_rows)
+            table_already_exists = check_table_exists(table, schema, connection)
+            if if_exists == "fail" and table_already_exists and checkpoint is None:
+                raise Exception(f"Table {schema}.{table} already exists")
+            df = self.get_filtered_export(
+                df, table, schema, connection, if_exists=if_exists
+            )
+            if df.shape[0] == 0:
+                return
+            df, df_dtype_dict, dtype_param, enum_cols = self.prepare_export(
+                df, table, schema, schema_profile=schema_profile, sort_by=sort_by
+            )
+            load_table = table
+            if if_exists == "replace":
+                load_table = get_staging_table(table, job_id)
+                for col in enum_cols:
+                    dtype_param[col] = get_enum_dtype(df, load_table, schema, col)
+
+            # Rows already loaded by an append with ids were filtered out above
+            rows_loaded = 0
+            filtered = if_exists != "replace" and table_already_exists
+            if checkpoint and not (filtered and "id" in df.columns):
+                rows_loaded = checkpoint["rows_loaded"]
+            # Recorded when the job starts, since a resumed job finds the table
+            created_table = if_exists == "replace" or not table_already_exists
+            if checkpoint and checkpoint["created_table"] is not None:
+                created_table = checkpoint["created_table"]
+            if checkpoint is None:
+                if if_exists == "append" and table_already_exists:
+                    db_columns = get_database_columns(table, schema, connection)
+                    for query in get_schema_evolution_queries(
+                        df, table, schema, df_dtype_dict, dtype_param, db_columns
+                    ):
+                        connection.connection.execute(query)
+                if if_exists == "replace" or not table_already_exists:
+                    connection.connection.execute(
+                        f"drop table if exists {schema}.{load_table} cascade"
+                    )
+                    for col in enum_cols:
+                        connection.connection.execute(
+                            f"drop type if exists "
+                            f"{schema}.{get_enum_name(load_table, col)}"
+                        )
+                df.head(0).to_sql(
+                    load_table,
+                    if_exists="append",
+                    dtype=dtype_param,
+                    schema=schema,
+                    con=connection.connection,
+                    index=False,
+                )
+                save_checkpoint(
+                    job_id,
+                    table,
+                    schema,
+                    connection,
+                    rows_loaded,
+                    created_table=created_table,
+                    total_rows=total_rows,
+                )
+
+        tracker = TransferProgress(
+            table, total_rows=df.shape[0], callback=progress, initial_rows=rows_loaded
+        )
+        for batch_start in range(rows_loaded, df.shape[0], batch_size):
+            batch_df = df.iloc[batch_start : batch_start + batch_size]
+            self.export_batch(
+                batch_df,
+                load_table,
+                schema,
+                dtype_param,
                 method=method,
-                if_exists=if_exists,
-                dtype=dtype_param,
-                schema=schema,
-                con=connection.connection,
-                index=False,
+                job_id=job_id,
+                table=table,
+                rows_loaded=batch_start + batch_df.shape[0],
+                max_retries=max_retries,
+                retry_backoff=retry_backoff,
+            )
+            tracker.update(batch_df.shape[0], estimate_bytes(batch_df))
+        tracker.finish()
+
+        with PostgresConnection(
+            database_var=self.database_var, database_url=self.database_url
+        ) as connection:
+            # A staging table that's already gone was swapped in before a restart
+            if load_table != table and check_table_exists(
+                load_table, schema, connection
+            ):
+                with connection.connection.begin():
+                    for query in get_swap_queries(load_table, table, schema, enum_cols):
+                        connection.connection.execute(query)
+            # A job resumed after finalize_load already has its key
+            self.finalize_load(
+                df,
+                table,
+                schema,
+                connection,
+                declare_key=created_table
+                and not get_primary_key_columns(table, schema, connection),
+                sort_by=sort_by,
+                **finalize_kwargs,
             )
-            end = time.time()
-            elapsed_time = end - start
-            if not table_already_exists:
-                declare_primary_key(df, table, schema, connection)
-            if show_confirmation:
-                print(f" in {elapsed_time} seconds")
+            save_checkpoint(
+                job_id, table, schema, connection, df.shape[0], status="complete"
+            )
+
+    def export_batch(
+        self,
+        batch_df,
+        load_table,
+        schema,
+        dtype_param,
+        method,
+        job_id,
+        table,
+        rows_loaded,
+        max_retries=3,
+        retry_backoff=1.0,
+    ):
+        """
+        Commits one batch and its checkpoint in a single transaction, retrying
+        transient errors on a fresh connection with exponential backoff
+        :param batch_df:
+        :param load_table: table the rows are inserted into
+        :param schema:
+        :param dtype_param:
+        :param method:
+        :param job_id:
+        :param table: table the job exports, recorded in the checkpoint
+        :param rows_loaded: rows committed once this batch is
+        :param max_retries:
+        :param retry_backoff:
+        :return:
+        """
+        for attempt in range(max_retries + 1):
+            try:
+                with PostgresConnection(
+                    database_var=self.database_var, database_url=self.database_url
+                ) as connection:
+                    with connection.connection.begin():
+                        batch_df.to_sql(
+                            load_table,
+                            method=get_insert_method(method),
+                            chunksize=get_export_batch_size(
+                                batch_df,
+                                method,
+                                max_bytes=get_budget_batch_bytes(self.memory_budget),
+                            ),
+                            if_exists="append",
+                            dtype=dtype_param,
+                            schema=schema,
+                            con=connection.connection,
+                            index=False,
+                        )
+                        save_checkpoint(job_id, table, schema, connection, rows_loaded)
+                return
+            except Exception as error:
+                if attempt == max_retries or not check_transient_error(error):
+                    raise
+                time.sleep(get_retry_delay(attempt, retry_backoff))
+
+    def save_schema_profile(self, table, schema_profile, schema=None, path=None):
+        """
+        Saves a schema profile filled by export_table as a new version, either to a
+        local JSON file or, without a path, to a sidecar table in the schema
+        :param table:
+        :param schema_profile:
+        :param schema:
+        :param path: JSON file to write
+        :return: the saved profile
+        """
+        schema = schema or self.schema
+        if path:
+            return save_schema_profile_file(schema_profile, path)
+        with PostgresConnection(
+            database_var=self.database_var, database_url=self.database_url
+        ) as connection:
+            return save_schema_profile_table(schema_profile, table, schema, connection)
+
+    def load_schema_profile(self, table, schema=None, path=None, version=None):
+        """
+        Loads a saved schema profile to pass to export_table
+        :param table:
+        :param schema:
+        :param path: JSON file to read
+        :param version: profile version, latest by default
+        :return: the profile, or None if the table has none
+        """
+        schema = schema or self.schema
+        if path:
+            return load_schema_profile_file(path, version=version)
+        with PostgresConnection(
+            database_var=self.database_var, database_url=self.database_url
+        ) as connection:
+            return load_schema_profile_table(table, schema, connection, version=version)
+
+    def finalize_load(
+        self,
+        df,
+        table,
+        schema,
+        connection,
+        declare_key=True,
+        indexes=None,
+        maintenance_work_mem=None,
+        index_workers=1,
+        analyze=True,
+        sort_by=None,
+        brin_index=False,
+        cluster=False,
+    ):
+        """
+        Builds the primary key and secondary indexes once the data is loaded, which
+        is much cheaper than maintaining them row by row, then runs ANALYZE
+        :param df:
+        :param table:
+        :param schema:
+        :param connection:
+        :param declare_key: whether to add the primary key
+        :param indexes: columns (or lists of columns) to index
+        :param maintenance_work_mem:
+        :param index_workers: builds indexes on this many connections at once
+        :param analyze:
+        :param sort_by: columns the rows were sorted on
+        :param brin_index: add a BRIN index on the first sort column
+        :param cluster: CLUSTER on the sort columns, only when declare_key is set
+            because the load created the table
+        :return:
+        """
+        indexes = indexes or []
+        if type(sort_by) == str:
+            sort_by = [sort_by]
+        if maintenance_work_mem:
+            set_maintenance_work_mem(connection, maintenance_work_mem)
+        if declare_key:
+            declare_primary_key(df, table, schema, connection)
+        # Rewriting rebuilds every index, so it runs before the rest are built
+        if cluster and declare_key and sort_by:
+            cluster_table(table, schema, sort_by, connection)
+        if brin_index and sort_by:
+            create_brin_index(table, schema, sort_by[0], connection)
+
+        if index_workers > 1 and len(indexes) > 1:
+            with ThreadPoolExecutor(max_workers=index_workers) as executor:
+                futures = [
+                    executor.submit(
+                        self.build_index, table, schema, columns, maintenance_work_mem
+                    )
+                    for columns in indexes
+                ]
+                for future in futures:
+                    future.result()
+        else:
+            for columns in indexes:
+                create_index(table, schema, columns, connection)
+
+        if analyze:
+            analyze_table(table, schema, connection)
+
+    def build_index(self, table, schema, columns, maintenance_work_mem=None):
+        """
+        Builds an index on its own connection so several can be built at once
+        :param table:
+        :param schema:
+        :param columns:
+        :param maintenance_work_mem:
+        :return:
+        """
+        with PostgresConnection(
+            database_var=self.database_var, database_url=self.database_url
+        ) as connection:
+            if maintenance_work_mem:
+                set_maintenance_work_mem(connection, maintenance_work_mem)
+            create_index(table, schema, columns, connection)
+
+    def export_tables(
+        self,
+        dfs,
+        schema=None,
+        if_exists="replace",
+        foreign_keys="naming",
+        max_workers=4,
+        **export_kwargs,
+    ):
+        """
+        Exports related dataframes, loading referenced tables before the tables
+        that reference them. Tables that don't depend on each other load in
+        parallel, each with export_table.
+        Foreign keys come from column names ('naming', the declare_foreign_keys
+        rules) or only from the constraints already declared ('catalog').
+        - replacing drops the constraints on and referencing the tables, loads
+          every table at once and declares them again at the end. A failed load
+          puts the dropped constraints back.
+        - appending leaves the constraints in place and loads in dependency
+          order, so each table's rows are checked against committed parents
+        Missing constraints are declared at the end, each validated with one scan,
+        so a replace validates every constraint once. Declared ones keep their
+        definition. While several tables load at once, the console only shows
+        each table's final progress line.
+        :param dfs: table -> dataframe
+        :param schema:
+        :param if_exists: 'fail', 'replace' or 'append'
+        :param foreign_keys: 'naming' or 'catalog'
+        :param max_workers: tables loaded at once
+        :param export_kwargs: passed to export_table
+        :return: list of load levels, each a list of tables
+        """
+        schema = schema or self.schema
+        if foreign_keys not in FOREIGN_KEY_SOURCES:
+            raise Exception(
+                f"Foreign keys must come from one of {sorted(FOREIGN_KEY_SOURCES)}, "
+                f"not {foreign_keys}"
+            )
+        tables = list(dfs)
+
+        with PostgresConnection(
+            database_var=self.database_var, database_url=self.database_url
+        ) as connection:
+            declared = get_catalog_foreign_keys(tables, schema, connection)
+            declared_columns = {
+                (foreign_key["table"], tuple(foreign_key["columns"]))
+                for foreign_key in declared
+            }
+            inferred = []
+            if foreign_keys == "naming":
+                inferred = [
+                    foreign_key
+                    for foreign_key in get_naming_foreign_keys(
+                        {table: list(df.columns) for table, df in dfs.items()}
+                    )
+                    if (foreign_key["table"], tuple(foreign_key["columns"]))
+                    not in declared_columns
+                ]
+            # Case 1: Replace, nothing references the tables while they load
+            if if_exists == "replace":
+                levels = [sorted(tables)]
+                with connection.connection.begin():
+                    for query in get_drop_foreign_key_queries(declared, schema):
+                        connection.connection.execute(query)
+            # Case 2: Append, parents commit before the tables referencing them
+            else:
+                levels = get_load_levels(tables, declared + inferred)
+
+        try:
+            for level in levels:
+                level_kwargs = dict(export_kwargs)
+                # Tables loading at once would redraw over each other's console line
+                if (
+                    len(level) > 1
+                    and level_kwargs.get("progress") is None
+                    and level_kwargs.get("show_confirmation", True)
+                ):
+                    level_kwargs["progress"] = ConsoleProgress(finished_only=True)
+                with ThreadPoolExecutor(
+                    max_workers=max(1, min(max_workers, len(level)))
+                ) as pool:
+                    futures = [
+                        pool.submit(
+                            self.export_table,
+                            dfs[table],
+                            table,
+                            schema=schema,
+                            if_exists=if_exists,
+                            **level_kwargs,
+                        )
+                        for table in level
+                    ]
+                    for future in futures:
+                        future.result()
+        except Exception as error:
+            if if_exists == "replace":
+                failed = self.restore_foreign_keys(declared, schema)
+                if failed:
+                    raise Exception(
+                        f"Loading failed and foreign keys {failed} couldn't be "
+                        f"declared again"
+                    ) from error
+            raise
+
+        with PostgresConnection(
+            database_var=self.database_var, database_url=self.database_url
+        ) as connection:
+            existing_names = {
+                foreign_key["name"]
+                for foreign_key in get_catalog_foreign_keys(tables, schema, connection)
+            }
+            with connection.connection.begin():
+                for query in get_add_foreign_key_queries(
+                    declared + inferred, existing_names, schema
+                ):
+                    connection.connection.execute(query)
+        return levels
+
+    def restore_foreign_keys(self, foreign_keys, schema):
+        """
+        Declares dropped foreign keys again one by one, so one that no longer
+        holds doesn't keep the others from being restored
+        :param foreign_keys: catalog foreign keys
+        :param schema:
+        :return: names of the foreign keys that couldn't be declared
+        """
+        failed = []
+        with PostgresConnection(
+            database_var=self.database_var, database_url=self.database_url
+        ) as connection:
+            existing_names = {
+                foreign_key["name"]
+                for foreign_key in get_catalog_foreign_keys(
+                    {foreign_key["table"] for foreign_key in foreign_keys},
+                    schema,
+                    connection,
+                )
+            }
+            for foreign_key in foreign_keys:
+                try:
+                    with connection.connection.begin():
+                        for query in get_add_foreign_key_queries(
+                            [foreign_key], existing_names, schema
+                        ):
+                            connection.connection.execute(query)
+                except Exception:
+                    failed.append(foreign_key["name"])
+        return failed
 
     def declare_foreign_keys(self):
         """
@@ -135,7 +1704,9 @@ class PostgresDatabase:
         :return:
         """
 
-        with PostgresConnection(database_var=self.database_var) as connection:
+        with PostgresConnection(
+            database_var=self.database_var, database_url=self.database_url
+        ) as connection:
             table_query = (
                 f"select table_name\n"
                 f"from information_schema.tables\n"
@@ -0,0 +1,156 @@
+import importlib
+import os
+from datetime import timezone
+
+from siphon.type_conversion_utils import encode_copy_value
+
+ARROW_FILE_FORMATS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+}
+
+
+def import_pyarrow():
+    """
+    Imports pyarrow, which is only needed to read and write Parquet and Feather
+    files
+    :return: (pyarrow, pyarrow.parquet)
+    """
+    try:
+        return (
+            importlib.import_module("pyarrow"),
+            importlib.import_module("pyarrow.parquet"),
+        )
+    except ImportError:
+        raise Exception(
+            "Parquet and Feather files require pyarrow, "
+            "install it with pip install siphon[parquet]"
+        )
+
+
+def get_arrow_file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in ARROW_FILE_FORMATS:
+        raise Exception(
+            f"Unsupported file type {extension}, expected one of "
+            f"{', '.join(sorted(ARROW_FILE_FORMATS))}"
+        )
+    return ARROW_FILE_FORMATS[extension]
+
+
+def get_arrow_dtype(pa, col, arrow_type):
+    """
+    Maps an Arrow type to the siphon dataframe dtype it's loaded as
+    :param pa: pyarrow module
+    :param col: column name, for the error message
+    :param arrow_type:
+    :return: dataframe_dtype from the dtype lookup
+    """
+    types = pa.types
+    # Case 1: Scalars
+    if types.is_timestamp(arrow_type):
+        return "date"
+    elif types.is_date(arrow_type):
+        return "calendar_date"
+    elif types.is_boolean(arrow_type):
+        return "bool"
+    elif types.is_integer(arrow_type):
+        return "int"
+    elif types.is_floating(arrow_type) or types.is_decimal(arrow_type):
+        return "float"
+    elif types.is_string(arrow_type) or types.is_large_string(arrow_type):
+        return "string"
+    elif types.is_dictionary(arrow_type):
+        return "category"
+    elif types.is_struct(arrow_type):
+        return "json"
+    # Case 2: Arrays
+    elif types.is_list(arrow_type) or types.is_large_list(arrow_type):
+        value_type = arrow_type.value_type
+        if types.is_boolean(value_type):
+            return "bool_array"
+        elif types.is_integer(value_type):
+            return "int_array"
+        elif types.is_floating(value_type) or types.is_decimal(value_type):
+            return "float_array"
+        elif types.is_string(value_type) or types.is_large_string(value_type):
+            return "varchar_array"
+    raise Exception(f"Column {col} has Arrow type {arrow_type}, which can't be loaded")
+
+
+def get_arrow_dtypes(arrow_schema):
+    """
+    Creates a dtype dictionary from an Arrow schema, used instead of inferring
+    dtypes from the data
+    :param arrow_schema:
+    :return: column -> dataframe dtype
+    """
+    pa, _ = import_pyarrow()
+    return {
+        field.name: get_arrow_dtype(pa, field.name, field.type)
+        for field in arrow_schema
+    }
+
+
+def open_arrow_file(path):
+    """
+    Memory-maps a Parquet or Feather file. Batches are read one at a time: a row
+    group for Parquet, a record batch for Feather.
+    :param path:
+    :return: (Arrow schema, number of rows, iterator of Arrow tables)
+    """
+    pa, pq = import_pyarrow()
+    source = pa.memory_map(path)
+    if get_arrow_file_format(path) == "parquet":
+        parquet_file = pq.ParquetFile(source)
+        batches = (
+            parquet_file.read_row_group(i) for i in range(parquet_file.num_row_groups)
+        )
+        return parquet_file.schema_arrow, parquet_file.metadata.num_rows, batches
+    reader = pa.ipc.open_file(source)
+    # Batches are zero-copy views into the map, so counting rows reads no data
+    num_rows = sum(
+        reader.get_batch(i).num_rows for i in range(reader.num_record_batches)
+    )
+    batches = (
+        pa.Table.from_batches([reader.get_batch(i)])
+        for i in range(reader.num_record_batches)
+    )
+    return reader.schema, num_rows, batches
+
+
+def get_copy_columns(pa, table):
+    """
+    Turns an Arrow table's columns into python values COPY can encode. Naive
+    timestamps are read as UTC, like siphon's date conversion.
+    :param pa: pyarrow module
+    :param table:
+    :return: list of python value lists
+    """
+    columns = []
+    for column in table.columns:
+        values = column.to_pylist()
+        if pa.types.is_timestamp(column.type) and column.type.tz is None:
+            values = [
+                value if value is None else value.replace(tzinfo=timezone.utc)
+                for value in values
+            ]
+        columns.append(values)
+    return columns
+
+
+def encode_arrow_table(table):
+    """
+    Encodes an Arrow table in postgres COPY text format, column by column, with
+    the encoders copy_insert uses
+    :param table:
+    :return:
+    """
+    pa, _ = import_pyarrow()
+    lines = (
+        "\t".join(encode_copy_value(value) for value in row)
+        for row in zip(*get_copy_columns(pa, table))
+    )
+    return "".join(line + "\n" for line in lines)
@@ -0,0 +1,91 @@
+from siphon.progress_utils import estimate_bytes
+
+# Postgres' wire protocol caps a statement at 65535 bind parameters
+MAX_BIND_PARAMETERS = 65535
+
+# Client-side size a single INSERT batch is kept under
+MAX_BATCH_BYTES = 16 * 1024**2
+
+# Latency adaptive batching aims for per batch: long enough to amortize round
+# trips, short enough that the server parses reasonably sized statements
+TARGET_BATCH_SECONDS = 1.0
+
+MIN_BATCH_SIZE = 100
+
+
+def get_batch_size(
+    n_columns,
+    bytes_per_row,
+    max_parameters=MAX_BIND_PARAMETERS,
+    max_bytes=MAX_BATCH_BYTES,
+):
+    """
+    Largest batch that stays within the bind parameter limit and the byte budget
+    :param n_columns:
+    :param bytes_per_row: estimated in-memory bytes per row
+    :param max_parameters: bind parameter limit, or None when values aren't bound
+        (COPY)
+    :param max_bytes:
+    :return:
+    """
+    batch_size = max_bytes // max(int(bytes_per_row), 1)
+    if max_parameters:
+        batch_size = min(batch_size, max_parameters // max(n_columns, 1))
+    return max(batch_size, 1)
+
+
+class AdaptiveBatchSizer(object):
+    """
+    Tunes batch sizes from measured latency, aiming for batches that take about
+    target_seconds without going over max_batch_size
+    """
+
+    def __init__(
+        self,
+        max_batch_size,
+        min_batch_size=MIN_BATCH_SIZE,
+        target_seconds=TARGET_BATCH_SECONDS,
+    ):
+        """
+        :param max_batch_size: hard limit, e.g. from get_batch_size
+        :param min_batch_size:
+        :param target_seconds:
+        """
+        self.max_batch_size = max_batch_size
+        self.min_batch_size = min(min_batch_size, max_batch_size)
+        self.target_seconds = target_seconds
+        # Starts small and doubles while batches are fast
+        self.batch_size = max(self.min_batch_size, max_batch_size // 8)
+
+    def update(self, rows, seconds):
+        """
+        Sizes the next batch from the last one's throughput
+        :param rows: rows in the last batch
+        :param seconds: time the last batch took
+        :return: the next batch size
+        """
+        if rows and seconds > 0:
+            target_size = int(rows / seconds * self.target_seconds)
+            # Grows at most 2x per batch so one fast batch can't overshoot
+            batch_size = min(target_size, self.batch_size * 2)
+            self.batch_size = max(
+                self.min_batch_size, min(batch_size, self.max_batch_size)
+            )
+        return self.batch_size
+
+
+def get_export_batch_size(df, method, max_bytes=MAX_BATCH_BYTES):
+    """
+    Largest batch to send per INSERT or COPY for a dataframe. Only multi-row
+    INSERTs bind every value of the batch at once, so the parameter limit only
+    applies to them.
+    :param df:
+    :param method: export_table's load method
+    :param max_bytes: byte budget per batch
+    :return:
+    """
+    bytes_per_row = estimate_bytes(df) / max(df.shape[0], 1)
+    max_parameters = MAX_BIND_PARAMETERS if method == "multi" else None
+    return get_batch_size(
+        df.shape[1], bytes_per_row, max_parameters=max_parameters, max_bytes=max_bytes
+    )
@@ -0,0 +1,173 @@
+import hashlib
+import re
+
+from siphon.lazy_utils import lazy_import
+
+psycopg2 = lazy_import("psycopg2")
+sqlalchemy_exc = lazy_import("sqlalchemy.exc")
+
+CHECKPOINT_TABLE = "siphon_export_checkpoints"
+
+# Postgres truncates identifiers past this length
+MAX_IDENTIFIER_LENGTH = 63
+
+
+def get_staging_table(table, job_id):
+    """
+    Name of the table a batched replace loads into before it's swapped in. Names
+    too long for postgres shorten the table name and end in a hash of the table
+    and job, so two jobs never share a staging table.
+    :param table:
+    :param job_id:
+    :return:
+    """
+    job_suffix = re.sub(r"\W", "_", str(job_id)).lower()
+    staging_table = f"{table}_siphon_{job_suffix}"
+    if len(staging_table) > MAX_IDENTIFIER_LENGTH:
+        job_hash = hashlib.md5(f"{table}.{job_id}".encode()).hexdigest()[:10]
+        prefix_length = MAX_IDENTIFIER_LENGTH - len(f"_siphon_{job_hash}")
+        staging_table = f"{table[:prefix_length]}_siphon_{job_hash}"
+    if staging_table == table:
+        raise Exception(f"Staging table for job {job_id} would replace {table}")
+    return staging_table
+
+
+def get_retry_delay(attempt, retry_backoff):
+    """
+    Exponential backoff: retry_backoff seconds, then twice that, and so on
+    :param attempt: zero-based attempt that just failed
+    :param retry_backoff:
+    :return:
+    """
+    return retry_backoff * 2**attempt
+
+
+def check_transient_error(error):
+    """
+    Whether a failed batch is worth retrying: lost connections, timeouts,
+    deadlocks and serialization failures, but not bad data or SQL
+    :param error:
+    :return:
+    """
+    if isinstance(error, sqlalchemy_exc.DBAPIError) and error.connection_invalidated:
+        return True
+    original = getattr(error, "orig", error)
+    return isinstance(original, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+
+# Sidecar table
+def create_checkpoint_table(schema, connection):
+    query = (
+        f"create table if not exists {schema}.{CHECKPOINT_TABLE} (\n"
+        f"job_id varchar primary key,\n"
+        f"schema_name varchar,\n"
+        f"table_name varchar,\n"
+        f"rows_loaded bigint,\n"
+        f"status varchar,\n"
+        f"created_table boolean,\n"
+        f"total_rows bigint,\n"
+        f"updated_at timestamp with time zone default now())"
+    )
+    connection.connection.execute(query)
+    # Checkpoint tables from before created_table and total_rows were recorded
+    connection.connection.execute(
+        f"alter table {schema}.{CHECKPOINT_TABLE} "
+        f"add column if not exists created_table boolean, "
+        f"add column if not exists total_rows bigint"
+    )
+
+
+def load_checkpoint(job_id, schema, connection):
+    """
+    Loads an export job's progress
+    :param job_id:
+    :param schema:
+    :param connection:
+    :return: {'rows_loaded': ..., 'status': ..., 'created_table': ...,
+        'total_rows': ...}, or None for a new job
+    """
+    create_checkpoint_table(schema, connection)
+    query = (
+        f"select rows_loaded, status, created_table, total_rows\n"
+        f"from {schema}.{CHECKPOINT_TABLE}\n"
+        f"where job_id = %(job_id)s"
+    )
+    row = connection.connection.execute(query, {"job_id": job_id}).fetchone()
+    if row is None:
+        return None
+    return {
+        "rows_loaded": row[0],
+        "status": row[1],
+        "created_table": row[2],
+        "total_rows": row[3],
+    }
+
+
+def check_checkpoint_rows(checkpoint, job_id, total_rows):
+    """
+    Raises if a job is resumed with a different dataframe than it started with,
+    whose rows_loaded would skip the wrong rows. Checkpoints from before
+    total_rows was recorded aren't checked.
+    :param checkpoint: loaded checkpoint, or None for a new job
+    :param job_id:
+    :param total_rows: rows in the dataframe being exported
+    :return:
+    """
+    if checkpoint is None or checkpoint["total_rows"] is None:
+        return
+    if checkpoint["total_rows"] != total_rows:
+        raise Exception(
+            f"Job {job_id} started with {checkpoint['total_rows']} rows and can't "
+            f"resume with {total_rows}, export them with a new job_id"
+        )
+
+
+def save_checkpoint(
+    job_id,
+    table,
+    schema,
+    connection,
+    rows_loaded,
+    status="running",
+    created_table=None,
+    total_rows=None,
+):
+    """
+    Records an export job's progress. Run in the same transaction as the batch it
+    records so the two are committed together.
+    :param job_id:
+    :param table:
+    :param schema:
+    :param connection:
+    :param rows_loaded: rows committed so far
+    :param status: 'running' or 'complete'
+    :param created_table: whether the job creates the table, recorded when the
+        job starts so a resumed job still declares the key
+    :param total_rows: rows in the exported dataframe, recorded when the job
+        starts so it can't be resumed with another one
+    :return:
+    """
+    query = (
+        f"insert into {schema}.{CHECKPOINT_TABLE}\n"
+        f"(job_id, schema_name, table_name, rows_loaded, status, created_table,\n"
+        f"total_rows)\n"
+        f"values (%(job_id)s, %(schema)s, %(table)s, %(rows_loaded)s, %(status)s,\n"
+        f"%(created_table)s, %(total_rows)s)\n"
+        f"on conflict (job_id) do update set\n"
+        f"rows_loaded = excluded.rows_loaded,\n"
+        f"status = excluded.status,\n"
+        f"created_table = coalesce(excluded.created_table, "
+        f"{CHECKPOINT_TABLE}.created_table),\n"
+        f"total_rows = coalesce(excluded.total_rows, {CHECKPOINT_TABLE}.total_rows),\n"
+        f"updated_at = now()"
+    )
+    params = {
+        "job_id": job_id,
+        "schema": schema,
+        "table": table,
+        "rows_loaded": int(rows_loaded),
+        "status": status,
+        "created_table": created_table,
+        "total_rows": None if total_rows is None else int(total_rows),
+    }
+    connection.connection.execute(query, params)
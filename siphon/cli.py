@@ -0,0 +1,329 @@
+import argparse
+import os
+import time
+
+from siphon.PostgresDatabase import PostgresDatabase
+from siphon.lazy_utils import lazy_import
+from siphon.progress_utils import ConsoleProgress
+from siphon.transfer_utils import copy_table
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+FILE_FORMATS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".csv": "csv",
+    ".json": "json",
+}
+
+
+# Files
+def get_file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FILE_FORMATS:
+        raise Exception(
+            f"Unsupported file type {extension}, expected one of "
+            f"{', '.join(sorted(FILE_FORMATS))}"
+        )
+    return FILE_FORMATS[extension]
+
+
+def read_frame(path):
+    file_format = get_file_format(path)
+    if file_format == "parquet":
+        return pd.read_parquet(path)
+    elif file_format == "feather":
+        return pd.read_feather(path)
+    elif file_format == "csv":
+        return pd.read_csv(path)
+    else:
+        return pd.read_json(path, orient="records", lines=True)
+
+
+def write_frames(dfs, path):
+    """
+    Writes dataframes to one file. CSV and JSON lines are appended chunk by chunk;
+    Parquet and Feather need the whole frame.
+    :param dfs: iterable of dataframes with the same columns
+    :param path:
+    :return: rows written
+    """
+    file_format = get_file_format(path)
+    rows = 0
+    if file_format in {"csv", "json"}:
+        with open(path, "w") as f:
+            for i, df in enumerate(dfs):
+                if file_format == "csv":
+                    df.to_csv(f, header=i == 0, index=False)
+                else:
+                    text = df.to_json(orient="records", lines=True, date_format="iso")
+                    # Newer pandas ends JSON lines with a newline, older doesn't
+                    f.write(text if not text or text.endswith("\n") else text + "\n")
+                rows += df.shape[0]
+        return rows
+    df = pd.concat(list(dfs), ignore_index=True)
+    if file_format == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_feather(path)
+    return df.shape[0]
+
+
+def split_table_name(name, default_schema):
+    """
+    Splits 'schema.table' into its parts
+    :param name:
+    :param default_schema: used when no schema is given
+    :return: (schema, table)
+    """
+    if "." in name:
+        schema, table = name.split(".", 1)
+        return schema, table
+    return default_schema, name
+
+
+# Commands
+def get_database(args, database_url=None):
+    return PostgresDatabase(
+        schema=args.schema,
+        database_var=args.database_var,
+        database_url=database_url or args.database_url,
+        float_dtype=args.float_dtype,
+        conversion_workers=args.workers,
+        parallel=args.parallel,
+        memory_budget=args.memory_budget,
+    )
+
+
+def get_progress(args):
+    return None if args.quiet else ConsoleProgress()
+
+
+def run_export(args):
+    db = get_database(args)
+    if args.direct:
+        db.export_file(
+            args.path,
+            args.table,
+            if_exists=args.if_exists,
+            index_workers=args.index_workers,
+            progress=get_progress(args),
+        )
+        return
+    df = read_frame(args.path)
+    db.export_table(
+        df,
+        args.table,
+        if_exists=args.if_exists,
+        method=args.method,
+        show_confirmation=False,
+        progress=get_progress(args),
+        batch_size=args.batch_size,
+        job_id=args.job_id,
+        index_workers=args.index_workers,
+        sort_by=args.sort_by,
+        brin_index=args.brin,
+        cluster=args.cluster,
+    )
+
+
+def run_unload(args):
+    db = get_database(args)
+    schema, table = split_table_name(args.table, args.schema)
+    if get_file_format(args.path) in {"parquet", "feather"}:
+        db.unload_table(
+            table,
+            args.path,
+            schema=schema,
+            row_group_size=args.chunk_size,
+            partitions=args.partitions,
+            progress=get_progress(args),
+        )
+        return
+    chunks = db.get_query_chunks(
+        f"select * from {schema}.{table}",
+        chunksize=args.chunk_size,
+        dictionary_encode=args.dictionary_encode,
+        progress=get_progress(args),
+    )
+    write_frames(chunks, args.path)
+
+
+def run_copy(args):
+    source_db = get_database(args, database_url=args.source_url)
+    target_db = get_database(args, database_url=args.target_url)
+    row_counts = copy_table(
+        source_db,
+        target_db,
+        args.tables,
+        target_schema=args.target_schema,
+        if_exists=args.if_exists,
+        max_workers=args.workers,
+    )
+    if not args.quiet:
+        for table, row_count in row_counts.items():
+            print(f"{table}: {row_count:,} rows")
+
+
+def get_bench_df(rows, seed=0):
+    """
+    Synthetic frame covering siphon's common dtypes
+    :param rows:
+    :param seed:
+    :return:
+    """
+    random = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "id": np.arange(rows),
+            "amount": random.normal(100, 25, rows).round(2),
+            "active": random.random(rows) < 0.5,
+            "status": random.choice(["open", "closed", "pending"], rows),
+            "created_at": pd.Timestamp("2020-01-01", tz="UTC")
+            + pd.to_timedelta(random.integers(0, 10**8, rows), unit="s"),
+            "tags": [["a", "b"] if i % 2 else ["c"] for i in range(rows)],
+        }
+    )
+
+
+def run_bench(args):
+    db = get_database(args)
+    df = get_bench_df(args.rows)
+    for method in args.methods:
+        start = time.time()
+        db.export_table(
+            df.copy(),
+            args.table,
+            method=method,
+            show_confirmation=False,
+            batch_size=args.batch_size,
+            analyze=False,
+        )
+        elapsed_time = time.time() - start
+        print(f"export {method}: {args.rows / elapsed_time:,.0f} rows/s")
+    start = time.time()
+    db.get_table(args.table)
+    elapsed_time = time.time() - start
+    print(f"get_table: {args.rows / elapsed_time:,.0f} rows/s")
+
+
+# Parser
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--schema", default="raw")
+    common.add_argument("--database-url", help="connection string")
+    common.add_argument(
+        "--database-var",
+        default="CAM_DATABASE_URL",
+        help="environment variable holding the connection string",
+    )
+    common.add_argument(
+        "--float-dtype",
+        default="numeric",
+        choices=["numeric", "double precision", "real"],
+    )
+    common.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="columns converted, or tables copied, concurrently",
+    )
+    common.add_argument("--parallel", default="thread", choices=["thread", "process"])
+    common.add_argument(
+        "--memory-budget", help="memory siphon may use, e.g. 2GB; larger reads fail"
+    )
+    common.add_argument("--quiet", action="store_true", help="hide progress")
+
+    parser = argparse.ArgumentParser(
+        prog="siphon", description="Bulk transfers between files, pandas and postgres"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export = subparsers.add_parser(
+        "export", parents=[common], help="load a file into a table"
+    )
+    export.add_argument("path")
+    export.add_argument("--table", required=True)
+    export.add_argument(
+        "--method", default="multi", choices=["multi", "copy", "values"]
+    )
+    export.add_argument(
+        "--batch-size", type=int, help="rows committed per batch, resumable"
+    )
+    export.add_argument(
+        "--if-exists", default="replace", choices=["fail", "replace", "append"]
+    )
+    export.add_argument("--job-id", help="batched export to start or resume")
+    export.add_argument("--index-workers", type=int, default=1)
+    export.add_argument(
+        "--sort-by", nargs="+", help="columns rows are stored in order of"
+    )
+    export.add_argument(
+        "--brin", action="store_true", help="BRIN index the first sort column"
+    )
+    export.add_argument(
+        "--cluster", action="store_true", help="CLUSTER on the sort columns"
+    )
+    export.add_argument(
+        "--direct",
+        action="store_true",
+        help="load Parquet/Feather row groups with COPY using the file's own "
+        "types, without pandas",
+    )
+    export.set_defaults(func=run_export)
+
+    unload = subparsers.add_parser(
+        "unload", parents=[common], help="write a table to a file"
+    )
+    unload.add_argument("table", help="table or schema.table")
+    unload.add_argument("path")
+    unload.add_argument(
+        "--chunk-size", type=int, default=100000, help="rows per chunk or row group"
+    )
+    unload.add_argument(
+        "--partitions",
+        type=int,
+        default=1,
+        help="Parquet/Feather files written in parallel into a directory at path",
+    )
+    unload.add_argument("--dictionary-encode", action="store_true")
+    unload.set_defaults(func=run_unload)
+
+    copy = subparsers.add_parser(
+        "copy", parents=[common], help="copy tables between databases"
+    )
+    copy.add_argument("tables", nargs="+")
+    copy.add_argument("--from", dest="source_url", required=True)
+    copy.add_argument("--to", dest="target_url", required=True)
+    copy.add_argument("--target-schema")
+    copy.add_argument(
+        "--if-exists", default="fail", choices=["fail", "replace", "append"]
+    )
+    copy.set_defaults(func=run_copy)
+
+    bench = subparsers.add_parser(
+        "bench", parents=[common], help="measure load and read throughput"
+    )
+    bench.add_argument("--rows", type=int, default=100000)
+    bench.add_argument(
+        "--methods",
+        nargs="+",
+        default=["multi", "copy"],
+        choices=["multi", "copy", "values"],
+    )
+    bench.add_argument("--batch-size", type=int)
+    bench.add_argument("--table", default="siphon_bench")
+    bench.set_defaults(func=run_bench)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
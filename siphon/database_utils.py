@@ -1,17 +1,32 @@
-import pandas as pd
+from __future__ import annotations
+
+import io
 
-# SQL
 import siphon.type_conversion_utils
+from siphon.batch_utils import MAX_BIND_PARAMETERS
+from siphon.lazy_utils import lazy_import
 from siphon.type_checking_utils import (
     check_dtype_date,
     check_dtype_array,
     check_dtype_boolean,
+    check_dtype_category,
+    check_dtype_string,
 )
 from siphon.type_conversion_utils import (
     convert_to_tuple,
+    adapt_insert_value,
     convert_to_boolean,
+    encode_copy_value,
 )
 
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# SQL
+sqlalchemy = lazy_import("sqlalchemy")
+postgresql = lazy_import("sqlalchemy.dialects.postgresql")
+psycopg2_extras = lazy_import("psycopg2.extras")
+
 
 def convert_csv_dtypes(df: pd.DataFrame):
     for col in df.columns:
@@ -74,3 +89,437 @@ def declare_primary_key(df, table, schema, connection):
     if id_col in df.columns:
         primary_key_query = f"alter table {schema}.{table} add primary key ({id_col})"
         connection.connection.execute(primary_key_query)
+
+
+def get_table_ddl(table, schema, dtype_param):
+    """
+    Renders the create table statement for a postgres dtype dictionary
+    :param table:
+    :param schema:
+    :param dtype_param: column -> sqlalchemy postgres dtype
+    :return:
+    """
+    columns = [sqlalchemy.Column(col, dtype) for col, dtype in dtype_param.items()]
+    sql_table = sqlalchemy.Table(table, sqlalchemy.MetaData(), *columns, schema=schema)
+    create_table = sqlalchemy.schema.CreateTable(sql_table)
+    return str(create_table.compile(dialect=postgresql.dialect())).strip()
+
+
+# Value ranges of the integer columns that can be widened in place to bigint
+WIDENABLE_INT_RANGES = {
+    "smallint": (-(2**15), 2**15 - 1),
+    "integer": (-(2**31), 2**31 - 1),
+}
+
+
+def get_postgres_type_name(dtype):
+    """
+    Renders a sqlalchemy postgres dtype as it's written in DDL
+    :param dtype:
+    :return:
+    """
+    return sqlalchemy.types.to_instance(dtype).compile(dialect=postgresql.dialect())
+
+
+def get_enum_name(table, col):
+    # Suffixed so it can't clash with the row type of a relation named table_col
+    return f"{table}_{col}_enum"
+
+
+def get_enum_dtype(df, table, schema, col):
+    """
+    Creates the postgres enum a categorical column is stored as
+    :param df:
+    :param table:
+    :param schema:
+    :param col:
+    :return:
+    """
+    categories = [str(category) for category in df[col].cat.categories]
+    return postgresql.ENUM(*categories, name=get_enum_name(table, col), schema=schema)
+
+
+def quote_literal(value):
+    escaped_value = str(value).replace("'", "''")
+    return f"'{escaped_value}'"
+
+
+def get_enum_ddl(enum_dtype):
+    values = ", ".join(quote_literal(value) for value in enum_dtype.enums)
+    return f"create type {get_postgres_type_name(enum_dtype)} as enum ({values})"
+
+
+def get_database_columns(table, schema, connection):
+    """
+    Retrieves each column's data type, maximum character length and underlying
+    type name
+    :param table:
+    :param schema:
+    :param connection:
+    :return: column -> {'data_type': ..., 'character_maximum_length': ...,
+        'udt_schema': ..., 'udt_name': ...}
+    """
+    query = (
+        f"select column_name, data_type, character_maximum_length,\n"
+        f"udt_schema, udt_name\n"
+        f"from information_schema.columns\n"
+        f"where table_schema = '{schema}'\n"
+        f"and table_name = '{table}'\n"
+    )
+    df = pd.read_sql_query(query, con=connection.connection)
+    return df.set_index("column_name").to_dict("index")
+
+
+def scale_row_estimate(reltuples, relpages, pages):
+    """
+    Scales the rows counted at the last VACUUM/ANALYZE to the table's current
+    size in pages, like the planner does
+    :param reltuples: pg_class.reltuples, -1 if never analyzed (Postgres 14+)
+    :param relpages: pg_class.relpages, from the same VACUUM/ANALYZE
+    :param pages: current size in pages
+    :return: estimated rows, or None if the statistics can't tell
+    """
+    if pages == 0:
+        return 0
+    # Before Postgres 14 a table that was never analyzed has reltuples = 0
+    elif reltuples <= 0:
+        return None
+    elif relpages > 0:
+        return int(reltuples / relpages * pages)
+    return int(reltuples)
+
+
+def get_row_estimate(table, schema, connection):
+    """
+    Reads the planner's row count estimate (pg_class.reltuples), which is free
+    compared to count(*)
+    :param table:
+    :param schema:
+    :param connection:
+    :return: estimated rows, or None if the table has never been analyzed
+    """
+    query = (
+        f"select c.reltuples, c.relpages,\n"
+        f"pg_relation_size(c.oid) / current_setting('block_size')::int\n"
+        f"from pg_class c\n"
+        f"join pg_namespace n on n.oid = c.relnamespace\n"
+        f"where n.nspname = '{schema}' and c.relname = '{table}'"
+    )
+    row = connection.connection.execute(query).fetchone()
+    if row is None:
+        return None
+    return scale_row_estimate(*row)
+
+
+def get_distinct_ratios(table, schema, connection):
+    """
+    Reads each column's share of distinct values from the planner statistics
+    (pg_stats). Columns the table hasn't been analyzed for are left out.
+    :param table:
+    :param schema:
+    :param connection:
+    :return: column -> share of distinct values
+    """
+    query = (
+        f"select s.attname, s.n_distinct, c.reltuples\n"
+        f"from pg_stats s\n"
+        f"join pg_namespace n on n.nspname = s.schemaname\n"
+        f"join pg_class c on c.relnamespace = n.oid and c.relname = s.tablename\n"
+        f"where s.schemaname = '{schema}'\n"
+        f"and s.tablename = '{table}'\n"
+    )
+    df = pd.read_sql_query(query, con=connection.connection)
+    # Negative n_distinct is already a share of rows, positive is a count
+    df["distinct_ratio"] = np.where(
+        df["n_distinct"] < 0,
+        -df["n_distinct"],
+        df["n_distinct"] / df["reltuples"].where(df["reltuples"] > 0),
+    )
+    df = df.dropna(subset=["distinct_ratio"])
+    return df.set_index("attname")["distinct_ratio"].to_dict()
+
+
+def get_schema_evolution_queries(
+    df, table, schema, df_dtype_dict, dtype_param, db_columns
+):
+    """
+    Creates the alter table statements an append needs so the frame fits the
+    existing table: new columns are added and columns are widened where that's
+    safe (smallint/integer to bigint, real to a wider float, varchar(n) to an
+    unbounded varchar, new enum values). Nothing is dropped or narrowed, and
+    columns are only widened when the frame's values don't fit, since widening
+    rewrites the table.
+    :param df: converted dataframe
+    :param table:
+    :param schema:
+    :param df_dtype_dict: column -> siphon dtype
+    :param dtype_param: column -> sqlalchemy postgres dtype
+    :param db_columns: existing columns, as returned by get_database_columns
+    :return:
+    """
+    queries = []
+
+    for col, dtype in df_dtype_dict.items():
+        type_name = get_postgres_type_name(dtype_param[col])
+        # Case 1: New column
+        if col not in db_columns:
+            if check_dtype_category(dtype=dtype):
+                queries.append(get_enum_ddl(dtype_param[col]))
+            queries.append(f"alter table {schema}.{table} add column {col} {type_name}")
+            continue
+
+        data_type = db_columns[col]["data_type"]
+        max_length = db_columns[col]["character_maximum_length"]
+        # Enum values that don't exist yet
+        if check_dtype_category(dtype=dtype) and data_type == "USER-DEFINED":
+            enum_name = f"{db_columns[col]['udt_schema']}.{db_columns[col]['udt_name']}"
+            queries.extend(
+                f"alter type {enum_name} add value if not exists {quote_literal(value)}"
+                for value in dtype_param[col].enums
+            )
+            continue
+        # Case 2: Integers outside the stored type's range
+        if (
+            dtype == "int"
+            and data_type in WIDENABLE_INT_RANGES
+            and df[col].notna().any()
+            and (
+                df[col].min() < WIDENABLE_INT_RANGES[data_type][0]
+                or df[col].max() > WIDENABLE_INT_RANGES[data_type][1]
+            )
+        ):
+            widened_type = type_name
+        # Case 3: Single precision floats
+        elif dtype == "float" and data_type == "real" and type_name != "REAL":
+            widened_type = type_name
+        # Case 4: Strings longer than a varchar limit
+        elif (
+            check_dtype_string(dtype=dtype)
+            and data_type == "character varying"
+            and pd.notna(max_length)
+            and df[col].str.len().max() > max_length
+        ):
+            widened_type = "VARCHAR"
+        else:
+            continue
+        queries.append(
+            f"alter table {schema}.{table} alter column {col} type {widened_type}"
+        )
+
+    return queries
+
+
+def get_swap_queries(staging_table, table, schema, enum_cols=None):
+    """
+    Replaces a table with a fully loaded staging table. Run in one transaction so
+    readers see either the old table or the new one.
+    :param staging_table:
+    :param table:
+    :param schema:
+    :param enum_cols: categorical columns whose enum types are renamed with the table
+    :return:
+    """
+    queries = [f"drop table if exists {schema}.{table} cascade"]
+    for col in enum_cols or []:
+        queries += [
+            f"drop type if exists {schema}.{get_enum_name(table, col)}",
+            f"alter type {schema}.{get_enum_name(staging_table, col)} "
+            f"rename to {get_enum_name(table, col)}",
+        ]
+    queries.append(f"alter table {schema}.{staging_table} rename to {table}")
+    return queries
+
+
+def copy_insert(table, conn, keys, data_iter):
+    """
+    pandas to_sql method loading rows with COPY FROM STDIN instead of INSERT.
+    Values are encoded in COPY text format, so arrays, JSON and enums are sent
+    in their native postgres form.
+    :param table: pandas SQLTable
+    :param conn: sqlalchemy connection
+    :param keys: column names
+    :param data_iter: row tuples
+    :return:
+    """
+    buffer = io.StringIO()
+    for row in data_iter:
+        buffer.write("\t".join(encode_copy_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    table_name = f"{table.schema}.{table.name}" if table.schema else table.name
+    copy_query = f"copy {table_name} ({', '.join(keys)}) from stdin"
+    cursor = conn.connection.cursor()
+    cursor.copy_expert(copy_query, buffer)
+    cursor.close()
+
+
+def execute_values_insert(table, conn, keys, data_iter):
+    """
+    pandas to_sql method paging rows into multi-row INSERTs with psycopg2's
+    execute_values, for targets where COPY isn't permitted. Each page stays under
+    the bind parameter limit.
+    :param table: pandas SQLTable
+    :param conn: sqlalchemy connection
+    :param keys: column names
+    :param data_iter: row tuples
+    :return:
+    """
+    rows = [tuple(adapt_insert_value(value) for value in row) for row in data_iter]
+    table_name = f"{table.schema}.{table.name}" if table.schema else table.name
+    insert_query = f"insert into {table_name} ({', '.join(keys)}) values %s"
+    page_size = max(1, min(1000, MAX_BIND_PARAMETERS // max(len(keys), 1)))
+    cursor = conn.connection.cursor()
+    psycopg2_extras.execute_values(cursor, insert_query, rows, page_size=page_size)
+    cursor.close()
+
+
+def get_insert_method(method):
+    """
+    Maps export_table's method to a pandas to_sql method
+    :param method: 'copy', 'values', or a to_sql method such as 'multi'
+    :return:
+    """
+    if method == "copy":
+        return copy_insert
+    elif method == "values":
+        return execute_values_insert
+    return method
+
+
+def get_index_name(table, columns, suffix="idx"):
+    return f"{table}_{'_'.join(columns)}_{suffix}"
+
+
+def create_index(table, schema, columns, connection):
+    """
+    Adds a secondary index
+    :param table:
+    :param schema:
+    :param columns: column name or list of column names
+    :param connection:
+    :return:
+    """
+    if type(columns) == str:
+        columns = [columns]
+    index_name = get_index_name(table, columns)
+    index_query = (
+        f"create index if not exists {index_name}\n"
+        f"on {schema}.{table} ({', '.join(columns)})"
+    )
+    connection.connection.execute(index_query)
+
+
+def create_brin_index(table, schema, col, connection):
+    """
+    Adds a BRIN index, which stores only each block range's min and max and so
+    stays tiny, but only helps on a column that follows the physical row order.
+    Ranges appended later are summarized by autovacuum.
+    :param table:
+    :param schema:
+    :param col:
+    :param connection:
+    :return:
+    """
+    index_name = get_index_name(table, [col], suffix="brin")
+    index_query = (
+        f"create index if not exists {index_name}\n"
+        f"on {schema}.{table} using brin ({col}) with (autosummarize = on)"
+    )
+    connection.connection.execute(index_query)
+
+
+def cluster_table(table, schema, columns, connection):
+    """
+    Rewrites a table in the order of a btree index on some columns, creating the
+    index if needed. The index is remembered, so a later plain CLUSTER re-sorts
+    the table after appends.
+    :param table:
+    :param schema:
+    :param columns:
+    :param connection:
+    :return:
+    """
+    if type(columns) == str:
+        columns = [columns]
+    create_index(table, schema, columns, connection)
+    index_name = get_index_name(table, columns)
+    connection.connection.execute(f"cluster {schema}.{table} using {index_name}")
+
+
+def sort_dataframe(df, sort_by):
+    """
+    Sorts a converted dataframe before loading so rows are stored in that order.
+    Mergesort is stable, so rows with equal keys keep their order and resumed
+    batched exports see the same rows in the same batches.
+    :param df:
+    :param sort_by: column name or list of column names
+    :return:
+    """
+    if type(sort_by) == str:
+        sort_by = [sort_by]
+    missing = [col for col in sort_by if col not in df.columns]
+    if missing:
+        raise Exception(f"Sort columns {missing} are not in the dataframe")
+    return df.sort_values(
+        sort_by, kind="mergesort", na_position="last", ignore_index=True
+    )
+
+
+def set_maintenance_work_mem(connection, maintenance_work_mem):
+    """
+    Raises the memory available to index builds for the rest of the session
+    :param connection:
+    :param maintenance_work_mem: postgres memory setting, e.g. '1GB'
+    :return:
+    """
+    connection.connection.execute(
+        f"set maintenance_work_mem = '{maintenance_work_mem}'"
+    )
+
+
+def analyze_table(table, schema, connection):
+    """
+    Refreshes planner statistics so queries right after a load get good plans
+    :param table:
+    :param schema:
+    :param connection:
+    :return:
+    """
+    connection.connection.execution_options(autocommit=True).execute(
+        f"analyze {schema}.{table}"
+    )
+
+
+def get_watermark(series, since=None):
+    """
+    Returns the high-water mark of a watermark column as a plain python value
+    so it can be passed back as a query parameter. Falls back to `since` when
+    there are no new rows.
+    :param series:
+    :param since:
+    :return:
+    """
+    watermark = series.max() if series.shape[0] > 0 else since
+    if pd.isna(watermark):
+        return since
+    elif isinstance(watermark, pd.Timestamp):
+        return watermark.to_pydatetime()
+    elif hasattr(watermark, "item"):
+        return watermark.item()
+    return watermark
+
+
+def merge_incremental(cached_df, new_df, id_col="id"):
+    """
+    Merges newly read rows into a cached dataframe. Rows sharing an id with a
+    cached row replace it so updated rows aren't duplicated.
+    :param cached_df:
+    :param new_df:
+    :param id_col:
+    :return:
+    """
+    df = pd.concat([cached_df, new_df], ignore_index=True)
+    if id_col in df.columns:
+        df = df.drop_duplicates(subset=[id_col], keep="last")
+    return df.reset_index(drop=True)
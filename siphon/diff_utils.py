@@ -0,0 +1,268 @@
+import hashlib
+import json
+
+from siphon.lazy_utils import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Rows per bucket the table and the frame are compared in
+DIFF_BUCKET_SIZE = 10000
+
+# Separates values in a row's hashed text; missing values are written as \N
+DIFF_SEPARATOR = "\x1f"
+DIFF_NULL = "\\N"
+
+INTEGER_DESCRIPTIONS = {"smallint", "integer", "bigint"}
+FLOAT_DESCRIPTIONS = {"numeric", "real", "double precision"}
+TIMESTAMP_DESCRIPTIONS = {"timestamp with time zone", "timestamp without time zone"}
+
+# Decimal places floats are compared at
+FLOAT_PRECISION = 6
+
+
+# Server side
+def get_hash_expression(col, description):
+    """
+    Renders a column as text the same way render_column does client-side, so
+    equal values hash alike
+    :param col:
+    :param description: the column's postgres description
+    :return:
+    """
+    # Case 1: Numbers
+    if description in INTEGER_DESCRIPTIONS:
+        expression = f"{col}::text"
+    elif description in FLOAT_DESCRIPTIONS:
+        expression = (
+            f"case when {col}::float8 in ('Infinity', '-Infinity') then {col}::text "
+            f"else round({col}::numeric, {FLOAT_PRECISION})::text end"
+        )
+    # Case 2: Dates, as microseconds or days since the epoch
+    elif description in TIMESTAMP_DESCRIPTIONS:
+        expression = f"(extract(epoch from {col}) * 1000000)::bigint::text"
+    elif description == "date":
+        expression = f"({col} - date '1970-01-01')::text"
+    # Case 3: Arrays, as compact JSON
+    elif description == "ARRAY" or description.endswith("[]"):
+        expression = f"array_to_json({col})::text"
+    else:
+        expression = f"{col}::text"
+    return f"coalesce({expression}, '{DIFF_NULL}')"
+
+
+def get_row_expression(cols, db_dtype_dict):
+    separator = " || chr(31) || "
+    return separator.join(get_hash_expression(col, db_dtype_dict[col]) for col in cols)
+
+
+def check_range_buckets(key_cols, db_dtype_dict):
+    """
+    A single integer key is bucketed by ranges of key values, which the fetch
+    can read through the key's index. Other keys are bucketed by the md5 of
+    their text.
+    :param key_cols:
+    :param db_dtype_dict:
+    :return:
+    """
+    return len(key_cols) == 1 and db_dtype_dict[key_cols[0]] in INTEGER_DESCRIPTIONS
+
+
+def get_bucket_expression(key_cols, db_dtype_dict, bucket_size, n_buckets):
+    if check_range_buckets(key_cols, db_dtype_dict):
+        return f"floor({key_cols[0]}::numeric / {bucket_size})::bigint"
+    key_expression = get_row_expression(key_cols, db_dtype_dict)
+    return f"('x' || substr(md5({key_expression}), 1, 7))::bit(28)::int % {n_buckets}"
+
+
+def get_bucket_hash_query(
+    table, schema, cols, key_cols, db_dtype_dict, bucket_size, n_buckets
+):
+    """
+    Aggregates the table into one row count and md5 per bucket. Row hashes are
+    concatenated in hash order, which doesn't depend on collation or row order.
+    :param table:
+    :param schema:
+    :param cols: compared columns
+    :param key_cols:
+    :param db_dtype_dict:
+    :param bucket_size:
+    :param n_buckets:
+    :return:
+    """
+    bucket_expression = get_bucket_expression(
+        key_cols, db_dtype_dict, bucket_size, n_buckets
+    )
+    return (
+        f"select bucket, count(*) as row_count,\n"
+        f"md5(string_agg(row_hash, '' order by row_hash collate \"C\")) "
+        f"as bucket_hash\n"
+        f"from (\n"
+        f"select {bucket_expression} as bucket,\n"
+        f"md5({get_row_expression(cols, db_dtype_dict)}) as row_hash\n"
+        f"from {schema}.{table}\n"
+        f") rows\n"
+        f"group by bucket"
+    )
+
+
+def get_bucket_filter(buckets, key_cols, db_dtype_dict, bucket_size, n_buckets):
+    """
+    Where clause selecting the rows of some buckets
+    :param buckets:
+    :param key_cols:
+    :param db_dtype_dict:
+    :param bucket_size:
+    :param n_buckets:
+    :return:
+    """
+    if check_range_buckets(key_cols, db_dtype_dict):
+        key = key_cols[0]
+        ranges = [
+            f"({key} >= {bucket * bucket_size} and {key} < {(bucket + 1) * bucket_size})"
+            for bucket in buckets
+        ]
+        return "where " + "\nor ".join(ranges)
+    bucket_expression = get_bucket_expression(
+        key_cols, db_dtype_dict, bucket_size, n_buckets
+    )
+    return f"where {bucket_expression} in ({', '.join(str(b) for b in buckets)})"
+
+
+# Client side
+def render_float(value):
+    if np.isinf(value):
+        return "Infinity" if value > 0 else "-Infinity"
+    return f"{value:.{FLOAT_PRECISION}f}"
+
+
+def render_column(series, dtype):
+    """
+    Renders a converted column as the text get_hash_expression produces
+    :param series:
+    :param dtype: siphon dtype, or None for unmapped columns
+    :return: series of strings
+    """
+    text = pd.Series(DIFF_NULL, index=series.index, dtype=object)
+    mask = series.isna()
+    values = series[~mask]
+    if values.shape[0] == 0:
+        return text
+    # Case 1: Numbers
+    if dtype == "int":
+        rendered = values.astype("int64").astype(str)
+    elif dtype == "float":
+        rendered = values.astype(float).map(render_float)
+    elif dtype == "bool":
+        rendered = values.map(lambda value: "true" if value else "false")
+    # Case 2: Dates
+    elif dtype == "date":
+        microseconds = pd.to_datetime(values, utc=True).values.astype("datetime64[us]")
+        rendered = pd.Series(microseconds.astype("int64"), index=values.index)
+        rendered = rendered.astype(str)
+    elif dtype == "calendar_date":
+        days = pd.to_datetime(values).values.astype("datetime64[D]")
+        rendered = pd.Series(days.astype("int64"), index=values.index).astype(str)
+    # Case 3: Arrays and JSON
+    elif dtype is not None and dtype.endswith("_array"):
+        rendered = values.map(
+            lambda value: json.dumps(
+                list(value), separators=(",", ":"), ensure_ascii=False, default=str
+            )
+        )
+    elif dtype == "json":
+        rendered = values.map(lambda value: json.dumps(value, ensure_ascii=False))
+    else:
+        rendered = values.astype(str)
+    text[~mask] = rendered
+    return text
+
+
+def get_row_texts(df, cols, df_dtype_dict):
+    texts = [render_column(df[col], df_dtype_dict.get(col)) for col in cols]
+    if len(texts) == 1:
+        return texts[0]
+    return texts[0].str.cat(texts[1:], sep=DIFF_SEPARATOR)
+
+
+def get_row_hashes(df, cols, df_dtype_dict):
+    texts = get_row_texts(df, cols, df_dtype_dict)
+    return pd.Series(
+        [hashlib.md5(text.encode()).hexdigest() for text in texts],
+        index=df.index,
+        dtype=object,
+    )
+
+
+def get_buckets(df, key_cols, db_dtype_dict, df_dtype_dict, bucket_size, n_buckets):
+    if check_range_buckets(key_cols, db_dtype_dict):
+        return df[key_cols[0]].astype("int64") // bucket_size
+    key_hashes = get_row_hashes(df, key_cols, df_dtype_dict)
+    return key_hashes.str[:7].map(lambda prefix: int(prefix, 16) % n_buckets)
+
+
+def get_bucket_hashes(buckets, row_hashes):
+    """
+    Aggregates row hashes per bucket like get_bucket_hash_query
+    :param buckets:
+    :param row_hashes:
+    :return: dataframe of row_count and bucket_hash indexed by bucket
+    """
+    hash_df = pd.DataFrame({"bucket": buckets.values, "row_hash": row_hashes.values})
+    hash_df = hash_df.sort_values("row_hash", kind="mergesort")
+    grouped = hash_df.groupby("bucket")["row_hash"]
+    return pd.DataFrame(
+        {
+            "row_count": grouped.size(),
+            "bucket_hash": grouped.agg(
+                lambda hashes: hashlib.md5("".join(hashes).encode()).hexdigest()
+            ),
+        }
+    )
+
+
+def get_mismatched_buckets(client_hash_df, server_hash_df):
+    """
+    Buckets whose row count or hash differ, including buckets only one side has
+    :param client_hash_df:
+    :param server_hash_df:
+    :return: sorted bucket list
+    """
+    merged_df = client_hash_df.join(
+        server_hash_df, how="outer", lsuffix="_client", rsuffix="_server"
+    )
+    mismatched = (merged_df["row_count_client"] != merged_df["row_count_server"]) | (
+        merged_df["bucket_hash_client"] != merged_df["bucket_hash_server"]
+    )
+    return sorted(int(bucket) for bucket in merged_df.index[mismatched])
+
+
+def get_key_changes(df, db_df, key_cols, cols, df_dtype_dict):
+    """
+    Compares rows of the mismatched buckets key by key
+    :param df: frame rows in the mismatched buckets
+    :param db_df: table rows in the mismatched buckets
+    :param key_cols:
+    :param cols: compared columns
+    :param df_dtype_dict:
+    :return: {'inserted': ..., 'updated': ..., 'deleted': ...} key dataframes
+    """
+    client_df = df[key_cols].copy()
+    client_df["row_hash"] = get_row_hashes(df, cols, df_dtype_dict)
+    server_df = db_df[key_cols].copy()
+    server_df["row_hash"] = get_row_hashes(db_df, cols, df_dtype_dict)
+    merged_df = client_df.merge(
+        server_df,
+        on=key_cols,
+        how="outer",
+        suffixes=("_client", "_server"),
+        indicator=True,
+    )
+    updated = (merged_df["_merge"] == "both") & (
+        merged_df["row_hash_client"] != merged_df["row_hash_server"]
+    )
+    return {
+        "inserted": merged_df.loc[merged_df["_merge"] == "left_only", key_cols],
+        "updated": merged_df.loc[updated, key_cols],
+        "deleted": merged_df.loc[merged_df["_merge"] == "right_only", key_cols],
+    }
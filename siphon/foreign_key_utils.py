@@ -0,0 +1,167 @@
+from siphon.checkpoint_utils import MAX_IDENTIFIER_LENGTH
+from siphon.database_utils import get_reference_table
+
+FOREIGN_KEY_SOURCES = {"naming", "catalog"}
+
+
+def get_foreign_key_name(table, columns):
+    """
+    Names a foreign key the way postgres names one declared without a name
+    :param table:
+    :param columns:
+    :return:
+    """
+    return f"{table}_{'_'.join(columns)}_fkey"[:MAX_IDENTIFIER_LENGTH]
+
+
+def get_naming_foreign_keys(table_columns):
+    """
+    Infers foreign keys from column names with declare_foreign_keys' rules: a
+    column like user_id references the id of table user. Only references
+    between the given tables, to one with an id column, are returned.
+    :param table_columns: table -> column names
+    :return: list of foreign key dictionaries
+    """
+    foreign_keys = []
+    for table, columns in table_columns.items():
+        for col in columns:
+
+            # Case 1: Non-id column
+            if col.split("_")[-1] != "id":
+                continue
+            # Case 2: Primary key
+            elif col == "id":
+                continue
+            # Case 3: Foreign key
+            reference_table = get_reference_table(col)
+            if "id" not in table_columns.get(reference_table, []):
+                continue
+            foreign_keys.append(
+                {
+                    "name": get_foreign_key_name(table, [col]),
+                    "table": table,
+                    "columns": [col],
+                    "reference_table": reference_table,
+                    "reference_columns": ["id"],
+                }
+            )
+    return foreign_keys
+
+
+def get_catalog_foreign_keys(tables, schema, connection):
+    """
+    Reads the foreign keys declared on or referencing some tables
+    :param tables:
+    :param schema:
+    :param connection:
+    :return: list of foreign key dictionaries, with their full definition so
+        they can be declared again exactly as they were
+    """
+    if not tables:
+        return []
+    table_list = ", ".join(f"'{table}'" for table in tables)
+    query = (
+        f"select c.conname, t.relname, r.relname,\n"
+        f"array(select a.attname from unnest(c.conkey) with ordinality k(attnum, n)\n"
+        f"join pg_attribute a on a.attrelid = c.conrelid and a.attnum = k.attnum\n"
+        f"order by k.n)::text[],\n"
+        f"array(select a.attname from unnest(c.confkey) with ordinality k(attnum, n)\n"
+        f"join pg_attribute a on a.attrelid = c.confrelid and a.attnum = k.attnum\n"
+        f"order by k.n)::text[],\n"
+        f"pg_get_constraintdef(c.oid)\n"
+        f"from pg_constraint c\n"
+        f"join pg_class t on t.oid = c.conrelid\n"
+        f"join pg_class r on r.oid = c.confrelid\n"
+        f"join pg_namespace n on n.oid = c.connamespace\n"
+        f"where c.contype = 'f' and n.nspname = '{schema}'\n"
+        f"and (t.relname in ({table_list}) or r.relname in ({table_list}))"
+    )
+    return [
+        {
+            "name": row[0],
+            "table": row[1],
+            "reference_table": row[2],
+            "columns": list(row[3]),
+            "reference_columns": list(row[4]),
+            "definition": row[5],
+        }
+        for row in connection.connection.execute(query)
+    ]
+
+
+def get_load_levels(tables, foreign_keys):
+    """
+    Orders tables so every table loads after the tables it references. Tables
+    in the same level don't reference each other and can load in parallel.
+    Self references and references to other tables don't affect the order.
+    :param tables:
+    :param foreign_keys:
+    :return: list of levels, each a sorted list of tables
+    """
+    dependencies = {table: set() for table in tables}
+    for foreign_key in foreign_keys:
+        table, reference_table = foreign_key["table"], foreign_key["reference_table"]
+        if table in dependencies and reference_table in dependencies:
+            if table != reference_table:
+                dependencies[table].add(reference_table)
+
+    levels = []
+    loaded = set()
+    while len(loaded) < len(dependencies):
+        level = sorted(
+            table
+            for table, references in dependencies.items()
+            if table not in loaded and references <= loaded
+        )
+        if not level:
+            raise Exception(
+                f"Foreign keys form a cycle between "
+                f"{sorted(set(dependencies) - loaded)}, which can only be appended "
+                f"to in one transaction"
+            )
+        levels.append(level)
+        loaded.update(level)
+    return levels
+
+
+def get_drop_foreign_key_queries(foreign_keys, schema):
+    return [
+        f"alter table {schema}.{foreign_key['table']} "
+        f"drop constraint if exists {foreign_key['name']}"
+        for foreign_key in foreign_keys
+    ]
+
+
+def get_foreign_key_definition(foreign_key, schema):
+    """
+    Catalog foreign keys keep their own definition, actions and deferrability
+    included. Inferred ones are plain references.
+    :param foreign_key:
+    :param schema:
+    :return:
+    """
+    if foreign_key.get("definition"):
+        return foreign_key["definition"]
+    return (
+        f"foreign key ({', '.join(foreign_key['columns'])}) "
+        f"references {schema}.{foreign_key['reference_table']} "
+        f"({', '.join(foreign_key['reference_columns'])})"
+    )
+
+
+def get_add_foreign_key_queries(foreign_keys, existing_names, schema):
+    """
+    Declares the foreign keys that don't exist yet. Each is validated with one
+    scan when it's added.
+    :param foreign_keys:
+    :param existing_names: names of the foreign keys already declared
+    :param schema:
+    :return:
+    """
+    return [
+        f"alter table {schema}.{foreign_key['table']} "
+        f"add constraint {foreign_key['name']} "
+        f"{get_foreign_key_definition(foreign_key, schema)}"
+        for foreign_key in foreign_keys
+        if foreign_key["name"] not in existing_names
+    ]
@@ -0,0 +1,26 @@
+import importlib
+
+
+class LazyModule(object):
+    """
+    Stand-in for a module that is only imported on first attribute access, so
+    importing siphon doesn't pay for pandas, NumPy and SQLAlchemy until they're
+    actually used
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
@@ -0,0 +1,142 @@
+import re
+
+from siphon.batch_utils import MAX_BATCH_BYTES
+from siphon.lazy_utils import lazy_import
+from siphon.progress_utils import format_bytes
+from siphon.type_conversion_utils import convert_dtypes
+
+pd = lazy_import("pandas")
+
+MEMORY_UNITS = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3, "TB": 1024**4}
+
+# In-memory bytes per value of fixed-width dtypes, nullable masks included
+FIXED_WIDTH_BYTES = {"int": 9, "float": 9, "date": 8, "bool": 2, "category": 4}
+
+# Pointer plus python object header held for each value of an object column
+OBJECT_BYTES = 57
+
+# Width assumed for columns pg_stats has no statistics for
+DEFAULT_COLUMN_WIDTH = 32
+
+# Reads hold the fetched rows and the converted frame at the same time
+READ_COPIES = 2
+
+# Unloads also hold each row group as an Arrow table
+UNLOAD_COPIES = 3
+
+# Share of the budget a single fetch, row group or batch may use
+CHUNK_BUDGET_SHARE = 0.25
+
+
+def parse_memory_size(size):
+    """
+    Reads a memory size given in bytes or as a string like '512MB' or '2GB'
+    :param size:
+    :return: bytes
+    """
+    if isinstance(size, (int, float)):
+        return int(size)
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?B)\s*", str(size).upper())
+    if not match:
+        raise Exception(
+            f"Memory size must be a number of bytes or a string like '2GB', not {size}"
+        )
+    return int(float(match.group(1)) * MEMORY_UNITS[match.group(2)])
+
+
+def get_column_widths(table, schema, connection):
+    """
+    Reads each column's average stored width from the planner statistics
+    :param table:
+    :param schema:
+    :param connection:
+    :return: column -> bytes, for analyzed columns
+    """
+    query = (
+        f"select attname, avg_width\n"
+        f"from pg_stats\n"
+        f"where schemaname = '{schema}'\n"
+        f"and tablename = '{table}'\n"
+    )
+    return {row[0]: row[1] for row in connection.connection.execute(query)}
+
+
+def estimate_row_bytes(db_dtype_dict, column_widths):
+    """
+    Estimates the in-memory bytes of one row once read into a converted frame.
+    Fixed-width dtypes take their NumPy width; everything else is an object per
+    value plus its stored width.
+    :param db_dtype_dict: column -> postgres description
+    :param column_widths: column -> average stored width, from get_column_widths
+    :return:
+    """
+    df_dtype_dict = convert_dtypes(
+        dtype_dict=db_dtype_dict,
+        from_dtype="postgres_description",
+        to_dtype="dataframe_dtype",
+    )
+    row_bytes = 0
+    for col in db_dtype_dict:
+        dtype = df_dtype_dict.get(col)
+        if pd.notna(dtype) and dtype in FIXED_WIDTH_BYTES:
+            row_bytes += FIXED_WIDTH_BYTES[dtype]
+        else:
+            row_bytes += OBJECT_BYTES + column_widths.get(col, DEFAULT_COLUMN_WIDTH)
+    return row_bytes
+
+
+def check_memory_budget(required_bytes, memory_budget, operation, hint=""):
+    """
+    Raises before an operation that wouldn't fit in the memory budget starts
+    :param required_bytes: estimated peak memory of the operation
+    :param memory_budget: bytes, or None for no budget
+    :param operation: description for the error message
+    :param hint: what to do instead
+    :return:
+    """
+    if memory_budget is not None and required_bytes > memory_budget:
+        raise Exception(
+            f"{operation} needs about {format_bytes(required_bytes)}, over the "
+            f"{format_bytes(memory_budget)} memory budget"
+            + (f". {hint}" if hint else "")
+        )
+
+
+def get_budget_rows(
+    row_bytes, memory_budget, copies=READ_COPIES, share=CHUNK_BUDGET_SHARE
+):
+    """
+    Rows a fetch or row group can hold within its share of the budget
+    :param row_bytes: estimated bytes per row
+    :param memory_budget:
+    :param copies: copies of each row held at once, e.g. fetched and converted
+    :param share: share of the budget the chunk may use
+    :return:
+    """
+    return max(1, int(memory_budget * share / (max(row_bytes, 1) * copies)))
+
+
+def get_budget_batch_bytes(memory_budget):
+    """
+    Byte limit per export batch, at most MAX_BATCH_BYTES
+    :param memory_budget: bytes, or None for no budget
+    :return:
+    """
+    if memory_budget is None:
+        return MAX_BATCH_BYTES
+    return max(1, min(MAX_BATCH_BYTES, int(memory_budget * CHUNK_BUDGET_SHARE)))
+
+
+def get_budget_workers(column_bytes, free_bytes, max_workers):
+    """
+    Conversion workers that fit in the memory left: each holds its column's
+    input and result
+    :param column_bytes: column -> bytes
+    :param free_bytes: budget left once the frame is accounted for
+    :param max_workers: workers wanted
+    :return:
+    """
+    largest_column = max(column_bytes.values(), default=0)
+    if largest_column == 0:
+        return max_workers
+    return max(1, min(max_workers, int(free_bytes // (2 * largest_column))))
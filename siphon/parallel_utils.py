@@ -0,0 +1,55 @@
+import concurrent.futures
+
+PARALLEL_MODES = {"thread", "process"}
+
+
+def get_executor(parallel, max_workers):
+    if parallel == "thread":
+        return concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    elif parallel == "process":
+        # Imported on first use; the process pool machinery is slow to load
+        return concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    else:
+        raise Exception(
+            f"Parallel mode must be one of {sorted(PARALLEL_MODES)}, not {parallel}"
+        )
+
+
+def get_worker_columns(df, cols, parallel):
+    """
+    Picks the columns worth handing to workers. Threads share the dataframe, so
+    every column goes. Processes receive a pickled copy, which only pays off for
+    object columns (strings, arrays, dates as text); NumPy-backed columns are
+    handled faster in the calling process than they can be shipped.
+    :param df:
+    :param cols:
+    :param parallel: 'thread' or 'process'
+    :return:
+    """
+    if parallel == "thread":
+        return list(cols)
+    return [col for col in cols if df[col].dtype.kind == "O"]
+
+
+def map_columns(func, df, cols, args=None, max_workers=None, parallel="thread"):
+    """
+    Runs func(df, col, *args[col]) for each column on a thread or process pool.
+    Thread workers read the shared dataframe; process workers get a one-column
+    frame so no other column is copied.
+    :param func: module-level function, so process pools can pickle it
+    :param df:
+    :param cols:
+    :param args: column -> extra positional arguments
+    :param max_workers:
+    :param parallel: 'thread' or 'process'
+    :return: column -> result, in the order of cols
+    """
+    args = args or {}
+    with get_executor(parallel, max_workers) as executor:
+        futures = {
+            col: executor.submit(
+                func, df if parallel == "thread" else df[[col]], col, *args.get(col, ())
+            )
+            for col in cols
+        }
+        return {col: future.result() for col, future in futures.items()}
@@ -0,0 +1,187 @@
+import hashlib
+import re
+
+from siphon.checkpoint_utils import MAX_IDENTIFIER_LENGTH
+from siphon.database_utils import get_table_ddl, quote_literal
+from siphon.lazy_utils import lazy_import
+
+pd = lazy_import("pandas")
+
+PARTITION_METHODS = {"range", "list", "hash"}
+
+# Check constraint staging tables carry until they're attached
+PARTITION_CHECK = "siphon_partition_bound"
+
+# Range partitions cover one interval each: its numpy unit and name format
+PARTITION_INTERVALS = {
+    "day": ("D", "%Y%m%d"),
+    "month": ("M", "%Y%m"),
+    "year": ("Y", "%Y"),
+}
+
+
+def check_partition_column(df, col, method, interval=None):
+    """
+    Raises if a frame can't be partitioned on a column
+    :param df: converted dataframe
+    :param col:
+    :param method: 'range', 'list' or 'hash'
+    :param interval: 'day', 'month' or 'year' for range partitions
+    :return:
+    """
+    if method not in PARTITION_METHODS:
+        raise Exception(
+            f"Partition method must be one of {sorted(PARTITION_METHODS)}, not {method}"
+        )
+    if method == "range" and interval not in PARTITION_INTERVALS:
+        raise Exception(
+            f"Partition interval must be one of {sorted(PARTITION_INTERVALS)}, "
+            f"not {interval}"
+        )
+    if col not in df.columns:
+        raise Exception(f"Partition column {col} is not in the dataframe")
+    if df[col].isna().any():
+        raise Exception(f"Partition column {col} has missing values")
+
+
+def get_partition_keys(series, interval):
+    """
+    Truncates a date column to the start of each row's range partition
+    :param series: date or calendar_date column
+    :param interval: 'day', 'month' or 'year'
+    :return: series of partition start timestamps
+    """
+    unit, _ = PARTITION_INTERVALS[interval]
+    values = pd.to_datetime(series, utc=True).dt.tz_localize(None).values
+    return pd.Series(values.astype(f"datetime64[{unit}]"), index=series.index)
+
+
+def get_range_bounds(key, interval, is_date=False):
+    """
+    Renders a range partition's lower (inclusive) and upper (exclusive) bounds
+    :param key: partition start timestamp
+    :param interval:
+    :param is_date: whether the column is a date rather than a timestamp
+    :return: (start, end) literals
+    """
+    start = pd.Timestamp(key)
+    end = start + pd.DateOffset(**{f"{interval}s": 1})
+    date_format = "%Y-%m-%d" if is_date else "%Y-%m-%d %H:%M:%S+00"
+    return start.strftime(date_format), end.strftime(date_format)
+
+
+def get_partition_name(table, key, method, interval=None):
+    """
+    Names a partition after its key so later exports find it again: the range
+    start, the remainder, or the list value (hashed unless it's a plain identifier).
+    Names too long for postgres shorten the table name and add its hash, so
+    partitions of different keys or tables never share a name.
+    :param table:
+    :param key:
+    :param method:
+    :param interval:
+    :return:
+    """
+    if method == "range":
+        _, name_format = PARTITION_INTERVALS[interval]
+        suffix = pd.Timestamp(key).strftime(name_format)
+    elif method == "hash":
+        suffix = str(key)
+    elif re.fullmatch(r"[a-z0-9_]{1,30}", str(key)):
+        suffix = str(key)
+    else:
+        suffix = hashlib.md5(str(key).encode()).hexdigest()[:10]
+    name = f"{table}_p{suffix}"
+    if len(name) <= MAX_IDENTIFIER_LENGTH:
+        return name
+    table_hash = hashlib.md5(table.encode()).hexdigest()[:8]
+    prefix_length = MAX_IDENTIFIER_LENGTH - len(f"_{table_hash}_p{suffix}")
+    return f"{table[:prefix_length]}_{table_hash}_p{suffix}"
+
+
+def get_partition_bound(key, method, interval=None, modulus=None, is_date=False):
+    if method == "range":
+        start, end = get_range_bounds(key, interval, is_date=is_date)
+        return f"for values from ('{start}') to ('{end}')"
+    elif method == "list":
+        return f"for values in ({quote_literal(key)})"
+    return f"for values with (modulus {modulus}, remainder {key})"
+
+
+def get_partition_check(col, key, method, interval=None, is_date=False):
+    """
+    Check constraint matching a partition's bound. Adding it to a staging table
+    lets ATTACH PARTITION skip scanning the rows.
+    :param col:
+    :param key:
+    :param method:
+    :param interval:
+    :param is_date:
+    :return: constraint expression, or None for hash partitions
+    """
+    if method == "range":
+        start, end = get_range_bounds(key, interval, is_date=is_date)
+        return f"{col} is not null and {col} >= '{start}' and {col} < '{end}'"
+    elif method == "list":
+        return f"{col} is not null and {col} = {quote_literal(key)}"
+    return None
+
+
+def get_partitioned_table_ddl(table, schema, dtype_param, col, method):
+    return f"{get_table_ddl(table, schema, dtype_param)} partition by {method} ({col})"
+
+
+def get_partition_strategy(table, schema, connection):
+    """
+    :param table:
+    :param schema:
+    :param connection:
+    :return: 'r', 'l' or 'h', or None if the table isn't partitioned
+    """
+    query = (
+        f"select partstrat from pg_partitioned_table\n"
+        f"where partrelid = '{schema}.{table}'::regclass"
+    )
+    return connection.connection.execute(query).scalar()
+
+
+def get_partitions(table, schema, connection):
+    query = (
+        f"select c.relname\n"
+        f"from pg_inherits i\n"
+        f"join pg_class c on c.oid = i.inhrelid\n"
+        f"where i.inhparent = '{schema}.{table}'::regclass"
+    )
+    return {row[0] for row in connection.connection.execute(query)}
+
+
+def get_hash_remainders(series, table, schema, modulus, type_name, connection):
+    """
+    Asks postgres which hash partition each distinct key belongs to, so rows can
+    be split before loading. Only distinct keys are sent.
+    :param series: partition column
+    :param table: hash partitioned parent
+    :param schema:
+    :param modulus:
+    :param type_name: the column's postgres type
+    :param connection:
+    :return: series of remainders
+    """
+    query = (
+        f"select k.key, r.remainder\n"
+        f"from unnest(%(keys)s::{type_name}[]) as k(key)\n"
+        f"cross join generate_series(0, {modulus - 1}) as r(remainder)\n"
+        f"where satisfies_hash_partition(\n"
+        f"'{schema}.{table}'::regclass, {modulus}, r.remainder, k.key)"
+    )
+    keys = series.drop_duplicates().tolist()
+    rows = connection.connection.execute(query, {"keys": keys}).fetchall()
+    remainders = series.map(dict(rows))
+    # Keys postgres returned in another form wouldn't match, leaving rows unloaded
+    unmapped = series[remainders.isna()].drop_duplicates().tolist()
+    if unmapped:
+        raise Exception(
+            f"Hash partitions of {schema}.{table} couldn't be found for keys "
+            f"{unmapped[:10]}"
+        )
+    return remainders
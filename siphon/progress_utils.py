@@ -0,0 +1,157 @@
+import threading
+import time
+
+# Rows per chunk when a transfer reports progress
+PROGRESS_CHUNKSIZE = 50000
+
+PROGRESS_BAR_WIDTH = 20
+
+
+def estimate_column_bytes(df, sample_size=1000):
+    """
+    Estimates each column's in-memory size from the deep memory usage of the
+    first rows, which is cheap even for wide text columns
+    :param df:
+    :param sample_size:
+    :return: column -> bytes
+    """
+    if df.shape[0] == 0:
+        return {col: 0 for col in df.columns}
+    sample = df.iloc[:sample_size]
+    sample_bytes = sample.memory_usage(index=False, deep=True)
+    return {
+        col: int(n_bytes * df.shape[0] / sample.shape[0])
+        for col, n_bytes in sample_bytes.items()
+    }
+
+
+def estimate_bytes(df, sample_size=1000):
+    """
+    Estimates a dataframe's in-memory size, see estimate_column_bytes
+    :param df:
+    :param sample_size:
+    :return:
+    """
+    return sum(estimate_column_bytes(df, sample_size=sample_size).values())
+
+
+def format_bytes(n_bytes):
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(n_bytes) < 1024:
+            return f"{n_bytes:.1f}{unit}"
+        n_bytes /= 1024
+    return f"{n_bytes:.1f}TB"
+
+
+def format_duration(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m{seconds:02d}s"
+    elif minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+
+def format_progress(state):
+    """
+    Renders a progress state as a single console line
+    :param state: dictionary from TransferProgress.get_state
+    :return:
+    """
+    rows, total_rows = state["rows"], state["total_rows"]
+    stats = (
+        f"{format_bytes(state['bytes'])}, "
+        f"{state['rows_per_second']:,.0f} rows/s ({format_bytes(state['bytes_per_second'])}/s)"
+    )
+    if state["done"]:
+        return (
+            f"{state['table']}: {rows:,} rows, {stats} "
+            f"in {format_duration(state['elapsed'])}"
+        )
+    if not total_rows:
+        return f"{state['table']}: {rows:,} rows, {stats}"
+    fraction = min(rows / total_rows, 1.0)
+    filled = int(fraction * PROGRESS_BAR_WIDTH)
+    bar = "#" * filled + " " * (PROGRESS_BAR_WIDTH - filled)
+    eta = "?" if state["eta"] is None else format_duration(state["eta"])
+    return (
+        f"{state['table']}: {fraction:4.0%} |{bar}| {rows:,}/{total_rows:,} rows, "
+        f"{stats}, ETA {eta}"
+    )
+
+
+class TransferProgress(object):
+    """
+    Tracks rows and bytes moved by a read or export and reports them to a callback
+    """
+
+    def __init__(self, table, total_rows=None, callback=None, initial_rows=0):
+        """
+        :param table:
+        :param total_rows: expected rows, exact for exports and estimated for reads
+        :param callback: called with the state dictionary after each update
+        :param initial_rows: rows already transferred, e.g. by a resumed export.
+            They count towards progress but not towards the rate.
+        """
+        self.table = table
+        self.total_rows = total_rows
+        self.callback = callback
+        self.initial_rows = initial_rows
+        self.rows = initial_rows
+        self.bytes = 0
+        self.done = False
+        self.start = time.time()
+
+    def update(self, rows, n_bytes=0):
+        self.rows += rows
+        self.bytes += n_bytes
+        self.report()
+
+    def finish(self):
+        self.done = True
+        self.total_rows = self.rows
+        self.report()
+
+    def get_state(self):
+        elapsed = time.time() - self.start
+        rows_per_second = (self.rows - self.initial_rows) / elapsed if elapsed else 0.0
+        bytes_per_second = self.bytes / elapsed if elapsed else 0.0
+        eta = None
+        if self.total_rows and rows_per_second:
+            eta = max(self.total_rows - self.rows, 0) / rows_per_second
+        return {
+            "table": self.table,
+            "rows": self.rows,
+            "total_rows": self.total_rows,
+            "bytes": self.bytes,
+            "elapsed": elapsed,
+            "rows_per_second": rows_per_second,
+            "bytes_per_second": bytes_per_second,
+            "eta": eta,
+            "done": self.done,
+        }
+
+    def report(self):
+        if self.callback:
+            self.callback(self.get_state())
+
+
+class ConsoleProgress(object):
+    """
+    Default progress callback, redrawing one console line per transfer. With
+    finished_only, only each transfer's final line is printed, so transfers
+    running at once don't redraw over each other.
+    """
+
+    def __init__(self, finished_only=False):
+        self.finished_only = finished_only
+        self.lock = threading.Lock()
+
+    def __call__(self, state):
+        if self.finished_only and not state["done"]:
+            return
+        end = "\n" if state["done"] else ""
+        prefix = "" if self.finished_only else "\r"
+        with self.lock:
+            print(f"{prefix}{format_progress(state)}", end=end, flush=True)
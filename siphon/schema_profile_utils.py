@@ -0,0 +1,151 @@
+import json
+import os
+from datetime import datetime, timezone
+
+SCHEMA_PROFILE_TABLE = "siphon_schema_profiles"
+
+# Pandas dtype kinds each siphon dtype can be converted from without inference
+PROFILE_DTYPE_KINDS = {
+    "date": {"M", "O"},
+    "varchar_array": {"O"},
+    "bool": {"b", "i", "u", "f", "O"},
+    "int": {"i", "u", "f"},
+    "float": {"i", "u", "f", "O"},
+    "string": {"O"},
+    "json": {"O"},
+    "int_array": {"O"},
+    "float_array": {"O"},
+    "bool_array": {"O"},
+    "calendar_date": {"M", "O"},
+    "category": {"O"},
+}
+
+
+# Checking profiles
+def check_schema_profile(df, schema_profile):
+    """
+    Cheap compatibility check between a dataframe and a schema profile. Only
+    column names and pandas dtype kinds are compared; no values are scanned.
+    :param df:
+    :param schema_profile:
+    :return: True when the profile covers every column, False when columns were
+        added and inference is still needed. Profiled columns the dataframe no
+        longer has are ignored.
+    """
+    dtype_profile = schema_profile.get("dtypes", {})
+    if not set(df.columns) <= set(dtype_profile):
+        return False
+    for col in df.columns:
+        dtype = dtype_profile[col]
+        if df[col].dtype.kind not in PROFILE_DTYPE_KINDS[dtype]:
+            raise Exception(
+                f"Column {col} ({df[col].dtype}) doesn't match its profiled dtype {dtype}"
+            )
+    return True
+
+
+# Local JSON files
+def get_schema_profile_version_path(path, version):
+    root, extension = os.path.splitext(path)
+    return f"{root}.v{version}{extension}"
+
+
+def load_schema_profile_file(path, version=None):
+    """
+    Loads a schema profile saved with save_schema_profile_file
+    :param path:
+    :param version: profile version, latest by default
+    :return:
+    """
+    with open(path) as f:
+        schema_profile = json.load(f)
+    if version and schema_profile.get("version") != version:
+        with open(get_schema_profile_version_path(path, version)) as f:
+            schema_profile = json.load(f)
+    return schema_profile
+
+
+def save_schema_profile_file(schema_profile, path):
+    """
+    Saves a schema profile as JSON, one version higher than the file it replaces.
+    The replaced file is kept next to it as <name>.v<version>.json.
+    :param schema_profile:
+    :param path:
+    :return:
+    """
+    version = 0
+    if os.path.exists(path):
+        version = load_schema_profile_file(path).get("version", 0)
+        os.replace(path, get_schema_profile_version_path(path, version))
+    schema_profile["version"] = version + 1
+    schema_profile["saved_at"] = datetime.now(timezone.utc).isoformat()
+    with open(path, "w") as f:
+        json.dump(schema_profile, f, indent=2, sort_keys=True)
+    return schema_profile
+
+
+# Sidecar table
+def create_schema_profile_table(schema, connection):
+    query = (
+        f"create table if not exists {schema}.{SCHEMA_PROFILE_TABLE} (\n"
+        f"schema_name varchar,\n"
+        f"table_name varchar,\n"
+        f"version bigint,\n"
+        f"profile jsonb,\n"
+        f"saved_at timestamp with time zone default now(),\n"
+        f"primary key (schema_name, table_name, version))"
+    )
+    connection.connection.execute(query)
+
+
+def save_schema_profile_table(schema_profile, table, schema, connection):
+    """
+    Saves a schema profile as the next version for its table in the sidecar table
+    :param schema_profile:
+    :param table:
+    :param schema:
+    :param connection:
+    :return:
+    """
+    create_schema_profile_table(schema, connection)
+    version_query = (
+        f"select coalesce(max(version), 0)\n"
+        f"from {schema}.{SCHEMA_PROFILE_TABLE}\n"
+        f"where schema_name = %(schema)s and table_name = %(table)s"
+    )
+    params = {"schema": schema, "table": table}
+    version = connection.connection.execute(version_query, params).scalar()
+    schema_profile["version"] = version + 1
+    insert_query = (
+        f"insert into {schema}.{SCHEMA_PROFILE_TABLE}\n"
+        f"(schema_name, table_name, version, profile)\n"
+        f"values (%(schema)s, %(table)s, %(version)s, %(profile)s)"
+    )
+    params.update(
+        {"version": schema_profile["version"], "profile": json.dumps(schema_profile)}
+    )
+    connection.connection.execute(insert_query, params)
+    return schema_profile
+
+
+def load_schema_profile_table(table, schema, connection, version=None):
+    """
+    Loads a table's schema profile from the sidecar table
+    :param table:
+    :param schema:
+    :param connection:
+    :param version: profile version, latest by default
+    :return: the profile, or None if none was saved
+    """
+    create_schema_profile_table(schema, connection)
+    query = (
+        f"select profile\n"
+        f"from {schema}.{SCHEMA_PROFILE_TABLE}\n"
+        f"where schema_name = %(schema)s and table_name = %(table)s\n"
+    )
+    params = {"schema": schema, "table": table}
+    if version:
+        query += "and version = %(version)s\n"
+        params["version"] = version
+    query += "order by version desc\nlimit 1"
+    return connection.connection.execute(query, params).scalar()
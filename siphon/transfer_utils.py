@@ -0,0 +1,277 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+
+from siphon.PostgresConnection import PostgresConnection
+from siphon.database_utils import check_table_exists
+from siphon.lazy_utils import lazy_import
+
+pd = lazy_import("pandas")
+
+# Bytes buffered per chunk and chunks held between the source and the target.
+# Together they bound the memory a copy uses, whatever the table size.
+COPY_CHUNK_SIZE = 1 << 16
+COPY_PIPE_CHUNKS = 64
+
+
+class CopyPipe(object):
+    """
+    Bounded file-like pipe between a COPY TO STDOUT writer and a COPY FROM STDIN
+    reader running in another thread
+    """
+
+    def __init__(self, chunk_size=COPY_CHUNK_SIZE, max_chunks=COPY_PIPE_CHUNKS):
+        self.chunk_size = chunk_size
+        self.queue = queue.Queue(maxsize=max_chunks)
+        self.write_buffer = bytearray()
+        self.read_buffer = b""
+        self.read_offset = 0
+        self.closed = False
+        self.aborted = False
+        self.error = None
+
+    def write(self, data):
+        if self.aborted:
+            raise Exception("Target copy failed")
+        self.write_buffer += data
+        if len(self.write_buffer) >= self.chunk_size:
+            self.queue.put(bytes(self.write_buffer))
+            self.write_buffer = bytearray()
+        return len(data)
+
+    def close(self, error=None):
+        """
+        Flushes the last chunk and marks the end of the stream. An error makes
+        the reader fail instead of seeing a clean end of data.
+        :param error:
+        :return:
+        """
+        # Nobody reads an aborted pipe, so nothing is queued for them
+        if self.aborted:
+            return
+        if error is None and self.write_buffer:
+            self.queue.put(bytes(self.write_buffer))
+        self.write_buffer = bytearray()
+        self.error = error
+        self.queue.put(None)
+
+    def read(self, size=-1):
+        if self.read_offset >= len(self.read_buffer):
+            if self.closed:
+                return b""
+            chunk = self.queue.get()
+            if chunk is None:
+                self.closed = True
+                if self.error is not None:
+                    raise Exception(f"Source copy failed: {self.error}")
+                return b""
+            self.read_buffer, self.read_offset = chunk, 0
+        size = len(self.read_buffer) if size is None or size < 0 else size
+        data = self.read_buffer[self.read_offset : self.read_offset + size]
+        self.read_offset += len(data)
+        return data
+
+    def abort(self):
+        """
+        Stops the writer when the reader fails: queued chunks are discarded so a
+        write blocked on a full pipe returns, and the next write raises
+        :return:
+        """
+        self.aborted = True
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+
+def get_source_columns(table, schema, connection):
+    """
+    Reads each column's exact postgres type (typmods included) from the catalog
+    :param table:
+    :param schema:
+    :param connection:
+    :return: dataframe of attname, column_type and attnotnull, in column order
+    """
+    query = (
+        f"select a.attname, format_type(a.atttypid, a.atttypmod) as column_type,\n"
+        f"a.attnotnull\n"
+        f"from pg_attribute a\n"
+        f"where a.attrelid = '{schema}.{table}'::regclass\n"
+        f"and a.attnum > 0 and not a.attisdropped\n"
+        f"order by a.attnum"
+    )
+    return pd.read_sql_query(query, con=connection.connection)
+
+
+def get_primary_key_columns(table, schema, connection):
+    query = (
+        f"select a.attname\n"
+        f"from pg_index i\n"
+        f"join pg_attribute a on a.attrelid = i.indrelid\n"
+        f"and a.attnum = any(i.indkey)\n"
+        f"where i.indrelid = '{schema}.{table}'::regclass and i.indisprimary\n"
+        f"order by array_position(i.indkey::int2[], a.attnum)"
+    )
+    df = pd.read_sql_query(query, con=connection.connection)
+    return list(df["attname"])
+
+
+def get_copy_table_ddl(table, schema, columns_df):
+    """
+    Renders a create table statement from catalog columns. User-defined types
+    (enums, domains) must already exist in the target database. Only names,
+    types and not null are carried over: defaults, sequences, identity and
+    other constraints are not.
+    :param table:
+    :param schema:
+    :param columns_df: output of get_source_columns
+    :return:
+    """
+    columns = [
+        f"{row.attname} {row.column_type}" + (" not null" if row.attnotnull else "")
+        for row in columns_df.itertuples()
+    ]
+    return f"create table {schema}.{table} (\n" + ",\n".join(columns) + "\n)"
+
+
+def stream_copy_out(source_connection, query, pipe):
+    cursor = source_connection.cursor()
+    try:
+        cursor.copy_expert(query, pipe)
+    except Exception as error:
+        pipe.close(error=error)
+    else:
+        pipe.close()
+    finally:
+        cursor.close()
+
+
+def copy_single_table(
+    source_db, target_db, table, schema=None, target_schema=None, if_exists="fail"
+):
+    """
+    Copies one table between databases in binary COPY format. Rows go from the
+    source's COPY TO STDOUT to the target's COPY FROM STDIN through a bounded
+    pipe, so nothing is decoded and memory stays constant.
+    The table is created, loaded and given its primary key in one transaction.
+    Column defaults, sequences and constraints other than not null and the
+    primary key aren't copied, see get_copy_table_ddl.
+    :param source_db: PostgresDatabase to read from
+    :param target_db: PostgresDatabase to write to
+    :param table:
+    :param schema: source schema, source_db's schema by default
+    :param target_schema: target schema, target_db's schema by default
+    :param if_exists: 'fail', 'replace' or 'append'. Appending needs the target
+        columns to have exactly the source types.
+    :return: number of rows copied
+    """
+    schema = schema or source_db.schema
+    target_schema = target_schema or target_db.schema
+
+    with PostgresConnection(
+        database_var=source_db.database_var, database_url=source_db.database_url
+    ) as source_connection, PostgresConnection(
+        database_var=target_db.database_var, database_url=target_db.database_url
+    ) as target_connection:
+        columns_df = get_source_columns(table, schema, source_connection)
+        column_names = ", ".join(columns_df["attname"])
+        primary_key_columns = get_primary_key_columns(table, schema, source_connection)
+
+        transaction = target_connection.connection.begin()
+        try:
+            table_already_exists = check_table_exists(
+                table, target_schema, target_connection
+            )
+            if table_already_exists and if_exists == "fail":
+                raise Exception(f"Table {target_schema}.{table} already exists")
+            if table_already_exists and if_exists == "replace":
+                target_connection.connection.execute(
+                    f"drop table {target_schema}.{table} cascade"
+                )
+            create_table = not table_already_exists or if_exists == "replace"
+            if create_table:
+                target_connection.connection.execute(
+                    get_copy_table_ddl(table, target_schema, columns_df)
+                )
+
+            pipe = CopyPipe()
+            writer = Thread(
+                target=stream_copy_out,
+                args=(
+                    source_connection,
+                    f"copy {schema}.{table} ({column_names}) "
+                    f"to stdout (format binary)",
+                    pipe,
+                ),
+                daemon=True,
+            )
+            writer.start()
+            cursor = target_connection.cursor()
+            try:
+                cursor.copy_expert(
+                    f"copy {target_schema}.{table} ({column_names}) "
+                    f"from stdin (format binary)",
+                    pipe,
+                )
+            except Exception:
+                # Stop the source instead of reading the rest of the table
+                source_connection.cancel()
+                pipe.abort()
+                writer.join()
+                raise
+            writer.join()
+            row_count = cursor.rowcount
+            cursor.close()
+
+            # Keys are built once after the load instead of row by row
+            if create_table and primary_key_columns:
+                target_connection.connection.execute(
+                    f"alter table {target_schema}.{table} "
+                    f"add primary key ({', '.join(primary_key_columns)})"
+                )
+            transaction.commit()
+        except Exception:
+            transaction.rollback()
+            raise
+
+    return row_count
+
+
+def copy_table(
+    source_db,
+    target_db,
+    table,
+    schema=None,
+    target_schema=None,
+    if_exists="fail",
+    max_workers=4,
+):
+    """
+    Copies tables from one postgres database to another without going through
+    pandas. Several tables are copied in parallel, each on its own pair of
+    connections.
+    :param source_db: PostgresDatabase to read from
+    :param target_db: PostgresDatabase to write to
+    :param table: table name or list of table names
+    :param schema: source schema, source_db's schema by default
+    :param target_schema: target schema, target_db's schema by default
+    :param if_exists: 'fail', 'replace' or 'append'
+    :param max_workers: tables copied at once
+    :return: table -> number of rows copied
+    """
+    tables = [table] if isinstance(table, str) else list(table)
+
+    def copy(table_name):
+        return copy_single_table(
+            source_db,
+            target_db,
+            table_name,
+            schema=schema,
+            target_schema=target_schema,
+            if_exists=if_exists,
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tables)))) as pool:
+        row_counts = list(pool.map(copy, tables))
+    return dict(zip(tables, row_counts))
@@ -1,5 +1,81 @@
 # Checking col values
-import pandas as pd
+from datetime import datetime
+
+from siphon.lazy_utils import lazy_import
+from siphon.parallel_utils import get_worker_columns, map_columns
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Postgres type OIDs from pg_type, described the way information_schema.columns
+# reports data_type so query results share the table dtype mapping
+POSTGRES_OID_DESCRIPTIONS = {
+    16: "boolean",
+    20: "bigint",
+    21: "smallint",
+    23: "integer",
+    25: "text",
+    700: "real",
+    701: "double precision",
+    1042: "character",
+    1043: "character varying",
+    1114: "timestamp without time zone",
+    1184: "timestamp with time zone",
+    1700: "numeric",
+    1082: "date",
+    114: "json",
+    3802: "jsonb",
+    # Arrays
+    1000: "boolean[]",
+    1005: "smallint[]",
+    1007: "integer[]",
+    1009: "ARRAY",
+    1014: "ARRAY",
+    1015: "ARRAY",
+    1016: "bigint[]",
+    1021: "real[]",
+    1022: "double precision[]",
+    1231: "numeric[]",
+}
+
+# information_schema reports every array as ARRAY, so typed arrays are described
+# by their element type (udt_name) instead. Varchar and text arrays stay ARRAY.
+ARRAY_UDT_DESCRIPTIONS = {
+    "_bool": "boolean[]",
+    "_int2": "smallint[]",
+    "_int4": "integer[]",
+    "_int8": "bigint[]",
+    "_float4": "real[]",
+    "_float8": "double precision[]",
+    "_numeric": "numeric[]",
+}
+
+ARRAY_DTYPES = {"varchar_array", "int_array", "float_array", "bool_array"}
+
+# Accepted boolean spellings, shared by inference and conversion. Strings are
+# matched case-insensitively; 1/0 and 1.0/0.0 hash equal to True/False.
+BOOLEAN_VALUES = {
+    True: True,
+    False: False,
+    "true": True,
+    "false": False,
+    "t": True,
+    "f": False,
+}
+
+# Formats tried, in order, when detecting how a string date column is written
+DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y/%m/%d",
+    "%Y%m%d",
+    "%m/%d/%Y",
+    "%d/%m/%Y",
+    "%B %d, %Y",
+    "%b %d, %Y",
+    "%d %B %Y",
+]
 
 
 # Checking Values
@@ -57,22 +133,148 @@ def check_col_tuple_or_list(series):
     return True
 
 
+def check_col_dict(series):
+    """
+    Checks whether series values are dictionaries, stored as JSONB
+    :param series:
+    :return:
+    """
+    values = series.dropna().values
+    return values.shape[0] > 0 and all(type(value) == dict for value in values)
+
+
+def get_element_dtype(element):
+    if isinstance(element, (bool, np.bool_)):
+        return "bool"
+    elif isinstance(element, (int, np.integer)):
+        return "int"
+    elif isinstance(element, (float, np.floating)):
+        return "float"
+    return "string"
+
+
+def get_array_dtype(series):
+    """
+    Picks the array dtype from the element types of a list/tuple column. Arrays
+    of ints, floats or booleans get typed arrays; anything else is varchar.
+    :param series:
+    :return:
+    """
+    element_dtypes = set()
+    for value in series.dropna().values:
+        if type(value) == str:
+            value = eval(value)
+        element_dtypes.update(
+            get_element_dtype(element) for element in value if element is not None
+        )
+
+    if element_dtypes == {"bool"}:
+        return "bool_array"
+    elif element_dtypes == {"int"}:
+        return "int_array"
+    elif element_dtypes and element_dtypes <= {"int", "float"}:
+        return "float_array"
+    return "varchar_array"
+
+
+def get_boolean_value(value):
+    """
+    Looks a value up in the boolean spelling table
+    :param value:
+    :return: True/False, or None when the value isn't an accepted spelling
+    """
+    if type(value) == str:
+        value = value.lower()
+    try:
+        return BOOLEAN_VALUES.get(value)
+    except TypeError:
+        return None
+
+
 def check_col_boolean(series):
     """
-    Checks whether series values are booleans or booleans stored as strings
+    Checks whether series values are booleans or booleans stored as strings.
+    Only the distinct values are looked up.
     :param series:
     :return:
     """
-    value_set = set(series.dropna().unique())
-    # Case 1: Boolean dtype
-    if not value_set.difference({True, False}):
-        return True
-    # Case 2: True, False strings
-    elif not value_set.difference({"True", "False"}):
+    values = series.dropna().unique()
+    return all(get_boolean_value(value) is not None for value in values)
+
+
+def check_col_decimal(series):
+    """
+    Checks whether series values are Decimal objects, as read from NUMERIC columns
+    :param series:
+    :return:
+    """
+    return pd.api.types.infer_dtype(series, skipna=True) == "decimal"
+
+
+def check_col_numeric_text(series):
+    """
+    Checks whether series values are numeric strings, as NUMERIC columns are
+    read with numeric_as_float. Only the first value is parsed.
+    :param series:
+    :return:
+    """
+    first_index = series.first_valid_index()
+    if first_index is None or not isinstance(series[first_index], str):
+        return False
+    try:
+        float(series[first_index])
+    except ValueError:
+        return False
+    return True
+
+
+def detect_date_format(series, sample_size=1000, date_formats=None):
+    """
+    Detects the format a string date column is written in from an evenly spaced
+    sample of its values
+    :param series:
+    :param sample_size:
+    :param date_formats: candidate formats, DATE_FORMATS by default
+    :return: the first format every sampled value parses with, or None
+    """
+    values = series.dropna()
+    sample = values.iloc[:: max(1, values.shape[0] // sample_size)]
+    if sample.shape[0] == 0 or pd.api.types.infer_dtype(sample) != "string":
+        return None
+    for date_format in date_formats or DATE_FORMATS:
+        # strptime is exact, unlike pandas which parses any ISO-like format leniently
+        try:
+            for value in sample.values:
+                datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+        return date_format
+    return None
+
+
+def check_col_date(series, sample_size=1000):
+    """
+    Confirms that a column named like a date holds dates with a cheap,
+    vectorized check on an evenly spaced sample, before the whole column is
+    converted
+    :param series:
+    :param sample_size:
+    :return:
+    """
+    values = series.dropna()
+    sample = values.iloc[:: max(1, values.shape[0] // sample_size)]
+    inferred_dtype = pd.api.types.infer_dtype(sample)
+    # Case 1: No values to contradict the column name
+    if sample.shape[0] == 0:
         return True
-    # Case 3: T, F strings
-    elif not value_set.difference({"T", "F"}):
+    # Case 2: Date or datetime objects
+    elif inferred_dtype in {"datetime", "datetime64", "date"}:
         return True
+    # Case 3: Strings in a known format, or that pandas can parse
+    elif inferred_dtype == "string":
+        if detect_date_format(sample, sample_size=sample_size):
+            return True
+        return bool(pd.to_datetime(sample, errors="coerce").notna().all())
     return False
 
 
@@ -80,14 +282,14 @@ def check_col_boolean(series):
 def check_dtype_array(df=None, col=None, infer_array_col=True, dtype=None):
     # Case 1: Check whether dataframe dtype explicitly stated
     if dtype:
-        return dtype == "varchar_array"
+        return dtype in ARRAY_DTYPES
     else:
         current_dtype = df[col].dtype.__repr__()
     # Case 2: Check whether column values are lists/tuples
     if current_dtype in {"dtype('O')"}:
         return check_col_tuple_or_list(df[col])
     # Case 3: Lists/tuples stored as strings
-    elif infer_array_col and current_dtype in {"StringDtype"}:
+    elif infer_array_col and isinstance(df[col].dtype, pd.StringDtype):
         return check_col_tuple_or_list(df[col])
     return False
 
@@ -102,7 +304,7 @@ def check_dtype_boolean(df=None, col=None, infer_bool_col=True, dtype=None):
     if current_dtype in {"BooleanDtype"}:
         return True
     # Case 3: Booleans stored as strings
-    elif infer_bool_col and current_dtype in {"StringDtype"}:
+    elif infer_bool_col and isinstance(df[col].dtype, pd.StringDtype):
         return check_col_boolean(df[col])
     return False
 
@@ -118,10 +320,43 @@ def check_dtype_date(df=None, col=None, infer_date_col=True, dtype=None):
         return True
     # Case 3: Inferred date values, but not in proper form yet
     elif infer_date_col and "date" in col.split("_"):
-        return True
+        return check_col_date(df[col])
     return False
 
 
+def check_dtype_calendar_date(df=None, col=None, dtype=None):
+    # Case 1: Check whether dataframe dtype explicitly stated
+    if dtype:
+        return dtype == "calendar_date"
+    else:
+        current_dtype = df[col].dtype.__repr__()
+    # Case 2: datetime.date values, without a time of day
+    return (
+        current_dtype in {"dtype('O')"}
+        and pd.api.types.infer_dtype(df[col], skipna=True) == "date"
+    )
+
+
+def check_dtype_json(df=None, col=None, dtype=None):
+    # Case 1: Check whether dataframe dtype explicitly stated
+    if dtype:
+        return dtype == "json"
+    else:
+        current_dtype = df[col].dtype.__repr__()
+    # Case 2: Dictionary values
+    return current_dtype in {"dtype('O')"} and check_col_dict(df[col])
+
+
+def check_dtype_category(df=None, col=None, dtype=None):
+    # Case 1: Check whether dataframe dtype explicitly stated
+    if dtype:
+        return dtype == "category"
+    else:
+        current_dtype = df[col].dtype.__repr__()
+    # Case 2: Pandas categorical
+    return current_dtype.startswith("CategoricalDtype")
+
+
 def check_dtype_float(df=None, col=None, dtype=None):
     # Case 1: Check whether dataframe dtype explicitly stated
     if dtype:
@@ -152,55 +387,147 @@ def check_dtype_string(df=None, col=None, dtype=None):
     # Case 1: Check whether dataframe dtype explicitly stated
     if dtype:
         return dtype == "string"
-    else:
-        current_dtype = df[col].dtype.__repr__()
-    # Case 2: Column has already been converted to an extension string dtype
-    return current_dtype == "StringDtype"
+    # Case 2: Column has already been converted to an extension string dtype,
+    # whose repr varies between pandas versions
+    return isinstance(df[col].dtype, pd.StringDtype)
 
 
 # Check Dataframes
-def get_dataframe_dtypes(df):
+def get_column_dtype(df, col):
+    """
+    Infers a single column's dtype
+    :param df:
+    :param col:
+    :return:
+    """
+    # Categoricals
+    if check_dtype_category(df, col):
+        return "category"
+    # Dates without times
+    elif check_dtype_calendar_date(df, col):
+        return "calendar_date"
+    # Dates
+    elif check_dtype_date(df, col):
+        return "date"
+    # JSON
+    elif check_dtype_json(df, col):
+        return "json"
+    # Arrays
+    elif check_dtype_array(df, col):
+        return get_array_dtype(df[col])
+    # Booleans
+    elif check_dtype_boolean(df, col):
+        return "bool"
+    # Ints
+    elif check_dtype_int(df, col):
+        return "int"
+    # Floats
+    elif check_dtype_float(df, col):
+        return "float"
+    # Strings
+    elif check_dtype_string(df, col):
+        return "string"
+    else:
+        raise Exception(f"Dtype of Column {col} could not be determined")
+
+
+def get_dataframe_dtypes(df, schema_profile=None, max_workers=1, parallel="thread"):
     """
     Checks dataframe dtypes from user. Assumes dataframe is already preconverted.
     Creates a dtype dictionary from the dataframe where each key is a column
     and each value is the column's dtype
     :param df:
+    :param schema_profile: dictionary whose 'dtypes' hold earlier decisions for
+        the same table. Columns found there skip inference, and the dtypes are
+        rebuilt from the current columns so it can be saved and reused on later
+        exports.
+    :param max_workers: columns inferred concurrently
+    :param parallel: 'thread' or 'process' pool when max_workers > 1
     :return:
     """
-    dtype_dict = {}
+    dtype_profile = {}
+    if schema_profile is not None:
+        dtype_profile = schema_profile.setdefault("dtypes", {})
 
-    for col in df.columns:
-        # Dates
-        if check_dtype_date(df, col):
-            dtype_dict[col] = "date"
-        # Arrays
-        elif check_dtype_array(df, col):
-            dtype_dict[col] = "varchar_array"
-        # Booleans
-        elif check_dtype_boolean(df, col):
-            dtype_dict[col] = "bool"
-        # Ints
-        elif check_dtype_int(df, col):
-            dtype_dict[col] = "int"
-        # Floats
-        elif check_dtype_float(df, col):
-            dtype_dict[col] = "float"
-        # Strings
-        elif check_dtype_string(df, col):
-            dtype_dict[col] = "string"
-        else:
-            raise Exception(f"Dtype of Column {col} could not be determined")
+    dtype_dict = {col: dtype_profile.get(col) for col in df.columns}
+    infer_cols = [col for col, dtype in dtype_dict.items() if dtype is None]
 
+    worker_cols = []
+    if max_workers > 1 and len(infer_cols) > 1:
+        worker_cols = get_worker_columns(df, infer_cols, parallel)
+        dtype_dict.update(
+            map_columns(
+                get_column_dtype,
+                df,
+                worker_cols,
+                max_workers=max_workers,
+                parallel=parallel,
+            )
+        )
+    for col in infer_cols:
+        if col not in worker_cols:
+            dtype_dict[col] = get_column_dtype(df, col)
+
+    # Dropped columns leave the profile, so it covers the next export again
+    if schema_profile is not None:
+        schema_profile["dtypes"] = dict(dtype_dict)
     return dtype_dict
 
 
 def get_database_dtypes(table, schema, connection):
+    """
+    Creates a dtype dictionary of a table's postgres descriptions. Enums are
+    described as 'enum'; other user-defined types (domains, extension types
+    like citext or geometry) stay 'USER-DEFINED' and aren't converted.
+    :param table:
+    :param schema:
+    :param connection:
+    :return:
+    """
     dtype_query = (
-        f"select column_name, data_type\n"
-        f"from information_schema.columns\n"
-        f"where table_schema = '{schema}'\n"
-        f"and table_name = '{table}'\n"
+        f"select c.column_name, c.data_type, c.udt_name,\n"
+        f"(select t.typtype from pg_type t\n"
+        f"join pg_namespace n on n.oid = t.typnamespace\n"
+        f"where t.typname = c.udt_name and n.nspname = c.udt_schema) as typtype\n"
+        f"from information_schema.columns c\n"
+        f"where c.table_schema = '{schema}'\n"
+        f"and c.table_name = '{table}'\n"
+        f"order by c.ordinal_position"
     )
     dtype_df = pd.read_sql_query(dtype_query, con=connection.connection)
-    dtype_dict = dtype_df.set_index("column_name")["data_type"].to_dict()
+    dtype_dict = {}
+    for row in dtype_df.itertuples():
+        if row.data_type == "ARRAY":
+            dtype_dict[row.column_name] = ARRAY_UDT_DESCRIPTIONS.get(
+                row.udt_name, "ARRAY"
+            )
+        elif row.data_type == "USER-DEFINED" and row.typtype == "e":
+            dtype_dict[row.column_name] = "enum"
+        else:
+            dtype_dict[row.column_name] = row.data_type
+    return dtype_dict
+
+
+def get_query_dtypes(description):
+    """
+    Creates a dtype dictionary from a DBAPI cursor description where each key is
+    a column and each value is the column's postgres description. Columns with
+    types siphon doesn't map are left out.
+    :param description: cursor.description after executing a query
+    :return:
+    """
+    names = [column[0] for column in description]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise Exception(
+            f"Query returns more than one column named {', '.join(duplicates)}, "
+            f"alias them so each column can be converted"
+        )
+    dtype_dict = {}
+
+    for column in description:
+        name, type_code = column[0], column[1]
+        if type_code in POSTGRES_OID_DESCRIPTIONS:
+            dtype_dict[name] = POSTGRES_OID_DESCRIPTIONS[type_code]
+
     return dtype_dict
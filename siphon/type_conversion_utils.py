@@ -1,28 +1,68 @@
-import numpy as np
-import pandas as pd
-
-from sqlalchemy.dialects.postgresql import (
-    TIMESTAMP,
-    BIGINT,
-    VARCHAR,
-    NUMERIC,
-    BOOLEAN,
-    ARRAY,
-)
+import json
+from datetime import date, datetime
+from functools import lru_cache
 
+from siphon.lazy_utils import lazy_import
+from siphon.parallel_utils import get_worker_columns, map_columns
 from siphon.type_checking_utils import (
+    check_col_decimal,
+    check_col_numeric_text,
+    check_dtype_calendar_date,
+    check_dtype_category,
     check_dtype_date,
+    check_dtype_json,
     check_dtype_array,
     check_dtype_boolean,
     check_dtype_int,
     check_dtype_float,
     check_dtype_string,
+    detect_date_format,
+    get_boolean_value,
+    get_query_dtypes,
 )
 
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+postgresql = lazy_import("sqlalchemy.dialects.postgresql")
+psycopg2_extras = lazy_import("psycopg2.extras")
+
+# Postgres descriptions siphon doesn't write itself, mapped to the description
+# of the closest siphon dtype so they can still be read
+POSTGRES_DESCRIPTION_ALIASES = {
+    "smallint": "bigint",
+    "integer": "bigint",
+    "real": "numeric",
+    "double precision": "numeric",
+    "text": "character varying",
+    "character": "character varying",
+    "timestamp without time zone": "timestamp with time zone",
+    "json": "jsonb",
+    "smallint[]": "bigint[]",
+    "integer[]": "bigint[]",
+    "real[]": "double precision[]",
+    "numeric[]": "double precision[]",
+}
+
+# Date columns with at most this share of distinct values are parsed per
+# distinct value and mapped back, rather than row by row
+DISTINCT_DATE_RATIO = 0.5
+
+# Text and array columns read from postgres with at most this share of distinct
+# values are dictionary-encoded, storing each distinct value once
+DICTIONARY_ENCODE_RATIO = 0.1
+
+# Postgres dtypes float columns can be stored as. NUMERIC is exact but is read
+# back as one Decimal object per value; the binary float types are much cheaper.
+FLOAT_POSTGRES_DTYPES = {
+    "numeric": "NUMERIC",
+    "double precision": "DOUBLE_PRECISION",
+    "real": "REAL",
+}
+
 
 # Converting column values
 def convert_to_list(value):
-    if type(value) in {pd._libs.missing.NAType} or value != value:
+    if value is None or type(value) in {pd._libs.missing.NAType} or value != value:
         return value
     if type(value) == list:
         return value
@@ -40,7 +80,7 @@ def convert_to_list(value):
 
 
 def convert_to_tuple(value):
-    if type(value) in {pd._libs.missing.NAType} or value != value:
+    if value is None or type(value) in {pd._libs.missing.NAType} or value != value:
         return value
     if type(value) == list:
         return tuple(value)
@@ -57,27 +97,186 @@ def convert_to_tuple(value):
         raise Exception
 
 
+def convert_to_json(value):
+    if value is None or type(value) in {pd._libs.missing.NAType} or value != value:
+        return value
+    elif type(value) == dict:
+        return value
+    elif type(value) == str:
+        return json.loads(value)
+    raise Exception(f"Cannot convert {value} to json")
+
+
+def escape_copy_text(text):
+    """
+    Escapes the characters COPY text format treats specially
+    :param text:
+    :return:
+    """
+    return (
+        text.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def encode_copy_float(value):
+    if np.isinf(value):
+        return "Infinity" if value > 0 else "-Infinity"
+    return repr(float(value))
+
+
+def encode_copy_array_element(element):
+    if element is None or element is pd.NA or element != element:
+        return "NULL"
+    elif isinstance(element, (bool, np.bool_)):
+        return "t" if element else "f"
+    elif isinstance(element, (int, np.integer)):
+        return str(element)
+    elif isinstance(element, (float, np.floating)):
+        return encode_copy_float(element)
+    text = str(element).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def encode_copy_value(value):
+    """
+    Encodes a value in postgres COPY text format. Arrays become array literals,
+    dictionaries JSON and missing values \\N.
+    :param value:
+    :return:
+    """
+    if value is None or value is pd.NA or value is pd.NaT:
+        return "\\N"
+    elif isinstance(value, (bool, np.bool_)):
+        return "t" if value else "f"
+    elif isinstance(value, (int, np.integer)):
+        return str(value)
+    elif isinstance(value, (float, np.floating)):
+        return "\\N" if np.isnan(value) else encode_copy_float(value)
+    elif isinstance(value, (datetime, date)):
+        return value.isoformat()
+    elif isinstance(value, dict):
+        return escape_copy_text(json.dumps(value))
+    elif isinstance(value, (list, tuple, np.ndarray)):
+        elements = ",".join(encode_copy_array_element(element) for element in value)
+        return escape_copy_text(f"{{{elements}}}")
+    return escape_copy_text(str(value))
+
+
+def adapt_insert_value(value):
+    """
+    Converts a value to one psycopg2 can pass as a query parameter. Arrays become
+    lists, dictionaries JSON and NumPy scalars plain python values.
+    :param value:
+    :return:
+    """
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    elif isinstance(value, (float, np.floating)) and np.isnan(value):
+        return None
+    elif isinstance(value, np.generic):
+        return value.item()
+    elif isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    elif isinstance(value, dict):
+        return psycopg2_extras.Json(value)
+    elif isinstance(value, (list, tuple, np.ndarray)):
+        return [adapt_insert_value(element) for element in value]
+    return value
+
+
+def read_numeric_text(value, cursor):
+    """
+    psycopg2 typecaster keeping NUMERIC values as their text rather than making
+    a Decimal per value. convert_database_columns parses the column in one call.
+    :param value:
+    :param cursor:
+    :return:
+    """
+    return value
+
+
+def convert_numeric_text(series):
+    """
+    Parses NUMERIC text into float64 with a single NumPy cast, without creating
+    a python object per value
+    :param series: object column of numeric strings and missing values
+    :return:
+    """
+    mask = series.isna().to_numpy()
+    values = np.full(series.shape[0], np.nan)
+    values[~mask] = series.to_numpy(dtype=object)[~mask].astype(float)
+    return pd.Series(pd.array(values, dtype="Float64"), index=series.index)
+
+
 def convert_to_boolean(value):
     if pd.isna(value):
         return value
     elif value in {True, False}:
         return value
     elif type(value) == str:
-        if value.lower() in {"true", "t"}:
-            return True
-        elif value.lower() in {"false", "f"}:
-            return False
+        boolean_value = get_boolean_value(value)
+        if boolean_value is None:
+            raise Exception(f"Unsupported boolean value: {value}")
+        return boolean_value
     else:
         raise Exception(f"Unsupported boolean type: {type(value)}")
 
 
+def parse_dates(series, date_format=None):
+    """
+    Parses dates with an explicit format, falling back to pandas' per-value
+    inference when the format doesn't fit every value
+    :param series:
+    :param date_format:
+    :return: (parsed dates, format used or None)
+    """
+    if date_format:
+        try:
+            return pd.to_datetime(series, format=date_format, utc=True), date_format
+        except (ValueError, TypeError):
+            pass
+    return pd.to_datetime(series, utc=True), None
+
+
 # Converting column dtypes
-def convert_dtype_date(df, col):
+def convert_dtype_date(df, col, date_formats=None):
+    """
+    Converts a date column to datetime64[ns, UTC]. String dates are parsed with
+    a format detected from a sample, and columns with repeated values are parsed
+    once per distinct value.
+    :param df:
+    :param col:
+    :param date_formats: column -> format dictionary, used and updated so the
+        detected format is reused on later calls
+    :return:
+    """
     dtype = df[col].dtype.__repr__()
     if dtype in {"datetime64[ns, UTC]"}:
         return df[col]
+
+    date_formats = {} if date_formats is None else date_formats
+    # A remembered format is checked against a sample before it's trusted
+    date_format = None
+    if date_formats.get(col):
+        date_format = detect_date_format(df[col], date_formats=[date_formats[col]])
+    date_format = date_format or detect_date_format(df[col])
+    sample = df[col].iloc[:: max(1, df.shape[0] // 1000)]
+    if sample.nunique() <= sample.shape[0] * DISTINCT_DATE_RATIO:
+        codes, values = pd.factorize(df[col])
+        parsed_values, date_format = parse_dates(pd.Series(values), date_format)
+        parsed = parsed_values.array.take(codes, allow_fill=True)
+        parsed = pd.Series(parsed, index=df.index, name=col)
+    else:
+        parsed, date_format = parse_dates(df[col], date_format)
+
+    if date_format:
+        date_formats[col] = date_format
     else:
-        return pd.to_datetime(df[col], utc=True).copy()
+        date_formats.pop(col, None)
+    return parsed.copy()
 
 
 def convert_dtype_array(df, col):
@@ -88,8 +287,28 @@ def convert_dtype_array(df, col):
     :param col:
     :return:
     """
-    df[col] = df[col].apply(convert_to_tuple).fillna(pd.NA).copy()
-    return df[col]
+    return df[col].apply(convert_to_tuple).fillna(pd.NA)
+
+
+def convert_dtype_dictionary(df, col, dtype):
+    """
+    Dictionary-encodes a text or array column read from postgres. Text becomes a
+    pandas categorical; array values are converted to tuples and repeated values
+    then share a single tuple object.
+    :param df:
+    :param col:
+    :param dtype: the column's siphon dtype
+    :return:
+    """
+    if check_dtype_array(dtype=dtype):
+        series = convert_dtype_array(df=df, col=col)
+        codes, values = pd.factorize(series)
+        values = pd.array(np.asarray(values, dtype=object), dtype=object)
+        encoded = values.take(codes, allow_fill=True, fill_value=pd.NA)
+        return pd.Series(encoded, index=df.index, name=col)
+    codes, values = pd.factorize(df[col])
+    encoded = pd.Categorical.from_codes(codes, categories=values.astype(str))
+    return pd.Series(encoded, index=df.index, name=col)
 
 
 def convert_dtype_boolean(df, col):
@@ -105,7 +324,74 @@ def convert_dtype_boolean(df, col):
     elif dtype in {"dtype('bool')"}:
         return df[col].convert_dtypes().copy()
     else:
-        return df[col].apply(convert_to_boolean).convert_dtypes().copy()
+        return convert_series_to_boolean(df[col])
+
+
+def convert_series_to_boolean(series):
+    """
+    Converts booleans, 0/1 values or boolean strings to BooleanDtype in one pass.
+    Only the distinct values are looked up in the spelling table; every row is
+    then mapped through the resulting lookup array.
+    :param series:
+    :return:
+    """
+    codes, values = pd.factorize(series)
+    # Missing values get code -1, which indexes the extra last slot
+    lookup = np.zeros(len(values) + 1, dtype=bool)
+    for i, value in enumerate(values):
+        boolean_value = get_boolean_value(value)
+        if boolean_value is None:
+            raise Exception(f"Unsupported boolean value: {value}")
+        lookup[i] = boolean_value
+    boolean_array = pd.arrays.BooleanArray(lookup[codes], codes == -1)
+    return pd.Series(boolean_array, index=series.index, name=series.name)
+
+
+def convert_dtype_json(df, col):
+    """
+    Converts a dictionary or JSON string column to dictionaries, stored as JSONB
+    :param df:
+    :param col:
+    :return:
+    """
+    return df[col].apply(convert_to_json).fillna(pd.NA).copy()
+
+
+def convert_database_json(series):
+    """
+    Keeps json and jsonb values as psycopg2 decoded them. Besides objects, JSON
+    holds arrays, strings, numbers and booleans, which must not be parsed again.
+    :param series:
+    :return:
+    """
+    return series.astype(object).where(series.notna(), pd.NA)
+
+
+def convert_dtype_category(df, col):
+    """
+    Converts a column to a pandas categorical, stored as a postgres enum
+    :param df:
+    :param col:
+    :return:
+    """
+    dtype = df[col].dtype.__repr__()
+    if dtype.startswith("CategoricalDtype"):
+        return df[col]
+    else:
+        return df[col].astype("category")
+
+
+def convert_dtype_calendar_date(df, col):
+    """
+    Converts a column to datetime.date values, stored as DATE
+    :param df:
+    :param col:
+    :return:
+    """
+    if pd.api.types.infer_dtype(df[col], skipna=True) == "date":
+        return df[col]
+    dates = pd.to_datetime(df[col])
+    return dates.dt.date.where(dates.notna()).copy()
 
 
 def convert_dtype_int(df, col):
@@ -132,6 +418,9 @@ def convert_dtype_float(df, col):
     dtype = df[col].dtype.__repr__()
     if dtype in {"Float32Dtype()", "Float64Dtype()"}:
         return df[col]
+    # Decimal values read from NUMERIC columns
+    elif dtype in {"dtype('O')"} and check_col_decimal(df[col]):
+        return pd.to_numeric(df[col]).convert_dtypes().copy()
     else:
         return df[col].convert_dtypes().copy()
 
@@ -143,16 +432,39 @@ def convert_dtype_string(df, col):
     :param col:
     :return:
     """
-    dtype = df[col].dtype.__repr__()
-    if dtype in {"StringDtype"}:
+    if isinstance(df[col].dtype, pd.StringDtype):
         return df[col]
     else:
         return df[col].convert_dtypes().copy()
 
 
 # Converting dtypes
-def get_dtype_lookup_df():
-    dataframe_dtypes = ["date", "varchar_array", "bool", "int", "float", "string"]
+def get_dtype_lookup_df(float_dtype="numeric"):
+    return build_dtype_lookup_df(float_dtype).copy()
+
+
+@lru_cache(maxsize=None)
+def build_dtype_lookup_df(float_dtype):
+    """
+    Builds the dtype lookup table once per float dtype; get_dtype_lookup_df hands
+    out copies
+    :param float_dtype:
+    :return:
+    """
+    dataframe_dtypes = [
+        "date",
+        "varchar_array",
+        "bool",
+        "int",
+        "float",
+        "string",
+        "json",
+        "int_array",
+        "float_array",
+        "bool_array",
+        "calendar_date",
+        "category",
+    ]
     postgres_descriptions = [
         "timestamp with time zone",
         "ARRAY",
@@ -160,14 +472,27 @@ def get_dtype_lookup_df():
         "bigint",
         "numeric",
         "character varying",
+        "jsonb",
+        "bigint[]",
+        "double precision[]",
+        "boolean[]",
+        "date",
+        "enum",
     ]
+    # Categories are exported as a per-column enum; VARCHAR is the fallback
     postgres_dtypes = [
-        TIMESTAMP(timezone=True),
-        ARRAY(item_type=VARCHAR),
-        BOOLEAN,
-        BIGINT,
-        NUMERIC,
-        VARCHAR,
+        postgresql.TIMESTAMP(timezone=True),
+        postgresql.ARRAY(item_type=postgresql.VARCHAR),
+        postgresql.BOOLEAN,
+        postgresql.BIGINT,
+        getattr(postgresql, FLOAT_POSTGRES_DTYPES[float_dtype]),
+        postgresql.VARCHAR,
+        postgresql.JSONB,
+        postgresql.ARRAY(item_type=postgresql.BIGINT),
+        postgresql.ARRAY(item_type=postgresql.DOUBLE_PRECISION),
+        postgresql.ARRAY(item_type=postgresql.BOOLEAN),
+        postgresql.DATE,
+        postgresql.VARCHAR,
     ]
     data = {
         "dataframe_dtype": dataframe_dtypes,
@@ -180,62 +505,258 @@ def get_dtype_lookup_df():
     return lookup_df
 
 
-def get_merged_dtype_df(dtype_df, merge_col):
-    lookup_df = get_dtype_lookup_df()
+def get_merged_dtype_df(dtype_df, merge_col, float_dtype="numeric"):
+    lookup_df = get_dtype_lookup_df(float_dtype=float_dtype)
     merged_dtype_df = dtype_df.merge(lookup_df, on=merge_col, how="left")
     return merged_dtype_df
 
 
-def convert_dtypes(dtype_dict, from_dtype="dataframe_dtype", to_dtype="postgres_dtype"):
+def convert_dtypes(
+    dtype_dict,
+    from_dtype="dataframe_dtype",
+    to_dtype="postgres_dtype",
+    float_dtype="numeric",
+):
+    if from_dtype == "postgres_description":
+        dtype_dict = {
+            col: POSTGRES_DESCRIPTION_ALIASES.get(dtype, dtype)
+            for col, dtype in dtype_dict.items()
+        }
     data = {
         "column_name": list(dtype_dict.keys()),
         from_dtype: list(dtype_dict.values()),
     }
     dtype_df = pd.DataFrame(data=data)
-    merged_dtype_df = get_merged_dtype_df(dtype_df=dtype_df, merge_col=from_dtype)
+    merged_dtype_df = get_merged_dtype_df(
+        dtype_df=dtype_df, merge_col=from_dtype, float_dtype=float_dtype
+    )
     converted_dtype_dict = merged_dtype_df.set_index("column_name")[to_dtype].to_dict()
     return converted_dtype_dict
 
 
 # Dataframe Conversions
-def pre_convert_data(df):
+def pre_convert_data(df, in_place=False):
     """
     Standardizes dataframes before checking column types
     :param df:
+    :param in_place: convert one column at a time on the given frame, so only one
+        column is copied at once instead of the whole frame
     :return:
     """
+    if in_place:
+        for col in df.columns:
+            df[col] = df[col].fillna(np.nan).convert_dtypes()
+        return df
     df.fillna(np.nan, inplace=True)
     df = df.convert_dtypes().copy()
     return df
 
 
-def convert_dataframe_columns(df, dtype_dict):
+def convert_column(df, col, dtype, date_formats=None):
+    """
+    Converts one column to its siphon dtype
+    :param df:
+    :param col:
+    :param dtype:
+    :param date_formats:
+    :return:
+    """
+    # Categoricals
+    if check_dtype_category(dtype=dtype):
+        return convert_dtype_category(df=df, col=col)
+    # Dates without times
+    elif check_dtype_calendar_date(dtype=dtype):
+        return convert_dtype_calendar_date(df=df, col=col)
+    # Dates
+    elif check_dtype_date(dtype=dtype):
+        return convert_dtype_date(df=df, col=col, date_formats=date_formats)
+    # JSON
+    elif check_dtype_json(dtype=dtype):
+        return convert_dtype_json(df=df, col=col)
+    # Arrays
+    elif check_dtype_array(dtype=dtype):
+        return convert_dtype_array(df=df, col=col)
+    # Booleans
+    elif check_dtype_boolean(dtype=dtype):
+        return convert_dtype_boolean(df=df, col=col)
+    # Ints
+    elif check_dtype_int(dtype=dtype):
+        return convert_dtype_int(df=df, col=col)
+    # Floats
+    elif check_dtype_float(dtype=dtype):
+        return convert_dtype_float(df=df, col=col)
+    # Strings
+    elif check_dtype_string(dtype=dtype):
+        return convert_dtype_string(df=df, col=col)
+    else:
+        raise Exception(f"Dtype of {col} could not be determined")
+
+
+def convert_column_worker(df, col, dtype, date_format=None):
+    """
+    Pool worker converting one column. Detected date formats are returned since a
+    process can't update the caller's dictionary.
+    :param df:
+    :param col:
+    :param dtype:
+    :param date_format: remembered date format for the column
+    :return: (converted column, date format)
+    """
+    date_formats = {col: date_format} if date_format else {}
+    series = convert_column(df, col, dtype, date_formats=date_formats)
+    return series, date_formats.get(col)
+
+
+def convert_dataframe_columns(
+    df, dtype_dict, date_formats=None, max_workers=1, parallel="thread"
+):
     """
     Converts each column to its appropriate data type
     :param df:
+    :param dtype_dict:
+    :param date_formats: column -> date format dictionary shared across calls
+    :param max_workers: columns converted concurrently
+    :param parallel: 'thread' or 'process' pool when max_workers > 1. Processes
+        sidestep the GIL for object columns at the cost of pickling them.
     :return:
     """
+    date_formats = {} if date_formats is None else date_formats
+
+    worker_cols = []
+    if max_workers > 1 and len(dtype_dict) > 1:
+        worker_cols = get_worker_columns(df, dtype_dict, parallel)
+        results = map_columns(
+            convert_column_worker,
+            df,
+            worker_cols,
+            args={col: (dtype_dict[col], date_formats.get(col)) for col in worker_cols},
+            max_workers=max_workers,
+            parallel=parallel,
+        )
+        for col, (series, date_format) in results.items():
+            df[col] = series
+            if date_format:
+                date_formats[col] = date_format
+            else:
+                date_formats.pop(col, None)
 
     for col, dtype in dtype_dict.items():
-        # Dates
-        if check_dtype_date(dtype=dtype):
-            df[col] = convert_dtype_date(df=df, col=col)
-        # Arrays
-        elif check_dtype_array(dtype=dtype):
-            df[col] = convert_dtype_array(df=df, col=col)
-        # Booleans
-        elif check_dtype_boolean(dtype=dtype):
-            df[col] = convert_dtype_boolean(df=df, col=col)
-        # Ints
-        elif check_dtype_int(dtype=dtype):
-            df[col] = convert_dtype_int(df=df, col=col)
-        # Floats
-        elif check_dtype_float(dtype=dtype):
-            df[col] = convert_dtype_float(df=df, col=col)
-        # Strings
-        elif check_dtype_string(dtype=dtype):
-            df[col] = convert_dtype_string(df=df, col=col)
-        else:
-            raise Exception(f"Dtype of {col} could not be determined")
+        if col not in worker_cols:
+            df[col] = convert_column(df, col, dtype, date_formats=date_formats)
 
     return df
+
+
+def get_distinct_ratio(series, sample_size=10000):
+    """
+    Estimates a column's share of distinct values from an evenly spaced sample.
+    The estimate errs high on large columns, so it only encodes columns that are
+    clearly repetitive.
+    :param series:
+    :param sample_size:
+    :return:
+    """
+    sample = series.iloc[:: max(1, series.shape[0] // sample_size)].dropna()
+    if sample.empty:
+        return 0.0
+    if sample.map(type).eq(list).any():
+        sample = sample.map(convert_to_tuple)
+    return sample.nunique() / sample.shape[0]
+
+
+def get_dictionary_columns(
+    df, df_dtype_dict, distinct_ratios=None, max_ratio=DICTIONARY_ENCODE_RATIO
+):
+    """
+    Picks the text and array columns repetitive enough to dictionary-encode
+    :param df:
+    :param df_dtype_dict:
+    :param distinct_ratios: column -> share of distinct values, e.g. from pg_stats.
+        Columns missing from it are estimated from the dataframe.
+    :param max_ratio:
+    :return:
+    """
+    distinct_ratios = distinct_ratios or {}
+    dictionary_cols = []
+    for col, dtype in df_dtype_dict.items():
+        if not (check_dtype_string(dtype=dtype) or check_dtype_array(dtype=dtype)):
+            continue
+        distinct_ratio = distinct_ratios.get(col)
+        if distinct_ratio is None:
+            distinct_ratio = get_distinct_ratio(df[col])
+        if distinct_ratio <= max_ratio:
+            dictionary_cols.append(col)
+    return dictionary_cols
+
+
+def convert_database_columns(
+    df, db_dtype_dict, dictionary_encode=False, distinct_ratios=None
+):
+    """
+    Converts a dataframe read from postgres using each column's postgres description.
+    Columns whose description has no siphon dtype are left as read.
+    :param df:
+    :param db_dtype_dict:
+    :param dictionary_encode: dictionary-encode low-cardinality text and array
+        columns instead of holding one object per row. Encoded text columns are
+        categoricals, so exporting them again creates enum columns.
+    :param distinct_ratios: column -> share of distinct values used to pick the
+        columns to encode
+    :return:
+    """
+    df_dtype_dict = convert_dtypes(
+        dtype_dict=db_dtype_dict,
+        from_dtype="postgres_description",
+        to_dtype="dataframe_dtype",
+    )
+    df_dtype_dict = {
+        col: dtype for col, dtype in df_dtype_dict.items() if pd.notna(dtype)
+    }
+    dictionary_cols = []
+    if dictionary_encode:
+        dictionary_cols = get_dictionary_columns(df, df_dtype_dict, distinct_ratios)
+    # Text is encoded before pre-conversion so no per-row string objects are created
+    for col in dictionary_cols:
+        if check_dtype_string(dtype=df_dtype_dict[col]):
+            df[col] = convert_dtype_dictionary(df, col, df_dtype_dict.pop(col))
+    # NUMERIC read as text with numeric_as_float is parsed before it can become
+    # a string column
+    for col, description in db_dtype_dict.items():
+        if description == "numeric" and check_col_numeric_text(df[col]):
+            df[col] = convert_numeric_text(df[col])
+    # JSON is already decoded, so it's set aside from string and json conversion
+    json_values = {
+        col: df[col]
+        for col, dtype in df_dtype_dict.items()
+        if check_dtype_json(dtype=dtype)
+    }
+    for col in json_values:
+        df_dtype_dict.pop(col)
+    df = pre_convert_data(df)
+    df = convert_dataframe_columns(df, df_dtype_dict)
+    for col, series in json_values.items():
+        df[col] = convert_database_json(series)
+    # Arrays share repeated values once they're tuples
+    for col in dictionary_cols:
+        if col in df_dtype_dict:
+            df[col] = convert_dtype_dictionary(df, col, df_dtype_dict[col])
+    return df
+
+
+def convert_query_rows(rows, description, dictionary_encode=False):
+    """
+    Builds a dataframe from DBAPI rows and converts it using the cursor description
+    :param rows:
+    :param description:
+    :param dictionary_encode: dictionary-encode low-cardinality text and array columns
+    :return:
+    """
+    # Statements that return no rows (DDL, updates) have no description
+    if description is None:
+        return pd.DataFrame()
+    db_dtype_dict = get_query_dtypes(description)
+    columns = [column[0] for column in description]
+    df = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+    return convert_database_columns(
+        df, db_dtype_dict, dictionary_encode=dictionary_encode
+    )
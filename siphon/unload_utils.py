@@ -0,0 +1,167 @@
+import json
+import os
+
+from siphon.arrow_utils import get_arrow_file_format, import_pyarrow
+from siphon.lazy_utils import lazy_import
+from siphon.type_conversion_utils import convert_dtypes
+
+pd = lazy_import("pandas")
+
+# Postgres 14 added TID range scans. Before it, every ctid range filter scans
+# the whole heap.
+TID_RANGE_SCAN_VERSION = 140000
+
+
+def get_arrow_type(pa, dtype, dictionary=True):
+    """
+    Maps a siphon dataframe dtype to the Arrow type it's written as
+    :param pa: pyarrow module
+    :param dtype: dataframe_dtype from the dtype lookup
+    :param dictionary: write categories as dictionary-encoded strings. Feather
+        files can't hold a different dictionary per batch, so they're plain strings.
+    :return:
+    """
+    if dtype == "date":
+        return pa.timestamp("ns", tz="UTC")
+    elif dtype == "calendar_date":
+        return pa.date32()
+    elif dtype == "bool":
+        return pa.bool_()
+    elif dtype == "int":
+        return pa.int64()
+    elif dtype == "float":
+        return pa.float64()
+    elif dtype == "category" and dictionary:
+        return pa.dictionary(pa.int32(), pa.string())
+    elif dtype == "int_array":
+        return pa.list_(pa.int64())
+    elif dtype == "float_array":
+        return pa.list_(pa.float64())
+    elif dtype == "bool_array":
+        return pa.list_(pa.bool_())
+    elif dtype == "varchar_array":
+        return pa.list_(pa.string())
+    # Strings, JSON (serialized) and types siphon doesn't map
+    return pa.string()
+
+
+def get_arrow_schema(db_dtype_dict, dictionary=True):
+    """
+    Builds the Arrow schema a table is unloaded with from its postgres descriptions
+    :param db_dtype_dict: column -> postgres description, in column order
+    :param dictionary: write categories as dictionary-encoded strings
+    :return: (pyarrow.Schema, column -> dataframe dtype)
+    """
+    pa, _ = import_pyarrow()
+    df_dtype_dict = convert_dtypes(
+        dtype_dict=db_dtype_dict,
+        from_dtype="postgres_description",
+        to_dtype="dataframe_dtype",
+    )
+    df_dtype_dict = {
+        col: dtype for col, dtype in df_dtype_dict.items() if pd.notna(dtype)
+    }
+    fields = [
+        pa.field(col, get_arrow_type(pa, df_dtype_dict.get(col), dictionary))
+        for col in db_dtype_dict
+    ]
+    return pa.schema(fields), df_dtype_dict
+
+
+def prepare_arrow_frame(df, df_dtype_dict):
+    """
+    Turns the columns Arrow can't take as converted into strings: JSON is
+    serialized and unmapped types are written as text
+    :param df: dataframe converted with convert_database_columns
+    :param df_dtype_dict: column -> dataframe dtype
+    :return:
+    """
+    for col in df.columns:
+        dtype = df_dtype_dict.get(col)
+        if dtype == "json":
+            df[col] = df[col].apply(
+                lambda value: (
+                    None if value is None or value is pd.NA else json.dumps(value)
+                )
+            )
+        elif dtype is None:
+            df[col] = df[col].apply(
+                lambda value: None if value is None or value is pd.NA else str(value)
+            )
+    return df
+
+
+def get_page_count(table, schema, connection):
+    query = (
+        f"select pg_relation_size('{schema}.{table}') "
+        f"/ current_setting('block_size')::int"
+    )
+    return int(connection.connection.execute(query).scalar())
+
+
+def get_server_version(connection):
+    return int(connection.connection.execute("show server_version_num").scalar())
+
+
+def get_unload_partitions(partitions, server_version):
+    """
+    Partitions an unload can read in parallel. Without TID range scans N
+    partitions would be N full scans, so older servers read in one partition.
+    :param partitions: partitions requested
+    :param server_version: server_version_num
+    :return:
+    """
+    if server_version < TID_RANGE_SCAN_VERSION:
+        return 1
+    return partitions
+
+
+def get_partition_filters(page_count, partitions):
+    """
+    Splits a table into ranges of pages using ctid, so each partition reads a
+    disjoint part of the heap. The last range is left open for rows added since
+    the page count was read.
+    :param page_count:
+    :param partitions:
+    :return: where clause per partition
+    """
+    if partitions <= 1:
+        return [""]
+    pages_per_partition = -(-max(page_count, 1) // partitions)
+    filters = []
+    for i in range(partitions):
+        start, end = i * pages_per_partition, (i + 1) * pages_per_partition
+        if i == partitions - 1:
+            filters.append(f"where ctid >= '({start},0)'::tid")
+        else:
+            filters.append(
+                f"where ctid >= '({start},0)'::tid and ctid < '({end},0)'::tid"
+            )
+    return filters
+
+
+def get_partition_paths(path, partitions):
+    """
+    A single partition is written to path; several are written as numbered files
+    in a directory named path
+    :param path:
+    :param partitions:
+    :return:
+    """
+    if partitions <= 1:
+        return [path]
+    extension = os.path.splitext(path)[1]
+    return [os.path.join(path, f"part-{i:05d}{extension}") for i in range(partitions)]
+
+
+def open_writer(path, arrow_schema):
+    pa, pq = import_pyarrow()
+    if get_arrow_file_format(path) == "parquet":
+        return pq.ParquetWriter(path, arrow_schema)
+    return pa.ipc.new_file(path, arrow_schema)
+
+
+def write_row_group(writer, df, arrow_schema):
+    pa, _ = import_pyarrow()
+    table = pa.Table.from_pandas(df, schema=arrow_schema, preserve_index=False)
+    writer.write_table(table)
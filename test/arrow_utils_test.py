@@ -0,0 +1,74 @@
+import datetime
+
+import pytest
+
+from siphon.arrow_utils import get_arrow_file_format
+
+
+def test_get_arrow_file_format():
+    assert get_arrow_file_format("out/events.PQ") == "parquet"
+    assert get_arrow_file_format("events.arrow") == "feather"
+    with pytest.raises(Exception):
+        get_arrow_file_format("events.csv")
+
+
+def test_get_arrow_dtypes():
+    pa = pytest.importorskip("pyarrow")
+    from siphon.arrow_utils import get_arrow_dtypes
+
+    arrow_schema = pa.schema(
+        [
+            ("id", pa.int32()),
+            ("amount", pa.float64()),
+            ("name", pa.string()),
+            ("status", pa.dictionary(pa.int32(), pa.string())),
+            ("created_at", pa.timestamp("us")),
+            ("day", pa.date32()),
+            ("tags", pa.list_(pa.string())),
+            ("payload", pa.struct([("a", pa.int64())])),
+        ]
+    )
+    assert get_arrow_dtypes(arrow_schema) == {
+        "id": "int",
+        "amount": "float",
+        "name": "string",
+        "status": "category",
+        "created_at": "date",
+        "day": "calendar_date",
+        "tags": "varchar_array",
+        "payload": "json",
+    }
+    with pytest.raises(Exception):
+        get_arrow_dtypes(pa.schema([("raw", pa.binary())]))
+
+
+def test_encode_arrow_table():
+    pa = pytest.importorskip("pyarrow")
+    from siphon.arrow_utils import encode_arrow_table
+
+    table = pa.table(
+        {
+            "id": [1, None],
+            "name": ["a\tb", "c"],
+            "created_at": pa.array(
+                [datetime.datetime(2021, 1, 2, 3, 4, 5), None], pa.timestamp("us")
+            ),
+            "tags": [["x", "y"], []],
+        }
+    )
+    assert encode_arrow_table(table) == (
+        '1\ta\\tb\t2021-01-02T03:04:05+00:00\t{"x","y"}\n\\N\tc\t\\N\t{}\n'
+    )
+
+
+def test_open_arrow_file(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    from siphon.arrow_utils import open_arrow_file
+
+    path = str(tmp_path / "events.parquet")
+    pq.write_table(pa.table({"id": list(range(10))}), path, row_group_size=4)
+    arrow_schema, num_rows, batches = open_arrow_file(path)
+    assert arrow_schema.names == ["id"]
+    assert num_rows == 10
+    assert [batch.num_rows for batch in batches] == [4, 4, 2]
@@ -0,0 +1,35 @@
+import pandas as pd
+
+from siphon.batch_utils import (
+    MAX_BIND_PARAMETERS,
+    AdaptiveBatchSizer,
+    get_batch_size,
+    get_export_batch_size,
+)
+
+
+def test_get_batch_size():
+    # Wide rows are limited by bind parameters, large rows by bytes
+    assert get_batch_size(300, 100) == MAX_BIND_PARAMETERS // 300
+    assert get_batch_size(5, 1024**2, max_bytes=16 * 1024**2) == 16
+    assert get_batch_size(300, 100, max_parameters=None) == 16 * 1024**2 // 100
+    assert get_batch_size(1, 10**9) == 1
+
+
+def test_get_export_batch_size():
+    df = pd.DataFrame({f"col_{i}": range(1000) for i in range(100)})
+    assert get_export_batch_size(df, "multi") == MAX_BIND_PARAMETERS // 100
+    assert get_export_batch_size(df, "copy") > MAX_BIND_PARAMETERS // 100
+
+
+def test_adaptive_batch_sizer():
+    sizer = AdaptiveBatchSizer(max_batch_size=80000, target_seconds=1.0)
+    assert sizer.batch_size == 10000
+    # Fast batches grow at most 2x at a time, up to the limit
+    assert sizer.update(10000, 0.1) == 20000
+    assert sizer.update(20000, 0.1) == 40000
+    assert sizer.update(40000, 0.1) == 80000
+    assert sizer.update(80000, 0.1) == 80000
+    # Slow batches shrink towards the target latency
+    assert sizer.update(80000, 4.0) == 20000
+    assert sizer.update(20000, 1000.0) == 100
@@ -0,0 +1,54 @@
+import pytest
+
+from siphon.checkpoint_utils import (
+    check_checkpoint_rows,
+    check_transient_error,
+    get_retry_delay,
+    get_staging_table,
+)
+
+
+def test_get_staging_table():
+    expected_values = {
+        ("mock", "job-1"): "mock_siphon_job_1",
+        ("mock", "Nightly Load"): "mock_siphon_nightly_load",
+        ("mock", 42): "mock_siphon_42",
+    }
+    for (table, job_id), expected_value in expected_values.items():
+        assert get_staging_table(table, job_id) == expected_value
+    # Long names end in a hash of the table and job instead of being cut off
+    staging_tables = {
+        get_staging_table("t" * 60, "job-1"),
+        get_staging_table("t" * 60, "job-2"),
+        get_staging_table("t" * 61, "job-1"),
+    }
+    assert len(staging_tables) == 3
+    assert all(len(staging_table) == 63 for staging_table in staging_tables)
+    staging_table = get_staging_table("t" * 60, "job")
+    assert get_staging_table(staging_table, "job") != staging_table
+
+
+def test_check_checkpoint_rows():
+    check_checkpoint_rows(None, "job", 100)
+    check_checkpoint_rows({"total_rows": None}, "job", 100)
+    check_checkpoint_rows({"total_rows": 100}, "job", 100)
+    with pytest.raises(Exception, match="started with 100 rows"):
+        check_checkpoint_rows({"total_rows": 100}, "job", 90)
+
+
+def test_get_retry_delay():
+    actual_values = [get_retry_delay(attempt, 0.5) for attempt in range(4)]
+    assert actual_values == [0.5, 1.0, 2.0, 4.0]
+
+
+def test_check_transient_error():
+    psycopg2 = pytest.importorskip("psycopg2")
+    sqlalchemy_exc = pytest.importorskip("sqlalchemy.exc")
+
+    assert check_transient_error(psycopg2.OperationalError("server closed"))
+    assert check_transient_error(psycopg2.InterfaceError("connection already closed"))
+    wrapped = sqlalchemy_exc.OperationalError("insert", {}, psycopg2.OperationalError())
+    assert check_transient_error(wrapped)
+    # Bad data fails the same way on every attempt
+    assert not check_transient_error(psycopg2.DataError("invalid input syntax"))
+    assert not check_transient_error(ValueError("bad value"))
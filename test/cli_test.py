@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from siphon.cli import (
+    build_parser,
+    get_file_format,
+    read_frame,
+    split_table_name,
+    write_frames,
+)
+
+
+def test_build_parser():
+    args = build_parser().parse_args(
+        ["export", "data.parquet", "--table", "mock", "--method", "copy"]
+    )
+    assert (args.path, args.table, args.method) == ("data.parquet", "mock", "copy")
+    assert (args.schema, args.workers, args.batch_size) == ("raw", 1, None)
+    assert (args.sort_by, args.brin, args.cluster) == (None, False, False)
+
+    args = build_parser().parse_args(
+        ["copy", "--from", "postgresql://a", "--to", "postgresql://b", "t1", "t2"]
+    )
+    assert args.tables == ["t1", "t2"]
+    assert (args.source_url, args.target_url) == ("postgresql://a", "postgresql://b")
+
+
+def test_split_table_name():
+    assert split_table_name("test.mock", "raw") == ("test", "mock")
+    assert split_table_name("mock", "raw") == ("raw", "mock")
+
+
+def test_get_file_format():
+    assert get_file_format("out/data.PARQUET") == "parquet"
+    with pytest.raises(Exception):
+        get_file_format("data.xlsx")
+
+
+@pytest.mark.parametrize("extension", ["csv", "json"])
+def test_write_frames(tmp_path, extension):
+    df = pd.DataFrame({"ints": [1, 13, 9000], "strings": ["octopus", "lion", "cat"]})
+    path = str(tmp_path / f"mock.{extension}")
+    assert write_frames([df.iloc[:2], df.iloc[2:]], path) == 3
+    assert read_frame(path).equals(df)
+    # One line per row, without blank lines between chunks
+    if extension == "json":
+        with open(path) as f:
+            assert f.read() == (
+                '{"ints":1,"strings":"octopus"}\n'
+                '{"ints":13,"strings":"lion"}\n'
+                '{"ints":9000,"strings":"cat"}\n'
+            )
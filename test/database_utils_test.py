@@ -6,7 +6,16 @@ from siphon.database_utils import (
     get_reference_table,
     check_table_exists,
     declare_primary_key,
+    get_enum_dtype,
+    get_schema_evolution_queries,
+    get_swap_queries,
+    get_table_ddl,
+    get_watermark,
+    merge_incremental,
+    scale_row_estimate,
+    sort_dataframe,
 )
+from siphon.type_conversion_utils import convert_dtypes
 
 # from siphon.type_checking_utils import
 from siphon.PostgresConnection import PostgresConnection
@@ -101,3 +110,166 @@ def test_check_table_exists():
                 kwarg["table"], kwarg["schema"], connection.connection
             )
             assert actual_value == kwarg["value"], f"kwargs: {kwarg}"
+
+
+def test_get_watermark():
+    expected_values = [
+        {"series": pd.Series([3, 9, 1], dtype="Int64"), "since": None, "value": 9},
+        {"series": pd.Series([], dtype="Int64"), "since": 4, "value": 4},
+        {"series": pd.Series([pd.NA, pd.NA], dtype="Int64"), "since": 4, "value": 4},
+        {
+            "series": pd.to_datetime(pd.Series(["2020-03-18", "2020-11-18"]), utc=True),
+            "since": None,
+            "value": pd.Timestamp("2020-11-18", tz="UTC").to_pydatetime(),
+        },
+    ]
+    for kwarg in expected_values:
+        actual_value = get_watermark(kwarg["series"], since=kwarg["since"])
+        assert actual_value == kwarg["value"]
+        assert type(actual_value) == type(kwarg["value"])
+
+
+def test_merge_incremental():
+    cached_df = pd.DataFrame({"id": [1, 2, 3], "strings": ["octopus", "lion", "cat"]})
+    new_df = pd.DataFrame({"id": [2, 4], "strings": ["st. bernard", "dog"]})
+    merged_df = merge_incremental(cached_df, new_df)
+    assert merged_df["id"].values.tolist() == [1, 3, 2, 4]
+    assert merged_df["strings"].values.tolist() == [
+        "octopus",
+        "cat",
+        "st. bernard",
+        "dog",
+    ]
+
+
+def test_get_table_ddl():
+    dtype_param = convert_dtypes(
+        {
+            "id": "int",
+            "strings": "string",
+            "list": "varchar_array",
+            "start_date": "date",
+        }
+    )
+    expected_value = (
+        "CREATE TABLE test.mock (\n"
+        "\tid BIGINT, \n"
+        "\tstrings VARCHAR, \n"
+        "\tlist VARCHAR[], \n"
+        "\tstart_date TIMESTAMP WITH TIME ZONE\n"
+        ")"
+    )
+    assert get_table_ddl("mock", "test", dtype_param) == expected_value
+
+
+def test_get_schema_evolution_queries():
+    df = pd.DataFrame(
+        {
+            "ints": [1, 13, 3000000000],
+            "small_ints": [1, 13, 9000],
+            "floats": [123.3, 2.3, 9.0],
+            "strings": ["octopus", "lion", "st. bernard"],
+            "short_strings": ["a", "b", "c"],
+            "new_strings": ["a", "b", "c"],
+        }
+    ).convert_dtypes()
+    df_dtype_dict = {
+        "ints": "int",
+        "small_ints": "int",
+        "floats": "float",
+        "strings": "string",
+        "short_strings": "string",
+        "new_strings": "string",
+    }
+    dtype_param = convert_dtypes(df_dtype_dict, float_dtype="double precision")
+    db_columns = {
+        "ints": {"data_type": "integer", "character_maximum_length": np.nan},
+        # Values that still fit don't rewrite the table
+        "small_ints": {"data_type": "smallint", "character_maximum_length": np.nan},
+        "floats": {"data_type": "real", "character_maximum_length": np.nan},
+        "strings": {"data_type": "character varying", "character_maximum_length": 5},
+        "short_strings": {
+            "data_type": "character varying",
+            "character_maximum_length": 5,
+        },
+    }
+    expected_values = [
+        "alter table test.mock alter column ints type BIGINT",
+        "alter table test.mock alter column floats type DOUBLE PRECISION",
+        "alter table test.mock alter column strings type VARCHAR",
+        "alter table test.mock add column new_strings VARCHAR",
+    ]
+    queries = get_schema_evolution_queries(
+        df, "mock", "test", df_dtype_dict, dtype_param, db_columns
+    )
+    assert queries == expected_values
+
+
+def test_get_schema_evolution_queries_enums():
+    df = pd.DataFrame(
+        {
+            "status": pd.Series(["open", "won't fix"], dtype="category"),
+            "new_status": pd.Series(["open", "closed"], dtype="category"),
+        }
+    )
+    df_dtype_dict = {"status": "category", "new_status": "category"}
+    dtype_param = {
+        col: get_enum_dtype(df, "mock", "test", col) for col in df_dtype_dict
+    }
+    db_columns = {
+        "status": {
+            "data_type": "USER-DEFINED",
+            "character_maximum_length": np.nan,
+            "udt_schema": "test",
+            "udt_name": "mock_status_enum",
+        },
+    }
+    expected_values = [
+        "alter type test.mock_status_enum add value if not exists 'open'",
+        "alter type test.mock_status_enum add value if not exists 'won''t fix'",
+        "create type test.mock_new_status_enum as enum ('closed', 'open')",
+        "alter table test.mock add column new_status test.mock_new_status_enum",
+    ]
+    queries = get_schema_evolution_queries(
+        df, "mock", "test", df_dtype_dict, dtype_param, db_columns
+    )
+    assert queries == expected_values
+
+
+def test_get_swap_queries():
+    expected_values = [
+        "drop table if exists test.mock cascade",
+        "drop type if exists test.mock_status_enum",
+        "alter type test.mock_siphon_job_1_status_enum rename to mock_status_enum",
+        "alter table test.mock_siphon_job_1 rename to mock",
+    ]
+    actual_values = get_swap_queries(
+        "mock_siphon_job_1", "mock", "test", enum_cols=["status"]
+    )
+    assert actual_values == expected_values
+
+
+def test_sort_dataframe():
+    df = pd.DataFrame(
+        {
+            "created_at": pd.to_datetime(
+                ["2021-01-03", "2021-01-01", None, "2021-01-01"]
+            ),
+            "name": ["c", "a", "d", "b"],
+        },
+        index=[10, 11, 12, 13],
+    )
+    sorted_df = sort_dataframe(df, "created_at")
+    # Stable: equal timestamps keep their order, missing values go last
+    assert sorted_df["name"].tolist() == ["a", "b", "c", "d"]
+    assert sorted_df.index.tolist() == [0, 1, 2, 3]
+    with pytest.raises(Exception):
+        sort_dataframe(df, ["created_at", "updated_at"])
+
+
+def test_scale_row_estimate():
+    assert scale_row_estimate(1000.0, 10, 20) == 2000
+    assert scale_row_estimate(0.0, 0, 0) == 0
+    # Never analyzed: reltuples is 0 before Postgres 14 and -1 since
+    assert scale_row_estimate(0.0, 0, 500) is None
+    assert scale_row_estimate(-1.0, 0, 500) is None
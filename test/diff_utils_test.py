@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from siphon.diff_utils import (
+    get_bucket_filter,
+    get_bucket_hashes,
+    get_buckets,
+    get_hash_expression,
+    get_key_changes,
+    get_mismatched_buckets,
+    get_row_hashes,
+    render_column,
+)
+from siphon.type_conversion_utils import convert_dataframe_columns, pre_convert_data
+
+DTYPE_DICT = {
+    "id": "int",
+    "amount": "float",
+    "created_at": "date",
+    "tags": "varchar_array",
+}
+
+
+def get_diff_df():
+    df = pd.DataFrame(
+        {
+            "id": [1, 2, 3, 20001],
+            "amount": [1.5, None, np.inf, 2.0],
+            "created_at": pd.to_datetime(
+                ["2021-01-01 00:00:00.123456", None, "2021-01-02", "2021-01-03"]
+            ),
+            "tags": [["a", "b"], None, [], ["c"]],
+        }
+    )
+    return convert_dataframe_columns(pre_convert_data(df), DTYPE_DICT)
+
+
+def test_get_hash_expression():
+    assert get_hash_expression("id", "integer") == "coalesce(id::text, '\\N')"
+    assert "array_to_json(tags)" in get_hash_expression("tags", "ARRAY")
+    assert "extract(epoch from created_at)" in get_hash_expression(
+        "created_at", "timestamp with time zone"
+    )
+
+
+def test_render_column():
+    df = get_diff_df()
+    assert list(render_column(df["amount"], "float")) == [
+        "1.500000",
+        "\\N",
+        "Infinity",
+        "2.000000",
+    ]
+    assert render_column(df["created_at"], "date")[0] == "1609459200123456"
+    assert list(render_column(df["tags"], "varchar_array")) == [
+        '["a","b"]',
+        "\\N",
+        "[]",
+        '["c"]',
+    ]
+
+
+def test_get_mismatched_buckets():
+    df = get_diff_df()
+    buckets = get_buckets(df, ["id"], {"id": "bigint"}, DTYPE_DICT, 10000, 3)
+    assert list(buckets) == [0, 0, 0, 2]
+    client_hash_df = get_bucket_hashes(
+        buckets, get_row_hashes(df, list(df), DTYPE_DICT)
+    )
+    server_hash_df = client_hash_df.copy()
+    assert get_mismatched_buckets(client_hash_df, server_hash_df) == []
+    server_hash_df.loc[0, "bucket_hash"] = "changed"
+    server_hash_df.loc[5] = [1, "deleted"]
+    assert get_mismatched_buckets(client_hash_df, server_hash_df) == [0, 5]
+
+
+def test_get_bucket_filter():
+    bucket_filter = get_bucket_filter([0, 2], ["id"], {"id": "bigint"}, 100, 3)
+    assert bucket_filter == "where (id >= 0 and id < 100)\nor (id >= 200 and id < 300)"
+    bucket_filter = get_bucket_filter([1], ["name"], {"name": "text"}, 100, 3)
+    assert bucket_filter.endswith("% 3 in (1)")
+
+
+def test_get_key_changes():
+    df = get_diff_df()
+    db_df = df.drop(0)
+    db_df.loc[1, "amount"] = 3.0
+    changes = get_key_changes(df.drop(3), db_df, ["id"], list(df), DTYPE_DICT)
+    assert list(changes["inserted"]["id"]) == [1]
+    assert list(changes["updated"]["id"]) == [2]
+    assert list(changes["deleted"]["id"]) == [20001]
@@ -0,0 +1,86 @@
+import pytest
+
+from siphon.foreign_key_utils import (
+    get_add_foreign_key_queries,
+    get_load_levels,
+    get_naming_foreign_keys,
+)
+
+
+@pytest.fixture
+def table_columns():
+    return {
+        "customer": ["id", "name"],
+        "purchase": ["id", "customer_id", "created_at"],
+        "purchase_item": ["id", "purchase_id", "product_id"],
+        "product": ["id", "name"],
+        "employee": ["id", "employee_id"],
+        "note": ["id", "vendor_id"],
+    }
+
+
+def test_get_naming_foreign_keys(table_columns):
+    foreign_keys = get_naming_foreign_keys(table_columns)
+    # vendor isn't loaded, so note_vendor_id_fkey is left out
+    assert [
+        (foreign_key["name"], foreign_key["reference_table"])
+        for foreign_key in foreign_keys
+    ] == [
+        ("purchase_customer_id_fkey", "customer"),
+        ("purchase_item_purchase_id_fkey", "purchase"),
+        ("purchase_item_product_id_fkey", "product"),
+        ("employee_employee_id_fkey", "employee"),
+    ]
+
+
+def test_get_load_levels(table_columns):
+    foreign_keys = get_naming_foreign_keys(table_columns)
+    assert get_load_levels(list(table_columns), foreign_keys) == [
+        ["customer", "employee", "note", "product"],
+        ["purchase"],
+        ["purchase_item"],
+    ]
+
+    cycle = [
+        {"table": "customer", "reference_table": "purchase"},
+        {"table": "purchase", "reference_table": "customer"},
+    ]
+    with pytest.raises(Exception, match="cycle"):
+        get_load_levels(["customer", "purchase", "product"], cycle)
+
+
+def test_get_add_foreign_key_queries():
+    foreign_keys = [
+        {
+            "name": "purchase_customer_id_fkey",
+            "table": "purchase",
+            "columns": ["customer_id"],
+            "reference_table": "customer",
+            "reference_columns": ["id"],
+        },
+        {
+            "name": "purchase_item_purchase_id_fkey",
+            "table": "purchase_item",
+            "columns": ["purchase_id"],
+            "reference_table": "purchase",
+            "reference_columns": ["id"],
+            "definition": "FOREIGN KEY (purchase_id) REFERENCES purchase(id) "
+            "ON DELETE CASCADE",
+        },
+        {
+            "name": "purchase_item_product_id_fkey",
+            "table": "purchase_item",
+            "columns": ["product_id"],
+            "reference_table": "product",
+            "reference_columns": ["id"],
+        },
+    ]
+    # Declared constraints keep their definition
+    assert get_add_foreign_key_queries(
+        foreign_keys, {"purchase_item_product_id_fkey"}, "raw"
+    ) == [
+        "alter table raw.purchase add constraint purchase_customer_id_fkey "
+        "foreign key (customer_id) references raw.customer (id)",
+        "alter table raw.purchase_item add constraint purchase_item_purchase_id_fkey "
+        "FOREIGN KEY (purchase_id) REFERENCES purchase(id) ON DELETE CASCADE",
+    ]
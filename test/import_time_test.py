@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+# Modules only loaded once siphon actually reads or writes data
+HEAVY_MODULES = {"pandas", "numpy", "sqlalchemy", "psycopg2"}
+
+# Generous ceiling for importing siphon alone; eager imports took ~0.8s
+IMPORT_TIME_BUDGET = 0.3
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_import_times(module):
+    """
+    Runs `python -X importtime -c "import <module>"` in a fresh interpreter
+    :param module:
+    :return: top-level module -> cumulative import time in seconds
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    import_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        import_times[name] = int(cumulative) / 1e6
+    return import_times
+
+
+def test_import_time():
+    for module in ["siphon.PostgresDatabase", "siphon.transfer_utils"]:
+        import_times = get_import_times(module)
+        assert not HEAVY_MODULES.intersection(import_times), f"{module}"
+        assert import_times[module] < IMPORT_TIME_BUDGET, f"{module}"
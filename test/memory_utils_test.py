@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from siphon.PostgresDatabase import PostgresDatabase
+from siphon.batch_utils import MAX_BATCH_BYTES
+from siphon.memory_utils import (
+    OBJECT_BYTES,
+    check_memory_budget,
+    estimate_row_bytes,
+    get_budget_batch_bytes,
+    get_budget_rows,
+    get_budget_workers,
+    parse_memory_size,
+)
+from siphon.progress_utils import estimate_column_bytes
+
+
+def test_parse_memory_size():
+    assert parse_memory_size(1000) == 1000
+    assert parse_memory_size("512MB") == 512 * 1024**2
+    assert parse_memory_size("1.5 gb") == int(1.5 * 1024**3)
+    with pytest.raises(Exception):
+        parse_memory_size("lots")
+
+
+def test_estimate_row_bytes():
+    db_dtype_dict = {"id": "bigint", "name": "text", "created_at": "timestamp"}
+    row_bytes = estimate_row_bytes(db_dtype_dict, {"name": 10})
+    # created_at has no siphon dtype or width, so it's an object of default width
+    assert row_bytes == 9 + (OBJECT_BYTES + 10) + (OBJECT_BYTES + 32)
+
+
+def test_check_memory_budget():
+    check_memory_budget(100, None, "Reading raw.mock")
+    check_memory_budget(100, 100, "Reading raw.mock")
+    with pytest.raises(Exception, match="over the 1.0KB memory budget"):
+        check_memory_budget(2048, 1024, "Reading raw.mock")
+
+
+def test_get_budget_sizes():
+    assert get_budget_rows(100, 8000, copies=2, share=0.5) == 20
+    assert get_budget_rows(10**9, 8000) == 1
+    assert get_budget_batch_bytes(None) == MAX_BATCH_BYTES
+    assert get_budget_batch_bytes(4000) == 1000
+    assert get_budget_workers({"a": 100, "b": 50}, 450, 4) == 2
+    assert get_budget_workers({"a": 100}, 0, 4) == 1
+
+
+def test_prepare_export_memory_budget():
+    df = pd.DataFrame({"ints": range(1000), "strings": ["octopus"] * 1000})
+    db = PostgresDatabase(memory_budget=1000)
+    with pytest.raises(Exception, match="memory budget"):
+        db.prepare_export(df.copy(), "mock", "raw")
+
+    # Room for the frame and a column but not a converted copy: converted in place
+    column_bytes = estimate_column_bytes(df)
+    budget = sum(column_bytes.values()) + 2 * max(column_bytes.values())
+    db = PostgresDatabase(memory_budget=budget)
+    input_df = df.copy()
+    converted_df, df_dtype_dict, _, _ = db.prepare_export(input_df, "mock", "raw")
+    assert converted_df is input_df
+    assert df_dtype_dict == {"ints": "int", "strings": "string"}
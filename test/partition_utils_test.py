@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+
+from siphon.partition_utils import (
+    check_partition_column,
+    get_partition_bound,
+    get_partition_check,
+    get_partition_keys,
+    get_partition_name,
+)
+
+
+def test_check_partition_column():
+    df = pd.DataFrame({"id": [1, 2], "status": ["open", None]})
+    check_partition_column(df, "id", "hash")
+    with pytest.raises(Exception):
+        check_partition_column(df, "status", "list")
+    with pytest.raises(Exception):
+        check_partition_column(df, "id", "range", interval="week")
+
+
+def test_get_partition_keys():
+    series = pd.Series(
+        pd.to_datetime(["2021-01-31 23:00", "2021-02-01 01:00"], utc=True)
+    )
+    keys = get_partition_keys(series, "day")
+    assert list(keys) == [pd.Timestamp("2021-01-31"), pd.Timestamp("2021-02-01")]
+    keys = get_partition_keys(series, "year")
+    assert keys.nunique() == 1
+
+
+def test_get_partition_name():
+    key = pd.Timestamp("2021-02-01")
+    assert get_partition_name("events", key, "range", "day") == "events_p20210201"
+    assert get_partition_name("events", key, "range", "month") == "events_p202102"
+    assert get_partition_name("events", 3, "hash") == "events_p3"
+    assert get_partition_name("events", "open", "list") == "events_popen"
+    assert get_partition_name("events", "Open Now", "list") != get_partition_name(
+        "events", "open now", "list"
+    )
+
+    # Long names keep their key and a hash of the table instead of being cut off
+    names = [
+        get_partition_name("a" * 60, pd.Timestamp("2021-02-01"), "range", "day"),
+        get_partition_name("a" * 60, pd.Timestamp("2021-02-02"), "range", "day"),
+        get_partition_name("a" * 61, pd.Timestamp("2021-02-01"), "range", "day"),
+    ]
+    assert len(set(names)) == 3
+    assert all(len(name) <= 63 for name in names)
+    assert names[0].endswith("_p20210201")
+
+
+def test_get_partition_bound():
+    key = pd.Timestamp("2021-12-01")
+    assert get_partition_bound(key, "range", "month") == (
+        "for values from ('2021-12-01 00:00:00+00') to ('2022-01-01 00:00:00+00')"
+    )
+    assert get_partition_bound(key, "range", "day", is_date=True) == (
+        "for values from ('2021-12-01') to ('2021-12-02')"
+    )
+    assert get_partition_bound("o'k", "list") == "for values in ('o''k')"
+    assert get_partition_bound(2, "hash", modulus=8) == (
+        "for values with (modulus 8, remainder 2)"
+    )
+
+
+def test_get_partition_check():
+    key = pd.Timestamp("2021-12-01")
+    assert get_partition_check("day", key, "range", "day", is_date=True) == (
+        "day is not null and day >= '2021-12-01' and day < '2021-12-02'"
+    )
+    assert get_partition_check("status", "open", "list") == (
+        "status is not null and status = 'open'"
+    )
+    assert get_partition_check("id", 1, "hash") is None
@@ -0,0 +1,78 @@
+import pandas as pd
+
+from siphon.progress_utils import (
+    ConsoleProgress,
+    TransferProgress,
+    estimate_bytes,
+    format_bytes,
+    format_duration,
+    format_progress,
+)
+
+
+def test_transfer_progress():
+    states = []
+    tracker = TransferProgress(
+        "mock", total_rows=1000, callback=states.append, initial_rows=200
+    )
+    tracker.update(300, n_bytes=4096)
+    tracker.finish()
+    assert [state["rows"] for state in states] == [500, 500]
+    assert states[0]["total_rows"] == 1000
+    assert states[0]["bytes"] == 4096
+    assert states[0]["eta"] is None or states[0]["eta"] >= 0
+    assert not states[0]["done"]
+    assert states[1]["done"]
+
+
+def test_format_progress():
+    state = {
+        "table": "mock",
+        "rows": 250000,
+        "total_rows": 1000000,
+        "bytes": 3 * 1024**2,
+        "elapsed": 5.0,
+        "rows_per_second": 50000.0,
+        "bytes_per_second": 600 * 1024,
+        "eta": 15.0,
+        "done": False,
+    }
+    expected_value = (
+        "mock:  25% |#####               | 250,000/1,000,000 rows, "
+        "3.0MB, 50,000 rows/s (600.0KB/s), ETA 15s"
+    )
+    assert format_progress(state) == expected_value
+    state.update({"total_rows": None, "eta": None})
+    assert format_progress(state).startswith("mock: 250,000 rows, 3.0MB")
+    state["done"] = True
+    assert format_progress(state).endswith("in 5s")
+
+
+def test_console_progress(capsys):
+    tracker = TransferProgress("mock", total_rows=10, callback=ConsoleProgress())
+    tracker.update(5)
+    tracker.finish()
+    assert capsys.readouterr().out.count("\r") == 2
+
+    # Only final lines, so parallel transfers don't redraw over each other
+    callback = ConsoleProgress(finished_only=True)
+    for table in ["customer", "product"]:
+        tracker = TransferProgress(table, total_rows=10, callback=callback)
+        tracker.update(5)
+        tracker.finish()
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split(":")[0] for line in lines] == ["customer", "product"]
+
+
+def test_format_helpers():
+    assert format_bytes(512) == "512.0B"
+    assert format_bytes(5 * 1024**3) == "5.0GB"
+    assert format_duration(59) == "59s"
+    assert format_duration(3725) == "1h02m05s"
+
+
+def test_estimate_bytes():
+    df = pd.DataFrame({"ints": range(10000), "strings": ["octopus"] * 10000})
+    expected_value = df.memory_usage(index=False, deep=True).sum()
+    assert estimate_bytes(df) == expected_value
+    assert estimate_bytes(df.head(0)) == 0
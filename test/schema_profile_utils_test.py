@@ -0,0 +1,75 @@
+import pandas as pd
+import numpy as np
+import pytest
+
+from siphon.schema_profile_utils import (
+    check_schema_profile,
+    load_schema_profile_file,
+    save_schema_profile_file,
+)
+
+
+@pytest.fixture
+def test_df():
+    data = {
+        "booleans": [True, False, True],
+        "string_booleans": ["True", np.nan, "False"],
+        "start_date": ["2020-03-18", "2020-02-18", "2020-11-18"],
+        "list": [["1", "2", "3"], ["a", "b"], ["cat", "dog"]],
+        "floats": [123.3, 2.3, 9.0],
+        "ints": [1, 13, 9000],
+        "strings": ["octopus", "lion", "st. bernard"],
+    }
+    return pd.DataFrame(data)
+
+
+@pytest.fixture
+def schema_profile():
+    return {
+        "schema": "test",
+        "table": "mock",
+        "dtypes": {
+            "booleans": "bool",
+            "string_booleans": "bool",
+            "start_date": "date",
+            "list": "varchar_array",
+            "floats": "float",
+            "ints": "int",
+            "strings": "string",
+        },
+        "date_formats": {"start_date": "%Y-%m-%d"},
+    }
+
+
+def test_check_schema_profile(test_df, schema_profile):
+    assert check_schema_profile(test_df, schema_profile)
+
+    # New columns still need inference
+    test_df["new_strings"] = test_df["strings"]
+    assert not check_schema_profile(test_df, schema_profile)
+
+    # Incompatible dtypes fail before any conversion
+    schema_profile["dtypes"]["new_strings"] = "int"
+    with pytest.raises(Exception):
+        check_schema_profile(test_df, schema_profile)
+
+    # Dropped columns don't need inference
+    assert check_schema_profile(test_df.drop(columns="new_strings"), schema_profile)
+    assert check_schema_profile(test_df[["ints"]], schema_profile)
+
+
+def test_save_schema_profile_file(schema_profile, tmp_path):
+    path = tmp_path / "mock.json"
+    for expected_version in [1, 2]:
+        save_schema_profile_file(schema_profile, path)
+        loaded_profile = load_schema_profile_file(path)
+        assert loaded_profile["version"] == expected_version
+        assert loaded_profile["dtypes"] == schema_profile["dtypes"]
+        assert loaded_profile["date_formats"] == schema_profile["date_formats"]
+
+    # Earlier versions are kept
+    schema_profile["dtypes"]["ints"] = "float"
+    save_schema_profile_file(schema_profile, path)
+    assert load_schema_profile_file(path)["dtypes"]["ints"] == "float"
+    assert load_schema_profile_file(path, version=2)["dtypes"]["ints"] == "int"
+    assert load_schema_profile_file(path, version=1)["version"] == 1
@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+from threading import Thread
+
+from siphon.transfer_utils import CopyPipe, get_copy_table_ddl
+
+
+def test_copy_pipe():
+    rows = [f"{i}\tvalue {i}\n".encode() for i in range(5000)]
+    pipe = CopyPipe(chunk_size=256, max_chunks=2)
+
+    def write_rows():
+        for row in rows:
+            pipe.write(row)
+        pipe.close()
+
+    writer = Thread(target=write_rows)
+    writer.start()
+    chunks = []
+    while True:
+        data = pipe.read(100)
+        if not data:
+            break
+        assert len(data) <= 100
+        chunks.append(data)
+    writer.join()
+    assert b"".join(chunks) == b"".join(rows)
+
+
+def test_copy_pipe_error():
+    pipe = CopyPipe()
+    pipe.write(b"partial row")
+    pipe.close(error=Exception("connection lost"))
+    with pytest.raises(Exception, match="connection lost"):
+        pipe.read()
+
+
+def test_copy_pipe_abort():
+    pipe = CopyPipe(chunk_size=1, max_chunks=2)
+    errors = []
+
+    def write_rows():
+        try:
+            for i in range(100):
+                pipe.write(b"row")
+        except Exception as error:
+            errors.append(error)
+        pipe.close()
+
+    writer = Thread(target=write_rows)
+    writer.start()
+    assert pipe.read() == b"row"
+    # A failed reader stops a writer blocked on the full pipe
+    pipe.abort()
+    writer.join(timeout=5)
+    assert not writer.is_alive()
+    assert len(errors) == 1
+
+
+def test_get_copy_table_ddl():
+    columns_df = pd.DataFrame(
+        {
+            "attname": ["id", "name", "tags"],
+            "column_type": ["bigint", "character varying(40)", "integer[]"],
+            "attnotnull": [True, False, False],
+        }
+    )
+    expected_value = (
+        "create table test.mock (\n"
+        "id bigint not null,\n"
+        "name character varying(40),\n"
+        "tags integer[]\n"
+        ")"
+    )
+    assert get_copy_table_ddl("mock", "test", columns_df) == expected_value
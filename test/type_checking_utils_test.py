@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 import pytest
+from datetime import date
+from decimal import Decimal
 
 from siphon.type_checking_utils import (
     check_dtype_boolean,
@@ -9,12 +11,20 @@ from siphon.type_checking_utils import (
     check_dtype_int,
     check_dtype_string,
     check_col_boolean,
+    check_col_date,
+    check_col_decimal,
     check_col_list,
     check_col_tuple,
     check_col_tuple_or_list,
     check_dtype_array,
+    check_dtype_calendar_date,
+    check_dtype_category,
+    check_dtype_json,
+    detect_date_format,
+    get_array_dtype,
     get_dataframe_dtypes,
     get_database_dtypes,
+    get_query_dtypes,
 )
 from siphon.type_conversion_utils import convert_dataframe_columns, convert_dtypes
 from siphon.PostgresConnection import PostgresConnection
@@ -143,6 +153,49 @@ def test_check_col_boolean(test_df):
     }
     for col, expected_value in expected_values.items():
         assert check_col_boolean(test_df[col]) == expected_value, f"Column: {col}"
+    for values in [["yes", "no"], ["T", "maybe"], [2, 0], [0.5]]:
+        assert not check_col_boolean(pd.Series(values)), f"Values: {values}"
+
+
+def test_check_col_decimal(test_df):
+    expected_values = {
+        "floats": False,
+        "string_floats": False,
+        "strings": False,
+    }
+    for col, expected_value in expected_values.items():
+        assert check_col_decimal(test_df[col]) == expected_value, f"Column: {col}"
+    decimals = pd.Series([Decimal("123.3"), np.nan, Decimal("9.0")])
+    assert check_col_decimal(decimals)
+
+
+def test_detect_date_format():
+    expected_values = {
+        "19840815": "%Y%m%d",
+        "2020-03-18": "%Y-%m-%d",
+        "2020/03/18": "%Y/%m/%d",
+        "August 15, 1984": "%B %d, %Y",
+        "03/18/2020": "%m/%d/%Y",
+        "octopus": None,
+    }
+    for value, expected_value in expected_values.items():
+        series = pd.Series([value, np.nan, value])
+        assert detect_date_format(series) == expected_value, f"Value: {value}"
+    assert detect_date_format(pd.Series([1, 2, 3])) is None
+
+
+def test_check_col_date(test_df):
+    expected_values = {
+        "date_of_birth": True,
+        "start_date": True,
+        "strings": False,
+        "ints": False,
+        "string_list": False,
+    }
+    for col, expected_value in expected_values.items():
+        assert check_col_date(test_df[col]) == expected_value, f"Column: {col}"
+    assert check_col_date(pd.Series(["2020-03-18 10:15", np.nan, "2020-02-18 09:00"]))
+    assert check_col_date(pd.Series([np.nan, np.nan]))
 
 
 # Check Dtypes
@@ -187,6 +240,9 @@ def test_check_dtype_date(test_df):
     }
     for col, expected_value in expected_values.items():
         assert check_dtype_date(test_df, col) == expected_value, f"Column: {col}"
+    # Named like a date, but the values aren't dates
+    mislabeled_df = pd.DataFrame({"update_date": ["octopus", "lion", "cat"]})
+    assert not check_dtype_date(mislabeled_df.convert_dtypes(), "update_date")
 
 
 def test_check_dtype_float(test_df):
@@ -228,6 +284,46 @@ def test_check_dtype_string(test_df):
         ), f"Column: {col}, {test_df[col].dtype.__repr__()}"
 
 
+def test_get_array_dtype():
+    expected_values = {
+        "varchar_array": [["1", "2"], np.nan, ["cat"]],
+        "int_array": [[1, 2], np.nan, (3,)],
+        "float_array": [[1.5, 2], [None, 3.0]],
+        "bool_array": [[True, False], [True]],
+        "string_int_array": ["[1, 2]", "(3, 4)"],
+    }
+    for dtype, values in expected_values.items():
+        expected_dtype = dtype.replace("string_", "")
+        assert get_array_dtype(pd.Series(values)) == expected_dtype, f"{dtype}"
+
+
+def test_check_native_dtypes():
+    df = pd.DataFrame(
+        {
+            "json": [{"a": 1}, np.nan, {"b": [1, 2]}],
+            "category": pd.Series(["open", "closed", "open"], dtype="category"),
+            "calendar_date": [date(2020, 3, 18), np.nan, date(2020, 2, 18)],
+            "strings": pd.Series(["octopus", "lion", "st. bernard"], dtype="string"),
+        }
+    )
+    expected_values = {
+        check_dtype_json: {"json"},
+        check_dtype_category: {"category"},
+        check_dtype_calendar_date: {"calendar_date"},
+    }
+    for check_dtype, expected_cols in expected_values.items():
+        for col in df.columns:
+            actual_value = check_dtype(df, col)
+            assert actual_value == (col in expected_cols), f"{check_dtype}: {col}"
+    df_dtype_dict = get_dataframe_dtypes(df)
+    assert df_dtype_dict == {
+        "json": "json",
+        "category": "category",
+        "calendar_date": "calendar_date",
+        "strings": "string",
+    }
+
+
 # Check Data Table
 def test_get_dataframe_dtypes(test_df):
     expected_values = {
@@ -263,6 +359,21 @@ def test_get_dataframe_dtypes(test_df):
         assert df_dtype_dict[col] == expected_values[col], f"Column: {col}"
 
 
+def test_get_dataframe_dtypes_schema_profile(test_df):
+    schema_profile = {"dtypes": {"strings": "varchar_array"}}
+    df_dtype_dict = get_dataframe_dtypes(test_df, schema_profile=schema_profile)
+    # Profiled columns skip inference
+    assert df_dtype_dict["strings"] == "varchar_array"
+    # New decisions are recorded in the profile
+    assert schema_profile["dtypes"]["date_of_birth"] == "date"
+    assert set(schema_profile["dtypes"]) == set(test_df.columns)
+
+    # Dropped columns leave the profile
+    schema_profile["dtypes"]["dropped"] = "int"
+    get_dataframe_dtypes(test_df, schema_profile=schema_profile)
+    assert set(schema_profile["dtypes"]) == set(test_df.columns)
+
+
 def test_get_database_dtypes(test_df):
     expected_values = {
         "booleans": "boolean",
@@ -315,3 +426,22 @@ def test_get_database_dtypes(test_df):
         )
         for col, expected_dtype in expected_values.items():
             assert db_dtype_dict[col] == expected_dtype, f"Col: {col}"
+
+
+def test_get_query_dtypes():
+    description = [
+        ("id", 20, None, 8, None, None, None),
+        ("name", 1043, None, -1, None, None, None),
+        ("total", 1700, None, 65535, None, None, None),
+        ("created_at", 1184, None, 8, None, None, None),
+        ("tags", 1015, None, -1, None, None, None),
+        ("point", 600, None, 16, None, None, None),
+    ]
+    expected_values = {
+        "id": "bigint",
+        "name": "character varying",
+        "total": "numeric",
+        "created_at": "timestamp with time zone",
+        "tags": "ARRAY",
+    }
+    assert get_query_dtypes(description) == expected_values
@@ -1,11 +1,17 @@
 import pandas as pd
 import numpy as np
 import pytest
+from datetime import date, datetime, timezone
+from decimal import Decimal
 from sqlalchemy.dialects.postgresql import (
     TIMESTAMP,
     BIGINT,
     VARCHAR,
     NUMERIC,
+    DOUBLE_PRECISION,
+    REAL,
+    DATE,
+    JSONB,
     BOOLEAN,
     ARRAY,
 )
@@ -23,6 +29,15 @@ from siphon.type_conversion_utils import (
     convert_dataframe_columns,
     convert_dtype_date,
     pre_convert_data,
+    convert_query_rows,
+    read_numeric_text,
+    convert_series_to_boolean,
+    convert_dtype_json,
+    convert_dtype_calendar_date,
+    convert_database_columns,
+    get_dictionary_columns,
+    encode_copy_value,
+    adapt_insert_value,
 )
 
 from siphon.type_checking_utils import check_col_tuple, get_dataframe_dtypes
@@ -287,7 +302,11 @@ def test_convert_dataframe_columns(test_df):
     df_dtype_dict = get_dataframe_dtypes(test_df)
     converted_test_df = convert_dataframe_columns(test_df, df_dtype_dict)
     for col, dtype in expected_values.items():
-        assert converted_test_df[col].dtype.__repr__() == dtype, f"{col}"
+        # The string dtype's repr varies between pandas versions
+        if dtype == "StringDtype":
+            assert isinstance(converted_test_df[col].dtype, pd.StringDtype), f"{col}"
+        else:
+            assert converted_test_df[col].dtype.__repr__() == dtype, f"{col}"
         # Array column values need further inspection
         if dtype in {"dtype('O')"}:
             assert check_col_tuple(converted_test_df[col])
@@ -331,3 +350,276 @@ def test_convert_dtypes(test_df):
         assert (
             actual_visit_name == expected_visit_name
         ), f"Col: {col}, Dtype: {type(db_dtype_dict[col])}"
+
+
+def test_convert_dtypes_postgres_aliases():
+    expected_values = {
+        "integer": "int",
+        "smallint": "int",
+        "double precision": "float",
+        "text": "string",
+        "timestamp with time zone": "date",
+    }
+    df_dtype_dict = convert_dtypes(
+        dtype_dict={col: col for col in expected_values},
+        from_dtype="postgres_description",
+        to_dtype="dataframe_dtype",
+    )
+    for col, expected_dtype in expected_values.items():
+        assert df_dtype_dict[col] == expected_dtype, f"Col: {col}"
+
+
+def test_convert_query_rows():
+    description = [
+        ("ints", 23, None, 4, None, None, None),
+        ("strings", 25, None, -1, None, None, None),
+        ("booleans", 16, None, 1, None, None, None),
+        ("list", 1009, None, -1, None, None, None),
+    ]
+    rows = [
+        (1, "octopus", True, ["1", "2"]),
+        (13, None, None, None),
+        (9000, "lion", False, ["cat"]),
+    ]
+    expected_values = {
+        "ints": "Int64Dtype()",
+        "booleans": "BooleanDtype",
+        "list": "dtype('O')",
+    }
+    df = convert_query_rows(rows, description)
+    for col, dtype in expected_values.items():
+        assert df[col].dtype.__repr__() == dtype, f"{col}"
+    assert isinstance(df["strings"].dtype, pd.StringDtype)
+    assert df["list"].values.tolist() == [("1", "2"), pd.NA, ("cat",)]
+
+    # Statements without a result set have no description
+    assert convert_query_rows([], None).shape == (0, 0)
+    with pytest.raises(Exception, match="more than one column named id"):
+        convert_query_rows(
+            [(1, 2)], [("id", 23) + (None,) * 5, ("id", 20) + (None,) * 5]
+        )
+
+
+def test_convert_dtypes_float_dtype():
+    expected_values = {
+        "numeric": NUMERIC,
+        "double precision": DOUBLE_PRECISION,
+        "real": REAL,
+    }
+    for float_dtype, expected_dtype in expected_values.items():
+        db_dtype_dict = convert_dtypes({"floats": "float"}, float_dtype=float_dtype)
+        actual_visit_name = db_dtype_dict["floats"].__visit_name__
+        assert actual_visit_name == expected_dtype.__visit_name__, f"{float_dtype}"
+
+
+def test_convert_database_columns_numeric_text():
+    values = ["123.30", None, "-2", "NaN"]
+    assert [read_numeric_text(value, None) for value in values] == values
+    test_df = pd.DataFrame({"numerics": values})
+    actual_value = convert_database_columns(test_df, {"numerics": "numeric"})
+    assert actual_value["numerics"].dtype.__repr__() == "Float64Dtype()"
+    assert actual_value["numerics"].tolist() == [123.3, pd.NA, -2.0, pd.NA]
+
+
+def test_convert_dtype_float_decimals():
+    test_df = pd.DataFrame({"decimals": [Decimal("123.3"), None, Decimal("2.3")]})
+    actual_value = convert_dtype_float(test_df, "decimals")
+    assert actual_value.dtype.__repr__() == "Float64Dtype()"
+    assert list(actual_value.values) == [123.3, pd.NA, 2.3]
+
+
+def test_convert_series_to_boolean():
+    expected_values = [
+        {"values": ["true", "F", pd.NA, "t"], "value": [True, False, pd.NA, True]},
+        {"values": [1.0, np.nan, 0.0], "value": [True, pd.NA, False]},
+        {"values": [np.nan, np.nan], "value": [pd.NA, pd.NA]},
+    ]
+    for kwarg in expected_values:
+        actual_value = convert_series_to_boolean(pd.Series(kwarg["values"]))
+        assert actual_value.dtype.__repr__() == "BooleanDtype"
+        assert list(actual_value.values) == kwarg["value"], f"{kwarg['values']}"
+    with pytest.raises(Exception):
+        convert_series_to_boolean(pd.Series(["T", "maybe"]))
+
+
+def test_convert_dtype_date_formats(test_df):
+    expected_values = {
+        "concatenated_date_string": "%Y%m%d",
+        "start_date": "%Y-%m-%d",
+        "end_date": "%Y/%m/%d",
+        "date_of_birth": "%B %d, %Y",
+    }
+    date_formats = {}
+    for col in expected_values:
+        convert_dtype_date(test_df, col, date_formats=date_formats)
+    assert date_formats == expected_values
+
+    # A remembered format that no longer fits falls back to inference
+    date_formats = {"start_date": "%B %d, %Y"}
+    actual_value = list(convert_dtype_date(test_df, "start_date", date_formats).values)
+    assert actual_value[0] == np.datetime64("2020-03-18")
+    assert date_formats == {"start_date": "%Y-%m-%d"}
+
+
+def test_convert_dtype_date_repeated_values():
+    test_df = pd.DataFrame({"event_date": ["2020/03/18", np.nan, "2020/02/18"] * 10})
+    actual_value = convert_dtype_date(test_df, "event_date")
+    assert actual_value.dtype.__repr__() == "datetime64[ns, UTC]"
+    assert actual_value.index.equals(test_df.index)
+    assert actual_value.isna().sum() == 10
+    assert actual_value[2] == pd.Timestamp("2020-02-18", tz="UTC")
+
+
+def test_convert_native_dtypes():
+    df = pd.DataFrame(
+        {
+            "json": ['{"a": 1}', np.nan, {"b": [1, 2]}],
+            "calendar_date": ["2020-03-18", np.nan, "2020-02-18"],
+        }
+    )
+    assert list(convert_dtype_json(df, "json").values) == [
+        {"a": 1},
+        pd.NA,
+        {"b": [1, 2]},
+    ]
+    actual_value = convert_dtype_calendar_date(df, "calendar_date")
+    assert actual_value[0] == date(2020, 3, 18)
+    assert pd.isna(actual_value[1])
+
+    db_dtype_dict = convert_dtypes(
+        {"json": "json", "calendar_date": "calendar_date", "ints": "int_array"}
+    )
+    assert db_dtype_dict["json"].__visit_name__ == JSONB.__visit_name__
+    assert db_dtype_dict["calendar_date"].__visit_name__ == DATE.__visit_name__
+    assert db_dtype_dict["ints"].item_type.__visit_name__ == BIGINT.__visit_name__
+
+
+def test_encode_copy_value():
+    expected_values = [
+        (None, "\\N"),
+        (pd.NA, "\\N"),
+        (np.nan, "\\N"),
+        (True, "t"),
+        (np.bool_(False), "f"),
+        (np.int64(9000), "9000"),
+        (123.3, "123.3"),
+        (float("inf"), "Infinity"),
+        ("tab\tand\\slash", "tab\\tand\\\\slash"),
+        ((1, 2, None), "{1,2,NULL}"),
+        (("cat", 'say "hi"'), '{"cat","say \\\\"hi\\\\""}'),
+        ({"a": [1, 2]}, '{"a": [1, 2]}'),
+        (date(2020, 3, 18), "2020-03-18"),
+        (
+            datetime(2020, 3, 18, 10, 15, tzinfo=timezone.utc),
+            "2020-03-18T10:15:00+00:00",
+        ),
+    ]
+    for value, expected_value in expected_values:
+        assert encode_copy_value(value) == expected_value, f"Value: {value}"
+
+
+def test_get_dictionary_columns():
+    df = pd.DataFrame(
+        {
+            "status": ["open", "closed", None, "open"] * 50,
+            "name": [f"user {i}" for i in range(200)],
+            "tags": [[1, 2], [3], None, [1, 2]] * 50,
+            "count": [1, 2, 3, 4] * 50,
+        }
+    )
+    df_dtype_dict = {
+        "status": "string",
+        "name": "string",
+        "tags": "int_array",
+        "count": "int",
+    }
+    assert get_dictionary_columns(df, df_dtype_dict) == ["status", "tags"]
+    # Database statistics take precedence over the dataframe estimate
+    distinct_ratios = {"status": 0.5, "name": 0.01}
+    actual_value = get_dictionary_columns(df, df_dtype_dict, distinct_ratios)
+    assert actual_value == ["name", "tags"]
+
+
+def test_convert_database_columns_dictionary_encode():
+    df = pd.DataFrame(
+        {
+            "status": ["open", "closed", None, "pending review"] * 2500,
+            "tags": [[1, 2], [3], None, [1, 2]] * 2500,
+        }
+    )
+    db_dtype_dict = {"status": "character varying", "tags": "bigint[]"}
+    expected_df = convert_database_columns(df.copy(), db_dtype_dict)
+    actual_df = convert_database_columns(
+        df.copy(), db_dtype_dict, dictionary_encode=True
+    )
+    assert actual_df["status"].dtype.__repr__().startswith("CategoricalDtype")
+    assert actual_df["status"].astype("string").equals(expected_df["status"])
+    assert actual_df["tags"].tolist() == expected_df["tags"].tolist()
+    assert actual_df["tags"][0] is actual_df["tags"][3]
+    actual_memory = actual_df["status"].memory_usage(deep=True)
+    expected_memory = expected_df["status"].memory_usage(deep=True)
+    assert actual_memory * 10 < expected_memory
+
+
+@pytest.mark.parametrize("parallel", ["thread", "process"])
+def test_convert_dataframe_columns_parallel(test_df, parallel):
+    test_df = pre_convert_data(test_df)
+    dtype_dict = get_dataframe_dtypes(test_df.copy())
+    actual_dtype_dict = get_dataframe_dtypes(
+        test_df.copy(), max_workers=4, parallel=parallel
+    )
+    assert actual_dtype_dict == dtype_dict
+
+    date_formats, actual_date_formats = {}, {}
+    expected_df = convert_dataframe_columns(
+        test_df.copy(), dtype_dict, date_formats=date_formats
+    )
+    actual_df = convert_dataframe_columns(
+        test_df.copy(),
+        dtype_dict,
+        date_formats=actual_date_formats,
+        max_workers=4,
+        parallel=parallel,
+    )
+    assert list(actual_df.columns) == list(expected_df.columns)
+    assert actual_date_formats == date_formats
+    for col in expected_df.columns:
+        assert actual_df[col].dtype == expected_df[col].dtype, f"{col}"
+        assert actual_df[col].astype(str).equals(expected_df[col].astype(str))
+
+
+def test_adapt_insert_value():
+    expected_values = [
+        (pd.NA, None),
+        (np.nan, None),
+        (np.int64(9000), 9000),
+        (np.bool_(True), True),
+        ((1, np.int64(2), None), [1, 2, None]),
+        (
+            pd.Timestamp("2020-03-18", tz="UTC"),
+            datetime(2020, 3, 18, tzinfo=timezone.utc),
+        ),
+        ("octopus", "octopus"),
+    ]
+    for value, expected_value in expected_values:
+        actual_value = adapt_insert_value(value)
+        assert actual_value == expected_value, f"Value: {value}"
+        assert type(actual_value) == type(expected_value), f"Value: {value}"
+    assert adapt_insert_value({"a": [1, 2]}).adapted == {"a": [1, 2]}
+
+
+def test_convert_database_columns_json():
+    # psycopg2 has already decoded JSON, including non-object values
+    values = [[1, 2], "x", 3, True, {"a": 1}, None]
+    test_df = pd.DataFrame({"data": values})
+    actual_value = convert_database_columns(test_df, {"data": "jsonb"})
+    assert actual_value["data"].tolist() == values[:-1] + [pd.NA]
+
+
+def test_convert_database_columns_user_defined():
+    test_df = pd.DataFrame({"status": ["open", "closed"], "email": ["a@b", "c@d"]})
+    db_dtype_dict = {"status": "enum", "email": "USER-DEFINED"}
+    actual_value = convert_database_columns(test_df, db_dtype_dict)
+    assert actual_value["status"].dtype.__repr__().startswith("CategoricalDtype")
+    # Other user-defined types, e.g. citext, aren't read as categories
+    assert isinstance(actual_value["email"].dtype, pd.StringDtype)
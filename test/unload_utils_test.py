@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+
+from siphon.unload_utils import (
+    get_partition_filters,
+    get_partition_paths,
+    get_unload_partitions,
+    prepare_arrow_frame,
+)
+
+
+def test_get_unload_partitions():
+    assert get_unload_partitions(4, 140005) == 4
+    # Without TID range scans each partition would scan the whole table
+    assert get_unload_partitions(4, 130011) == 1
+
+
+def test_get_partition_filters():
+    assert get_partition_filters(100, 1) == [""]
+    filters = get_partition_filters(10, 3)
+    assert filters == [
+        "where ctid >= '(0,0)'::tid and ctid < '(4,0)'::tid",
+        "where ctid >= '(4,0)'::tid and ctid < '(8,0)'::tid",
+        "where ctid >= '(8,0)'::tid",
+    ]
+
+
+def test_get_partition_paths(tmp_path):
+    path = str(tmp_path / "events.parquet")
+    assert get_partition_paths(path, 1) == [path]
+    assert get_partition_paths(path, 2) == [
+        str(tmp_path / "events.parquet" / "part-00000.parquet"),
+        str(tmp_path / "events.parquet" / "part-00001.parquet"),
+    ]
+
+
+def test_prepare_arrow_frame():
+    df = pd.DataFrame({"data": [{"a": 1}, pd.NA], "ip": ["10.0.0.1", pd.NA]})
+    df = prepare_arrow_frame(df, {"data": "json"})
+    assert list(df["data"]) == ['{"a": 1}', None]
+    assert list(df["ip"]) == ["10.0.0.1", None]
+
+    # JSON columns may hold any JSON value, not only objects
+    df = pd.DataFrame({"data": [[1, 2], "x", 3, True, None]})
+    df = prepare_arrow_frame(df, {"data": "json"})
+    assert list(df["data"]) == ["[1, 2]", '"x"', "3", "true", None]
+
+
+def test_get_arrow_schema():
+    pa = pytest.importorskip("pyarrow")
+    from siphon.unload_utils import get_arrow_schema
+
+    db_dtype_dict = {
+        "id": "bigint",
+        "name": "text",
+        "status": "enum",
+        "created_at": "timestamp with time zone",
+        "tags": "ARRAY",
+        "ip": "inet",
+    }
+    arrow_schema, df_dtype_dict = get_arrow_schema(db_dtype_dict)
+    assert arrow_schema.names == list(db_dtype_dict)
+    assert arrow_schema.field("id").type == pa.int64()
+    assert arrow_schema.field("status").type == pa.dictionary(pa.int32(), pa.string())
+    assert arrow_schema.field("created_at").type == pa.timestamp("ns", tz="UTC")
+    assert arrow_schema.field("tags").type == pa.list_(pa.string())
+    assert arrow_schema.field("ip").type == pa.string()
+    assert "ip" not in df_dtype_dict
+
+    arrow_schema, _ = get_arrow_schema(db_dtype_dict, dictionary=False)
+    assert arrow_schema.field("status").type == pa.string()